@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import pandas as pd
+from .generate import generate
+
+# Times every public function of data.py and graphs.py, and the save paths, on generated data
+# of each size, and compares the medians with a stored baseline:
+#   python -m bench.benchmark --sizes small,medium --output results.json
+#   python -m bench.benchmark --sizes small --save-baseline
+# Each size runs in its own process with SYNCED_SUPPORT_DATA_DIR and SYNCED_SUPPORT_CACHE_DIR
+# pointing at a temporary copy of the data, so the repo's data/ and cache/ are never touched.
+# Memoized functions are timed uncached (the first call after a write), and once cached.
+SIZES = {
+    'small': {'students': 1000, 'days': 180},
+    'medium': {'students': 10000, 'days': 90},
+    'large': {'students': 50000, 'days': 30}
+}
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+def parse_size(size):
+    """A named size from SIZES, or 'students:days', e.g. '5000:360'."""
+    if size in SIZES:
+        return SIZES[size]
+    students, days = size.split(':')
+    return {'students': int(students), 'days': int(days)}
+
+def cases():
+    """The benchmarks, as (name, function) pairs. Imports the app modules, so only call it in the
+    benchmark process, after the data directory is set."""
+    from src import data, graphs, risk, streaks, search, export, reports, workload, events
+    from src.cube import attendance_cube, reset_cube
+    from src.config import ATTEND_DATA, STUDENT_TASKS
+
+    student = data.student_list()[0]['value']
+    teacher = data.teacher_list()[0]['value']
+    tasks = data.student_task_page(student, page_size=1000)[0]
+    task_rows = [{col: row[col] for col in data.TASK_KEY} for row in tasks]
+    toggle = {'on': False}
+
+    def check_tasks():
+        # alternately complete and uncomplete the student's first task
+        toggle['on'] = not toggle['on']
+        return data.save_task_changes(student, selected_rows_data=task_rows[:1] if toggle['on'] else [])
+
+    # a support class's work habits saved for a new day, and one student's tasks checked
+    attendance = pd.read_csv(ATTEND_DATA)
+    signals = risk.attendance_signals(attendance)
+    support = attendance[attendance['Course'].str.startswith('Support')].drop_duplicates('Student')
+    new_rows = support[support['Course'] == support['Course'].iloc[0]].head(30).assign(Date='2099-01-01', Habit='On-task')
+    student_tasks = pd.read_csv(STUDENT_TASKS)
+    open_tasks = risk.open_tasks(student_tasks)
+    changed_tasks = student_tasks[student_tasks['Student'] == student].assign(Completed=True)
+
+    snapshot = {}
+
+    def report():
+        # the report data is read on the first, untimed call
+        if not snapshot:
+            snapshot.update(reports.load_snapshot())
+        return reports.student_report(student, snapshot)
+
+    def cached(func, *args):
+        func(*args)
+        return lambda: func(*args)
+
+    return [
+        # TAB 1
+        ('data.student_list', data.student_list.uncached),
+        ('data.student_list (cached)', cached(data.student_list)),
+        ('data.student_schedule', lambda: data.student_schedule.uncached(student)),
+        ('data.workhabit_trend', lambda: data.workhabit_trend(student)),
+        ('data.get_student_note', lambda: data.get_student_note(student)),
+        ('graphs.student_bundle', lambda: graphs.student_bundle(student)),
+        ('graphs.attendance_crosstab', lambda: graphs.attendance_crosstab(student)),
+        ('graphs.attendance_crosstab (all)', lambda: graphs.attendance_crosstab()),
+        ('graphs.attendance_barchart', lambda: graphs.attendance_barchart(student)),
+        ('graphs.attendance_barchart_none', lambda: graphs.attendance_barchart_none(student)),
+        ('graphs.workhabit_timeline', lambda: graphs.workhabit_timeline(student)),
+        ('graphs.timespent_barchart', lambda: graphs.timespent_barchart(student)),
+        ('cube.attendance_cube', attendance_cube),
+        ('search.student_search_index', search.student_search_index.uncached),
+        ('search.search_students (prefix)', lambda: search.search_students(student[:3])),
+        ('search.search_students (letters)', lambda: search.search_students(student[0] + student[2] + student[-1] + 'q')),
+        ('search.search_students (teacher)', lambda: search.search_students(student[1:3], teacher=teacher)),
+        ('search.match_student', lambda: search.match_student(student.upper())),
+        # TAB 2
+        ('data.teacher_list', data.teacher_list.uncached),
+        ('data.course_list', data.course_list.uncached),
+        ('data.upcoming_deadlines', data.upcoming_deadlines),
+        ('data.student_deadlines', lambda: data.student_deadlines.uncached(student)),
+        ('data.student_task_index', data.student_task_index.uncached),
+        ('data.student_task_page', lambda: data.student_task_page.uncached(student, 0, 10, (), '', ())),
+        ('data.student_task_page (cached)', cached(data.student_task_page, student)),
+        ('data.teacher_roster', lambda: data.teacher_roster.uncached(teacher)),
+        ('data.cohort_attendance', lambda: data.cohort_attendance(teacher)),
+        ('data.teacher_task_index', lambda: data.teacher_task_index.uncached(teacher)),
+        ('data.teacher_tasks', lambda: data.teacher_tasks(teacher, '2000-01-01', '2100-01-01')),
+        ('graphs.cohort_heatmap_dict', lambda: graphs.cohort_heatmap_dict(teacher)),
+        # RISK
+        ('risk.roster_risk (rebuild)', lambda: (risk.reset_risk(), risk.roster_risk())),
+        ('risk.roster_risk (cached)', cached(risk.roster_risk)),
+        ('risk.attendance_signals', lambda: risk.attendance_signals(attendance)),
+        ('risk.add_attendance', lambda: risk.add_attendance(signals, new_rows)),
+        ('risk.update_open_tasks', lambda: risk.update_open_tasks(open_tasks, changed_tasks)),
+        ('risk.risk_page', lambda: risk.risk_page(0, 20, (('Absence %', 'desc'),), '{Grade} = 9')),
+        # PATTERNS
+        ('streaks.attendance_patterns', streaks.attendance_patterns.uncached),
+        ('streaks.pattern_report', streaks.pattern_report.uncached),
+        ('streaks.pattern_page', lambda: streaks.pattern_page(0, 20, (('Late Now', 'desc'),), '{Absent Now} >= 2')),
+        ('streaks.student_patterns', lambda: streaks.student_patterns(student)),
+        # DEADLINE LOAD
+        ('workload.deadline_index', workload.deadline_index.uncached),
+        ('workload.deadline_load', workload.deadline_load.uncached),
+        ('workload.crunch_report', workload.crunch_report.uncached),
+        ('workload.student_load', lambda: workload.student_load(student)),
+        ('graphs.deadline_load_dict', lambda: graphs.deadline_load_dict(student)),
+        # EXPORT, every chunk of the download read
+        ('export.stream_xlsx (teacher)', lambda: sum(map(len, export.stream_xlsx(teacher)))),
+        ('export.stream_csv (school attendance)', lambda: sum(map(len, export.stream_csv('attendance')))),
+        # PROGRESS REPORTS
+        ('reports.load_snapshot', reports.load_snapshot),
+        ('reports.student_report', report),
+        # SAVES
+        ('data.save_student_note', lambda: data.save_student_note(student, 'Benchmark note.')),
+        ('data.save_workhabits_data', lambda: data.save_workhabits_data(
+            [{'Student': student, 'Workhabit Score': '3', 'Focus': 'Math', 'Support Attendance': 'P'}], '2099-01-01')),
+        ('data.save_task_changes', check_tasks),
+        ('data.student_tasks_update', data.student_tasks_update),
+        ('data.save_deadlines_data', lambda: data.save_deadlines_data(
+            [{'Task': 'Benchmark', 'Course': tasks[0]['Course'], 'Block': tasks[0]['Block'],
+              'Teacher': tasks[0]['Teacher'], 'Due': '2099-01-01'}])),
+        # EVENT LOG, with the saves above logged: views caught up as after a restart, tables replayed
+        ('cube.attendance_cube (restart)', lambda: (reset_cube(saved=False), attendance_cube())),
+        ('risk.roster_risk (restart)', lambda: (risk.reset_risk(saved=False), risk.roster_risk())),
+        ('events.table_at (attendance)', lambda: events.table_at('attendance')),
+        ('events.table_at (tasks)', lambda: events.table_at('tasks')),
+    ]
+
+def run_cases(repeat, only=None):
+    """Times each benchmark case, in this process.
+
+    Parameters
+    ----------
+    repeat: int
+        The number of timed calls of each case, after one untimed call.
+    only: list, optional
+        Substrings of the case names to run. All cases if None.
+
+    Returns
+    -------
+    dict: The min and median seconds of each case, by name.
+    """
+    results = {}
+    for name, func in cases():
+        if only and not any(item in name for item in only):
+            continue
+        func()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        results[name] = {'min': min(times), 'median': statistics.median(times)}
+    return results
+
+def run_size(name, size, repeat, only=None, seed=0):
+    """Generates data of the given size in a temporary directory and benchmarks it in a new process.
+
+    Returns
+    -------
+    dict: The size, the rows of each file, the time taken to generate them and the results.
+    """
+    with tempfile.TemporaryDirectory(prefix=f'synced-bench-{name}-') as tmp:
+        data_dir = os.path.join(tmp, 'data')
+        start = time.perf_counter()
+        rows = generate(data_dir, size['students'], size['days'], seed=seed)
+        generated = time.perf_counter() - start
+
+        env = dict(os.environ, SYNCED_SUPPORT_DATA_DIR=data_dir, SYNCED_SUPPORT_CACHE_DIR=os.path.join(tmp, 'cache'))
+        command = [sys.executable, '-m', 'bench.benchmark', '--run', '--repeat', str(repeat)]
+        if only:
+            command += ['--only', ','.join(only)]
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(command, env=env, cwd=root, check=True, capture_output=True, text=True).stdout
+    return {**size, 'rows': rows, 'generate_seconds': generated, 'results': json.loads(output)}
+
+def compare(report, baseline, threshold, noise=0.001):
+    """Lists the cases whose median time is more than threshold times the baseline median, and
+    more than noise seconds slower (sub-millisecond cases vary too much to compare by ratio).
+
+    Returns
+    -------
+    list: (size, case, baseline seconds, seconds, ratio) tuples.
+    """
+    regressions = []
+    for size, entry in report['sizes'].items():
+        before = baseline.get('sizes', {}).get(size, {}).get('results', {})
+        for case, result in entry['results'].items():
+            if case not in before:
+                continue
+            ratio = result['median'] / max(before[case]['median'], 1e-9)
+            if ratio > threshold and result['median'] - before[case]['median'] > noise:
+                regressions.append((size, case, before[case]['median'], result['median'], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Synced Support on generated data.')
+    parser.add_argument('--sizes', default='small', help=f"comma separated: {', '.join(SIZES)} or students:days")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', default='', help='comma separated substrings of the cases to run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file to write the results to, as JSON')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    only = [item for item in args.only.split(',') if item]
+
+    # benchmark process, on the data set up by run_size
+    if args.run:
+        print(json.dumps(run_cases(args.repeat, only)))
+        return 0
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'repeat': args.repeat, 'sizes': {}}
+    for name in args.sizes.split(','):
+        print(f'Benchmarking {name}...', file=sys.stderr)
+        report['sizes'][name] = run_size(name, parse_size(name), args.repeat, only, args.seed)
+        for case, result in report['sizes'][name]['results'].items():
+            print(f"  {case:<40} {result['median'] * 1000:10.2f} ms", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(text)
+        return 0
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.threshold)
+    for size, case, before, after, ratio in regressions:
+        print(f'REGRESSION {size} {case}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({ratio:.2f}x)', file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
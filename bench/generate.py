@@ -0,0 +1,191 @@
+import os
+import math
+import argparse
+import numpy as np
+import pandas as pd
+
+# Synthetic school data in the format of data/*.csv, at any size. The same arguments always
+# produce the same files:
+#   python -m bench.generate --students 10000 --days 90 --out /tmp/synced-10k
+GRADES = [8, 9, 10, 11, 12]
+SUBJECTS = ['Math', 'Science', 'English', 'Socials', 'French', 'Art', 'PE', 'Support']
+BLOCKS = ['1-1', '1-2', '1-3', '1-4', '2-1', '2-2', '2-3', '2-4']
+WORK = ['Math', 'Science', 'English', 'Socials', 'French', 'Art', 'Other']
+HABITS = ['Off-task', 'Mostly Off-task', 'Equally On/Off-task', 'Mostly On-task', 'On-task']
+TASK_KINDS = ['Assignment', 'Quiz', 'Test', 'Project', 'Lab Report']
+
+FIRST_NAMES = ['Alice', 'Bob', 'Charlie', 'David', 'Eva', 'Farah', 'Grace', 'Henry', 'Isla', 'Jack',
+               'Kai', 'Liam', 'Maya', 'Noah', 'Olivia', 'Priya', 'Quinn', 'Ravi', 'Sofia', 'Theo',
+               'Uma', 'Victor', 'Wen', 'Ximena', 'Yusuf', 'Zoe', 'Amir', 'Bea', 'Chen', 'Dara',
+               'Emil', 'Fatima', 'Gus', 'Hana', 'Ivan', 'Jade', 'Kofi', 'Lena', 'Milo', 'Nia']
+LAST_NAMES = ['Smith', 'Nguyen', 'Patel', 'Brown', 'Garcia', 'Wilson', 'Chen', 'Singh', 'Martin', 'Lee',
+              'Clark', 'Lopez', 'Hill', 'Young', 'King', 'Wright', 'Scott', 'Green', 'Baker', 'Adams',
+              'Nelson', 'Carter', 'Mitchell', 'Perez', 'Roberts', 'Turner', 'Phillips', 'Campbell', 'Parker', 'Evans',
+              'Edwards', 'Collins', 'Stewart', 'Morris', 'Rogers', 'Reed', 'Cook', 'Morgan', 'Bell', 'Murphy']
+TEACHER_NAMES = ['Johnson', 'Davis', 'Fort', 'Kay', 'Lane', 'Brown', 'Paul', 'Leyton', 'Ahmed', 'Bishop',
+                 'Castro', 'Dubois', 'Ellis', 'Fischer', 'Gill', 'Hughes', 'Ibrahim', 'Jensen', 'Khan', 'Larsen']
+
+SECTION_SIZE = 30
+SECTIONS_PER_TEACHER = 6
+
+def student_names(count):
+    """Unique student names, 'First Last', numbered once the combinations run out."""
+    pairs = len(FIRST_NAMES) * len(LAST_NAMES)
+    names = []
+    for i in range(count):
+        name = f'{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}'
+        names.append(name if i < pairs else f'{name} {i // pairs + 1}')
+    return names
+
+def teacher_name(i):
+    name = f"{'Ms.' if i % 2 == 0 else 'Mr.'} {TEACHER_NAMES[i % len(TEACHER_NAMES)]}"
+    return name if i < len(TEACHER_NAMES) else f'{name} {i // len(TEACHER_NAMES) + 1}'
+
+def generate_students(rng, count):
+    """student.csv: every student takes one course of each subject for their grade, one per block,
+    in sections of about 30 students. Each teacher teaches six sections."""
+    names = np.array(student_names(count), dtype=object)
+    grades = np.array(GRADES)[np.arange(count) * len(GRADES) // count]
+
+    rows = []
+    section_id = 0
+    for grade in GRADES:
+        in_grade = np.flatnonzero(grades == grade)
+        n_sections = max(1, math.ceil(len(in_grade) / SECTION_SIZE))
+        for subject, block in zip(SUBJECTS, BLOCKS):
+            # a different mix of students in each subject
+            order = rng.permutation(in_grade)
+            section = np.arange(len(order)) * n_sections // max(1, len(order))
+            for k in range(n_sections):
+                members = order[section == k]
+                rows.append(pd.DataFrame({'Student': names[members], 'Grade': grade,
+                                          'Course': f'{subject} {grade}', 'Section': section_id + k, 'Block': block}))
+            section_id += n_sections
+
+    # teachers, each with a few sections
+    teacher_of = rng.permutation(section_id) // SECTIONS_PER_TEACHER
+    teachers = np.array([teacher_name(i) for i in range(teacher_of.max() + 1)], dtype=object)
+    df = pd.concat(rows, ignore_index=True)
+    df['Teacher'] = teachers[teacher_of[df['Section']]]
+    df = df.sort_values(by=['Student', 'Block'], kind='stable')
+    return df[['Student', 'Grade', 'Course', 'Teacher', 'Block']].reset_index(drop=True)
+
+def generate_attendance(rng, students, days):
+    """attendance_habits.csv: one row per scheduled class (blocks 1-x and 2-x on alternating days)
+    per school day. Support classes also have a work habit and the subject worked on."""
+    # students are sorted by name, so their index can be found with searchsorted
+    names = students['Student'].unique().astype(object)
+    # students who tend to be late or absent
+    lateness = rng.beta(1.2, 8, size=len(names))
+    absence = rng.beta(1.1, 12, size=len(names))
+
+    frames = []
+    for day_index, date in enumerate(days):
+        blocks = BLOCKS[:4] if day_index % 2 == 0 else BLOCKS[4:]
+        classes = students[students['Block'].isin(blocks)]
+        student_index = np.searchsorted(names, classes['Student'].to_numpy()) if len(classes) else []
+        draw = rng.random(len(classes))
+        p_absent = absence[student_index]
+        p_late = lateness[student_index]
+        codes = np.where(draw < p_absent * 0.5, 'A',
+                np.where(draw < p_absent, 'AE',
+                np.where(draw < p_absent + p_late, 'L', 'P')))
+
+        frame = pd.DataFrame({
+            'Student': classes['Student'].to_numpy(), 'Date': date.strftime('%Y-%m-%d'),
+            'Course': classes['Course'].to_numpy(), 'Block': classes['Block'].to_numpy(),
+            'Attendance': codes, 'Teacher': classes['Teacher'].to_numpy(), 'Habit': None, 'Work': None})
+
+        # work habits in support classes the student attended
+        support = frame['Course'].str.startswith('Support').to_numpy() & np.isin(codes, ['P', 'L'])
+        frame.loc[support, 'Habit'] = rng.choice(HABITS, size=support.sum(), p=[0.05, 0.1, 0.2, 0.35, 0.3])
+        frame.loc[support, 'Work'] = rng.choice(WORK, size=support.sum())
+        frames.append(frame)
+
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(by=['Student', 'Date'], kind='stable').reset_index(drop=True)
+
+def generate_deadlines(rng, students, days, every=14):
+    """master_deadlines.csv: about one task every two weeks per section (not PE or Support),
+    through four weeks after the last school day."""
+    sections = students[~students['Course'].str.match(r'(PE|Support) ')][['Course', 'Block', 'Teacher']].drop_duplicates()
+    due_days = pd.bdate_range(days[0], days[-1] + pd.Timedelta(weeks=4))
+    per_section = max(1, math.ceil(len(due_days) / (every * 5 / 7)))
+
+    sections = sections.loc[sections.index.repeat(per_section)].reset_index(drop=True)
+    sections['Due'] = rng.choice(due_days, size=len(sections))
+    df = sections.sort_values(by=['Due', 'Teacher'], kind='stable')
+    # numbered in due date order within each section
+    numbers = df.groupby(['Course', 'Block', 'Teacher']).cumcount() + 1
+    kinds = rng.choice(TASK_KINDS, size=len(df))
+    df['Task'] = [f'{kind} {n}' for kind, n in zip(kinds, numbers)]
+    df['Due'] = df['Due'].dt.strftime('%Y-%m-%d')
+    return df[['Task', 'Course', 'Block', 'Teacher', 'Due']].reset_index(drop=True)
+
+def generate_tasks(rng, students, deadlines, today):
+    """student_tasks.csv: every deadline for every student in the section, as
+    data.student_tasks_update creates them. Most past tasks are completed, a few hidden."""
+    tasks = pd.merge(students, deadlines, on=['Course', 'Teacher', 'Block'], how='inner')
+    past = pd.to_datetime(tasks['Due']).to_numpy() < np.datetime64(today)
+    tasks['Completed'] = past & (rng.random(len(tasks)) < 0.7)
+    tasks['Hidden'] = past & (rng.random(len(tasks)) < 0.05)
+    return tasks[['Student', 'Task', 'Course', 'Block', 'Teacher', 'Grade', 'Due', 'Completed', 'Hidden']]
+
+def generate_notes(rng, students, share=0.3):
+    """student_notes.csv: a note for some of the students."""
+    names = students['Student'].unique().astype(object)
+    chosen = names[rng.random(len(names)) < share]
+    subjects = rng.choice(WORK[:-1], size=len(chosen))
+    return pd.DataFrame({'Student': chosen, 'Note': [f'Check in with {name} about {subject}.' for name, subject in zip(chosen, subjects)]})
+
+def generate(out_dir, students=1000, days=180, end_date='2025-06-27', seed=0):
+    """Writes student.csv, attendance_habits.csv, master_deadlines.csv, student_tasks.csv and
+    student_notes.csv to out_dir.
+
+    Parameters
+    ----------
+    out_dir: str
+        The directory to write to, e.g. a SYNCED_SUPPORT_DATA_DIR.
+    students: int
+        The number of students.
+    days: int
+        The number of school days of attendance, ending at end_date.
+    end_date: str
+        The last school day.
+    seed: int
+        The random seed.
+
+    Returns
+    -------
+    dict: The number of rows written to each file.
+    """
+    rng = np.random.default_rng(seed)
+    school_days = pd.bdate_range(end=end_date, periods=days)
+
+    df_students = generate_students(rng, students)
+    df_attendance = generate_attendance(rng, df_students, school_days)
+    df_deadlines = generate_deadlines(rng, df_students, school_days)
+    df_tasks = generate_tasks(rng, df_students, df_deadlines, end_date)
+    df_notes = generate_notes(rng, df_students)
+
+    os.makedirs(out_dir, exist_ok=True)
+    files = {
+        'student.csv': df_students,
+        'attendance_habits.csv': df_attendance,
+        'master_deadlines.csv': df_deadlines,
+        'student_tasks.csv': df_tasks,
+        'student_notes.csv': df_notes
+    }
+    for filename, df in files.items():
+        df.to_csv(os.path.join(out_dir, filename), index=False)
+    return {filename: len(df) for filename, df in files.items()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic Synced Support data.')
+    parser.add_argument('--out', required=True, help='directory to write the CSV files to')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=180, help='school days of attendance')
+    parser.add_argument('--end-date', default='2025-06-27', help='last school day (YYYY-MM-DD)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.out, args.students, args.days, args.end_date, args.seed))
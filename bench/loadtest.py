@@ -0,0 +1,458 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import traceback
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+import pandas as pd
+from .generate import generate
+from .benchmark import parse_size
+
+# Replays user sessions against the app as _dash-update-component requests, from many
+# concurrent users, then checks the CSV files for lost or duplicated writes:
+#   python -m bench.loadtest --users 16 --iterations 5              (Flask test client, threads)
+#   python -m bench.loadtest --users 16 --server --workers 4        (gunicorn, separate processes)
+#   python -m bench.loadtest --users 16 --url http://host:8050 --data-dir /path/to/its/data
+# Without --url the app runs on a temporary copy of generated data (or of --data-dir), so the
+# repo's data/ is never written. Each user works on its own student:
+#   load the page, select the student, open their tasks and flip the first task's checkbox,
+#   save a note, submit a work habit row and submit a deadline for one of their courses.
+# The chart toggles are handled in the browser (assets/charts.js) and send no requests.
+MARKER_DATE = '2099-01-01'
+MARKER_DUE = '2099-02-01'
+MARKER_TASK = 'Load test'
+JOB_TIMEOUT = 300
+
+# latencies and errors are shared by the user threads
+_record_lock = threading.Lock()
+
+# TRANSPORTS
+class TestClient:
+    """Requests to the app in this process, through the Flask test client."""
+    def __init__(self, server):
+        self.client = server.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_data(as_text=True)
+
+    def post(self, path, body):
+        response = self.client.post(path, json=body)
+        return response.status_code, response.get_data(as_text=True)
+
+class HttpClient:
+    """Requests to a running server."""
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def _send(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode(errors='replace')
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self.url + path))
+
+    def post(self, path, body):
+        data = json.dumps(body).encode()
+        return self._send(urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'}))
+
+# DASH PROTOCOL
+def _parse_outputs(output):
+    # '..a.prop...b.prop..' for several outputs, 'a.prop' for one, ids may be JSON
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    outputs = []
+    for part in parts:
+        idstr, prop = part.rsplit('.', 1)
+        prop = prop.split('@')[0]
+        outputs.append({'id': json.loads(idstr) if idstr.startswith('{') else idstr, 'property': prop})
+    return outputs
+
+def _index(item):
+    # 'index.property' of a dependency's input, state or output, ids are JSON strings
+    component = json.loads(item['id']) if item['id'].startswith('{') else item['id']
+    index = component['index'] if isinstance(component, dict) else component
+    return f"{index}.{item['property']}"
+
+class Session:
+    """One user's page: sends callbacks the way the browser does, and records their latency."""
+    def __init__(self, client, dependencies, latencies, errors):
+        self.client = client
+        self.dependencies = dependencies
+        self.latencies = latencies
+        self.errors = errors
+        self.end_id = None
+
+    def _record(self, action, seconds, ok):
+        with _record_lock:
+            self.latencies.setdefault(action, []).append(seconds)
+            if not ok:
+                self.errors[action] = self.errors.get(action, 0) + 1
+
+    def load_page(self):
+        start = time.perf_counter()
+        status, text = self.client.get('/')
+        self._record('load_page', time.perf_counter() - start, status == 200)
+        config = re.search(r'<script id="_dash-config"[^>]*>(.*?)</script>', text, re.S)
+        self.end_id = json.loads(config.group(1)).get('end_id') if config else None
+
+    def _find(self, trigger, output):
+        for dependency in self.dependencies:
+            if dependency.get('clientside_function') or output not in dependency['output']:
+                continue
+            for item in dependency['inputs']:
+                if _index(item) == trigger:
+                    return dependency, f"{item['id']}.{item['property']}"
+        raise KeyError(f'No callback for {trigger} -> {output}')
+
+    def callback(self, action, trigger, output, values, saved=None):
+        """Sends one callback request, waiting for background callbacks to finish.
+
+        Parameters
+        ----------
+        action: str
+            The name to record the latency under.
+        trigger: str
+            The input that changed, as 'index.property'.
+        output: str
+            An index among the callback's outputs, to tell callbacks with the same trigger apart.
+        values: dict
+            Values of the callback's inputs and state, by 'index.property'. Others are None.
+        saved: tuple, optional
+            An output ('index.property') and the start of the message it shows when a save
+            succeeded. Any other response is counted as an error.
+
+        Returns
+        -------
+        dict: The output values by 'index.property', or None if the request or save failed.
+        """
+        dependency, changed = self._find(trigger, f'"index":"{output}"')
+        outputs = _parse_outputs(dependency['output'])
+
+        def listed(items):
+            return [{'id': json.loads(item['id']) if item['id'].startswith('{') else item['id'],
+                     'property': item['property'], 'value': values.get(_index(item))} for item in items]
+
+        body = {'output': dependency['output'],
+                'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+                'inputs': listed(dependency['inputs']), 'state': listed(dependency['state']),
+                'changedPropIds': [changed]}
+
+        start = time.perf_counter()
+        path = '/_dash-update-component'
+        if dependency.get('background') and self.end_id:
+            path += '?' + urllib.parse.urlencode({'endId': self.end_id})
+        status, text = self.client.post(path, body)
+        result = json.loads(text) if status == 200 and text else {}
+
+        # background callback: poll until the job's result is ready
+        if 'cacheKey' in result:
+            handles = urllib.parse.urlencode({'endId': self.end_id, 'cacheKey': result['cacheKey'], 'job': result['job']})
+            while status == 200 and 'response' not in result and time.perf_counter() - start < JOB_TIMEOUT:
+                time.sleep(0.1)
+                status, text = self.client.post(f'{path.split("?")[0]}?{handles}', body)
+                result = json.loads(text) if status == 200 and text else {}
+
+        response = {}
+        for component, props in result.get('response', {}).items():
+            index = json.loads(component)['index'] if component.startswith('{') else component
+            for prop, value in props.items():
+                response[f'{index}.{prop}'] = value
+
+        ok = status in (200, 204)
+        if saved is not None:
+            ok = status == 200 and str(response.get(saved[0])).startswith(saved[1])
+        self._record(action, time.perf_counter() - start, ok)
+        return response if ok and status == 200 else None
+
+def run_user(client, dependencies, user, iterations, expected, latencies, errors):
+    """Runs one user's sessions, recording what each save should leave in the files."""
+    session = Session(client, dependencies, latencies, errors)
+    student, course = user['student'], user['course']
+    try:
+        for iteration in range(iterations):
+            session.load_page()
+
+            # TAB 1 - search for the student, select them, save a note and a work habit row
+            session.callback('search_student', 'student-select.search_value', 'student-select',
+                             {'student-select.search_value': student[:3]})
+            session.callback('select_student', 'student-select.value', 'student-bundle',
+                             {'student-select.value': student})
+            note = f'Load test note {user["number"]}-{iteration}'
+            response = session.callback('save_note', 'save-note-button.n_clicks', 'student-bundle',
+                                        {'student-select.value': student, 'save-note-button.n_clicks': 1, 'teacher-notes.value': note},
+                                        saved=('output-msg-note.children', 'Note saved'))
+            if response is not None:
+                expected['notes'][student] = note
+
+            row = {'Student': student, 'Workhabit Score': '3', 'Focus': 'Math', 'Support Attendance': 'P'}
+            response = session.callback('save_workhabits', 'submit-btn.n_clicks', 'workhabit-table',
+                                        {'submit-btn.n_clicks': 1, 'date-picker.date': MARKER_DATE, 'workhabit-table.rowData': [row]},
+                                        saved=('output-msg.children', 'Data Saved'))
+            if response is not None:
+                expected['workhabits'][student] = expected['workhabits'].get(student, 0) + 1
+
+            # TAB 2 - open the student's tasks and flip the first task's checkbox
+            values = {'select-type.value': 'Student', 'select-item.value': student, 'student-task-saved.data': 0,
+                      'student-task-edits.data': {'hidden': [], 'completed': {}}}
+            page = session.callback('open_tasks', 'select-item.value', 'student-task-title', values)
+            if page and page.get('student-task-table.data'):
+                rows = page['student-task-table.data']
+                selected = page['student-task-table.selected_rows']
+                flipped = [i for i in selected if i != 0] if 0 in selected else selected + [0]
+                edits = session.callback('flip_task', 'student-task-table.selected_rows', 'student-task-edits',
+                                         {'student-task-table.data': rows, 'student-task-table.selected_rows': flipped,
+                                          'student-task-keys.data': page['student-task-keys.data'],
+                                          'student-task-edits.data': {'hidden': [], 'completed': {}}})
+                if edits:
+                    saved = session.callback('save_tasks', 'save-student-tasks.n_clicks', 'output-student-task',
+                                             {'save-student-tasks.n_clicks': 1, 'student-task-edits.data': edits['student-task-edits.data'],
+                                              'student-task-saved.data': 0, 'select-item.value': student},
+                                             saved=('output-student-task.children', 'Changes saved'))
+                    if saved is not None:
+                        key = tuple(rows[0][col] for col in ['Task', 'Course', 'Teacher', 'Block'])
+                        expected['tasks'][(student, key)] = 0 not in selected
+
+            # submit a deadline for one of the student's courses
+            deadline = {'Task': f'{MARKER_TASK} {user["number"]}-{iteration}', 'Course': course['Course'],
+                        'Block': course['Block'], 'Teacher': course['Teacher'], 'Due': MARKER_DUE}
+            response = session.callback('save_deadlines', 'submit-deadlines.n_clicks', 'csv-write-flag',
+                                        {'submit-deadlines.n_clicks': 1, 'deadlines-table.rowData': [deadline]},
+                                        saved=('output-msg-deadlines.children', 'Data saved'))
+            if response is not None:
+                expected['deadlines'].append(deadline)
+    except Exception:
+        # a broken session is an error, the other users carry on
+        traceback.print_exc()
+        session._record('exception', 0.0, False)
+
+# DATA INTEGRITY
+def check_integrity(data_dir, before, expected):
+    """Compares the CSV files after the run with the files before it and the saves that succeeded.
+
+    Parameters
+    ----------
+    data_dir: str
+        The data directory the app wrote to.
+    before: dict
+        The row counts of each file before the run.
+    expected: dict
+        The saves that were acknowledged: the last note of each student, the number of work
+        habit rows of each student, the task checkbox states and the deadlines.
+
+    Returns
+    -------
+    list: A description of each violation found.
+    """
+    violations = []
+    files = {}
+    for name in ['student.csv', 'attendance_habits.csv', 'master_deadlines.csv', 'student_tasks.csv', 'student_notes.csv']:
+        try:
+            files[name] = pd.read_csv(os.path.join(data_dir, name))
+        except Exception as error:
+            violations.append(f'{name}: cannot be read ({error})')
+    if violations:
+        return violations
+
+    # notes, the last note saved for each student, once
+    notes = files['student_notes.csv']
+    for student, note in expected['notes'].items():
+        saved = notes.loc[notes['Student'] == student, 'Note'].tolist()
+        if saved != [note]:
+            violations.append(f'student_notes.csv: {student} has {saved}, expected [{note!r}]')
+
+    # work habits, every submitted row and no others lost
+    attendance = files['attendance_habits.csv']
+    added = attendance[attendance['Date'] == MARKER_DATE]
+    for student, count in expected['workhabits'].items():
+        found = int((added['Student'] == student).sum())
+        if found != count:
+            violations.append(f'attendance_habits.csv: {found} work habit rows for {student}, expected {count}')
+    total = before['attendance_habits.csv'] + sum(expected['workhabits'].values())
+    if len(attendance) != total:
+        violations.append(f'attendance_habits.csv: {len(attendance)} rows, expected {total}')
+
+    # deadlines, every submitted deadline once, and a task for each student in its section
+    deadlines = files['master_deadlines.csv']
+    tasks = files['student_tasks.csv']
+    students = files['student.csv']
+    new_tasks = 0
+    for deadline in expected['deadlines']:
+        found = int((deadlines['Task'] == deadline['Task']).sum())
+        if found != 1:
+            violations.append(f"master_deadlines.csv: {deadline['Task']} saved {found} times")
+        section = students[(students['Course'] == deadline['Course']) & (students['Block'] == deadline['Block']) &
+                           (students['Teacher'] == deadline['Teacher'])]
+        found = int((tasks['Task'] == deadline['Task']).sum())
+        new_tasks += len(section)
+        if found != len(section):
+            violations.append(f"student_tasks.csv: {found} tasks for {deadline['Task']}, expected {len(section)}")
+    total = before['master_deadlines.csv'] + len(expected['deadlines'])
+    if len(deadlines) != total:
+        violations.append(f'master_deadlines.csv: {len(deadlines)} rows, expected {total}')
+    total = before['student_tasks.csv'] + new_tasks
+    if len(tasks) != total:
+        violations.append(f'student_tasks.csv: {len(tasks)} rows, expected {total}')
+    duplicated = int(tasks.duplicated(['Student', 'Task', 'Course', 'Block', 'Teacher', 'Due']).sum())
+    if duplicated:
+        violations.append(f'student_tasks.csv: {duplicated} duplicated tasks')
+
+    # task checkboxes, the last state saved
+    for (student, (task, course, teacher, block)), completed in expected['tasks'].items():
+        rows = tasks[(tasks['Student'] == student) & (tasks['Task'] == task) & (tasks['Course'] == course) &
+                     (tasks['Teacher'] == teacher) & (tasks['Block'] == block)]
+        if rows.empty or (rows['Completed'].astype(str) != str(completed)).any():
+            violations.append(f'student_tasks.csv: {task} ({course}) for {student} is not Completed={completed}')
+    return violations
+
+# REPORT
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def summarize(latencies, errors, seconds):
+    """Latency percentiles in milliseconds and requests per second, for each action and overall."""
+    summary = {}
+    every = [value for values in latencies.values() for value in values]
+    for action, values in list(latencies.items()) + [('all', every)]:
+        if not values:
+            continue
+        summary[action] = {
+            'requests': len(values),
+            'errors': errors.get(action, 0) if action != 'all' else sum(errors.values()),
+            'p50_ms': percentile(values, 0.5) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'throughput_rps': len(values) / seconds
+        }
+    return summary
+
+def pick_users(data_dir, count, seed):
+    """A different student for each user, with a support block (for work habits) and a course
+    (for deadlines)."""
+    students = pd.read_csv(os.path.join(data_dir, 'student.csv'))
+    support = set(students.loc[students['Course'].str.contains('Support'), 'Student'])
+    names = sorted(support)
+    random.Random(seed).shuffle(names)
+    if len(names) < count:
+        raise SystemExit(f'Only {len(names)} students with a support block for {count} users.')
+    users = []
+    for number, student in enumerate(names[:count]):
+        courses = students[(students['Student'] == student) & ~students['Course'].str.contains('Support')]
+        course = courses.iloc[0][['Course', 'Block', 'Teacher']].to_dict()
+        users.append({'number': number, 'student': student, 'course': course})
+    return users
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(env, workers, log):
+    """Starts gunicorn (gunicorn.conf.py) on a free local port, and waits until it serves pages."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    port = _free_port()
+    env = dict(env, SYNCED_SUPPORT_BIND=f'127.0.0.1:{port}', SYNCED_SUPPORT_WORKERS=str(workers))
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+                               cwd=root, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(600):
+        if process.poll() is not None:
+            raise SystemExit(f'gunicorn exited with {process.returncode}, see {log.name}')
+        try:
+            urllib.request.urlopen(url + '/_dash-dependencies', timeout=1)
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit('gunicorn did not start')
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test Synced Support with concurrent user sessions.')
+    parser.add_argument('--users', type=int, default=8, help='concurrent users')
+    parser.add_argument('--iterations', type=int, default=3, help='sessions per user')
+    parser.add_argument('--size', default='200:20', help='generated data size (see bench.benchmark)')
+    parser.add_argument('--data-dir', help='data to copy instead of generating, or with --url, the data the server writes')
+    parser.add_argument('--server', action='store_true', help='run the app under gunicorn instead of the test client')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers with --server')
+    parser.add_argument('--url', help='a running server to test, nothing is started')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file to write the report to, as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='synced-load-') as tmp:
+        process = None
+        if args.url:
+            data_dir = args.data_dir
+            client_for = lambda: HttpClient(args.url)
+        else:
+            # a copy of the data for the app to write to
+            data_dir = os.path.join(tmp, 'data')
+            if args.data_dir:
+                shutil.copytree(args.data_dir, data_dir)
+            else:
+                size = parse_size(args.size)
+                generate(data_dir, size['students'], size['days'], seed=args.seed)
+            env = dict(os.environ, SYNCED_SUPPORT_DATA_DIR=data_dir, SYNCED_SUPPORT_CACHE_DIR=os.path.join(tmp, 'cache'))
+
+            if args.server:
+                log = open(os.path.join(tmp, 'gunicorn.log'), 'w')
+                process, url = start_server(env, args.workers, log)
+                client_for = lambda: HttpClient(url)
+            else:
+                # the app reads its directories when first imported
+                os.environ.update(env)
+                from src.app import server
+                client_for = lambda: TestClient(server)
+
+        try:
+            if not data_dir:
+                raise SystemExit('--data-dir is needed with --url, to choose students and check the files.')
+            before = {name: len(pd.read_csv(os.path.join(data_dir, name)))
+                      for name in ['attendance_habits.csv', 'master_deadlines.csv', 'student_tasks.csv']}
+            users = pick_users(data_dir, args.users, args.seed)
+            dependencies = json.loads(client_for().get('/_dash-dependencies')[1])
+
+            expected = {'notes': {}, 'workhabits': {}, 'tasks': {}, 'deadlines': []}
+            latencies, errors = {}, {}
+            threads = [threading.Thread(target=run_user, args=(client_for(), dependencies, user, args.iterations,
+                                                               expected, latencies, errors)) for user in users]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - start
+
+            violations = check_integrity(data_dir, before, expected)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    report = {'users': args.users, 'iterations': args.iterations, 'seconds': seconds,
+              'mode': 'url' if args.url else 'server' if args.server else 'test client',
+              'latency': summarize(latencies, errors, seconds), 'violations': violations}
+    for action, entry in report['latency'].items():
+        print(f"{action:<16} {entry['requests']:6d} req {entry['errors']:4d} err  p50 {entry['p50_ms']:8.1f} ms  "
+              f"p95 {entry['p95_ms']:8.1f} ms  p99 {entry['p99_ms']:8.1f} ms  {entry['throughput_rps']:7.1f} req/s", file=sys.stderr)
+    for violation in violations:
+        print(f'VIOLATION {violation}', file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if violations or any(errors.values()) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import multiprocessing
+from src.config import FEED_TIMEOUT
+
+# Gunicorn settings for the production entry point (src/wsgi.py):
+#   gunicorn --config gunicorn.conf.py
+# Workers, threads and the address can be set with environment variables.
+
+wsgi_app = 'src.wsgi:server'
+bind = os.environ.get('SYNCED_SUPPORT_BIND', '0.0.0.0:' + os.environ.get('PORT', '8050'))
+
+# load and warm the data once in the master, workers share it copy-on-write
+preload_app = True
+
+# threaded workers, /changes long-polls hold at most SYNCED_SUPPORT_FEED_LONG_POLLS threads of
+# each worker (config.FEED_LONG_POLLS), the other pages poll every few seconds instead
+worker_class = 'gthread'
+workers = int(os.environ.get('SYNCED_SUPPORT_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('SYNCED_SUPPORT_THREADS', 8))
+
+# long-polls return within FEED_TIMEOUT seconds
+timeout = FEED_TIMEOUT + 30
+graceful_timeout = 30
+keepalive = 5
+
+# recycle workers now and then, new workers are forked from the warmed master
+max_requests = 2000
+max_requests_jitter = 200
+
+# add the metrics of a recycled worker to the totals and delete its file (metrics.retire_workers)
+def child_exit(server, worker):
+    from src.metrics import retire_workers
+    retire_workers([worker.pid])
+
+accesslog = '-'
+errorlog = '-'
@@ -6,9 +6,22 @@ from dash import Dash
 from dash.dependencies import Input, Output
 from .components import *
 from .callbacks import * 
+from .config import JOBS_CACHE
+from .jobs import JobManager
+from .export import register_export
+from .feed import register_feed
+from .metrics import instrument_callbacks, register_metrics
+from .profiling import profile_callbacks, register_profiling
+from .search import register_search
+
+# Background callbacks (e.g. deadline submission) run in separate processes, tracked on local disk
+background_callback_manager = JobManager(JOBS_CACHE)
 
 # Initialize app 
-app = Dash(__name__, external_stylesheets=[dbc.themes.SPACELAB], title="Synced Support")
+app = Dash(__name__, 
+           external_stylesheets=[dbc.themes.SPACELAB], 
+           title="Synced Support", 
+           background_callback_manager=background_callback_manager)
 server = app.server
 
 # App Layout
@@ -31,7 +44,9 @@ app.layout = dbc.Container([
     dbc.Row([
         dbc.Col([
             create_tabs(), 
-            html.Div(id='tab-content', style={'overflowY': 'auto', 'width': '100%', 'maxHeight': 'calc(100vh - 7rem)'})
+            html.Div(id='tab-content', style={'overflowY': 'auto', 'width': '100%', 'maxHeight': 'calc(100vh - 7rem)'}),
+            # changes written in any session (assets/feed.js)
+            dcc.Store(id={'type': 'dynamic-output', 'index': 'change-feed'})
         ], style={'display': 'flex', 'flexDirection': 'column', 'flex-grow': 1, 'width': '100%'})
     ],  style={'flex-grow': 1, 'width': '100%', 'margin': 0, 'padding': 0}), 
     
@@ -62,5 +77,23 @@ app.layout = dbc.Container([
 # register callbacks
 register_callbacks(app)
 
+# change feed endpoint, long-polled by open pages
+register_feed(server)
+
+# student search for the work habit table's student cells
+register_search(server)
+
+# spreadsheet downloads of a teacher's classes (or the whole school)
+register_export(server)
+
+# latency and data load metrics on /metrics, when enabled
+instrument_callbacks(app)
+register_metrics(server)
+
+# on-demand profiles of chosen callbacks, viewed on /profiles, when enabled
+profile_callbacks(app)
+register_profiling(server)
+
+# development server, use gunicorn with src/wsgi.py in production
 if __name__ == "__main__":
-    app.run_server(debug=True)
+    app.run(debug=True)
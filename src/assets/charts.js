@@ -0,0 +1,141 @@
+// Student tab charts, drawn in the browser from the per-student bundle (graphs.student_bundle).
+// Each function mirrors the figure builder of the same name in graphs.py, using the static
+// chart templates from graphs.chart_templates(). When only a switch changes, the chart is updated
+// with a partial figure update (figurePatch), so plotly keeps the template and trace styling it has.
+
+function attendanceFigure(crosstab, overall, templates) {
+    const t = templates.attendance;
+    let percents, counts, subjects, gap;
+
+    // initial chart
+    if (!crosstab) {
+        percents = [[0], [0], [0], [0]];
+        counts = [[0], [0], [0], [0]];
+        subjects = [''];
+        gap = 0;
+
+    // overall chart
+    } else if (overall) {
+        const totals = t.status.map((_, n) => crosstab.counts.reduce((sum, course) => sum + course[n], 0));
+        const total = totals.reduce((a, b) => a + b, 0);
+        counts = totals.map(x => [x]);
+        percents = totals.map(x => [total !== 0 ? x / total * 100 : 0]);
+        subjects = [''];
+        gap = 0.7;
+
+    // course specific charts
+    } else {
+        const courses = crosstab.counts;
+        counts = courses.length ? courses[0].map((_, n) => courses.map(row => row[n])) : [];
+        percents = counts.map((_, n) => courses.map(row => {
+            const total = row.reduce((a, b) => a + b, 0);
+            return total !== 0 ? Math.round(row[n] / total * 100 * 100) / 100 : 0;
+        }));
+        subjects = crosstab.courses;
+        gap = 0.2;
+    }
+
+    const data = percents.map((x, n) => ({
+        type: 'bar',
+        y: subjects,
+        x: x,
+        name: t.status[n],
+        orientation: 'h',
+        marker: {color: t.colors[n], line: {width: 1}},
+        customdata: counts[n],
+        hovertemplate: t.hover[n]
+    }));
+    const layout = Object.assign({}, t.layout, {bargap: gap, template: templates.template});
+    return {data: data, layout: layout};
+}
+
+function workhabitFigure(series, templates) {
+    const t = templates.workhabit;
+    const dates = series.dates;
+
+    // tick spacing based on the date range
+    let dtick = 'Y1';
+    if (dates.length) {
+        const days = (Date.parse(dates[dates.length - 1]) - Date.parse(dates[0])) / 86400000;
+        dtick = days <= 7 ? 'D1' : days <= 30 ? 'W1' : days <= 365 ? 'M1' : 'Y1';
+    }
+
+    const trace = Object.assign({}, t.trace, {x: dates, y: series.codes});
+    const layout = Object.assign({}, t.layout, {
+        xaxis: Object.assign({}, t.xaxis, {dtick: dtick}),
+        template: templates.template
+    });
+
+    // red line and annotation for each absence
+    if (series.absences.length) {
+        layout.shapes = series.absences.map(date => Object.assign({}, t.shape, {x0: date, x1: date}));
+        layout.annotations = series.absences.map(date => Object.assign({}, t.annotation, {x: date}));
+    }
+    return {data: [trace], layout: layout};
+}
+
+function timespentFigure(work, templates) {
+    const t = templates.timespent;
+    const proportions = work.counts.map(count => work.total ? count / work.total : null);
+    const trace = Object.assign({}, t.trace, {x: t.subjects, y: proportions, customdata: work.counts});
+    const layout = Object.assign({}, t.layout, {template: templates.template});
+    return {data: [trace], layout: layout};
+}
+
+// Converts a figure into a partial update of the figure on screen. Traces are updated in place
+// (traceKeys) or replaced whole when traceKeys is null, as when the trace type changes. Layout
+// keys missing from the figure are removed from the one on screen.
+function figurePatch(figure, traceKeys, layoutKeys) {
+    const patch = new window.dash_clientside.Patch();
+    if (traceKeys === null) {
+        patch.assign(['data'], figure.data);
+    } else {
+        figure.data.forEach((trace, n) => traceKeys.forEach(key => patch.assign(['data', n, key], trace[key])));
+    }
+    layoutKeys.forEach(key => key in figure.layout ? patch.assign(['layout', key], figure.layout[key]) : patch.delete(['layout', key]));
+    return patch.build();
+}
+
+// true if the callback was triggered by the given switch alone
+function switchedBy(index) {
+    const triggered = window.dash_clientside.callback_context.triggered_id;
+    return Boolean(triggered && triggered.index === index);
+}
+
+// layout keys either study habits chart may set, so a patch clears the ones the other chart left behind
+function studyHabitsLayoutKeys(templates) {
+    const keys = Object.keys(templates.workhabit.layout).concat(Object.keys(templates.timespent.layout));
+    return Array.from(new Set(keys.concat(['xaxis', 'shapes', 'annotations'])));
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    charts: {
+        // schedule, work habit card, note and attendance patterns
+        student_details: function(bundle, templates) {
+            if (!bundle || !bundle.student) {
+                return [templates.default_schedule, 'Trend', '∅', '∅', 'Select a student to view/edit notes...', 'Select a student...'];
+            }
+            const note = bundle.note || `Type notes for ${bundle.student} here...`;
+            const patterns = bundle.patterns.length ? bundle.patterns.join('\n') : 'No absence or late patterns.';
+            return [bundle.schedule, bundle.trend.message, bundle.trend.icon, bundle.trend.avg, note, patterns];
+        },
+
+        // attendance bar chart, overall or per course
+        attendance: function(by_course, bundle, templates) {
+            if (!bundle) {
+                return window.dash_clientside.no_update;
+            }
+            const figure = attendanceFigure(bundle.student ? bundle.attendance : null, !by_course, templates);
+            return switchedBy('attendance-toggle') ? figurePatch(figure, ['x', 'y', 'customdata'], ['bargap']) : figure;
+        },
+
+        // work habit timeline or time spent bar chart
+        study_habits: function(time_spent, bundle, templates) {
+            if (!bundle) {
+                return window.dash_clientside.no_update;
+            }
+            const figure = time_spent ? timespentFigure(bundle.work, templates) : workhabitFigure(bundle.habits, templates);
+            return switchedBy('graph-toggle') ? figurePatch(figure, null, studyHabitsLayoutKeys(templates)) : figure;
+        }
+    }
+});
@@ -0,0 +1,46 @@
+// Custom AgGrid components. StudentSelect edits a student cell with a dropdown searched on the
+// server as the user types (/students/search, search.register_search), so the grid never
+// carries the whole roster.
+
+var dagcomponentfuncs = (window.dashAgGridComponentFunctions = window.dashAgGridComponentFunctions || {});
+
+dagcomponentfuncs.StudentSelect = function (props) {
+    const current = props.value ? [{label: props.value, value: props.value}] : [];
+    const [options, setOptions] = React.useState(current);
+
+    function search(text) {
+        fetch('/students/search?' + new URLSearchParams({q: text}).toString(), {cache: 'no-store'})
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            // the typed text is added to each option's search field, so the dropdown's own
+            // filter keeps names matched by their letters only (as callbacks.student_options)
+            .then(found => setOptions(found.map(option => Object.assign({}, option, {search: option.label + ' ' + text}))))
+            .catch(() => setOptions(current));
+    }
+
+    function setProps(changed) {
+        if (typeof changed.search_value !== 'undefined') {
+            search(changed.search_value || '');
+        }
+        if (typeof changed.value !== 'undefined') {
+            // reactive editors report their value to the grid, older ones set the cell
+            if (props.onValueChange) {
+                props.onValueChange(changed.value);
+            } else {
+                props.node.setDataValue(props.column.getColId(), changed.value);
+            }
+            setTimeout(() => props.api.stopEditing(), 0);
+        }
+    }
+
+    React.useEffect(() => search(''), []);
+
+    return React.createElement(window.dash_core_components.Dropdown, {
+        options: options,
+        value: props.value,
+        setProps: setProps,
+        searchable: true,
+        clearable: false,
+        placeholder: 'Type a name',
+        style: {width: props.column.getActualWidth() + 'px', fontSize: '0.7rem'}
+    });
+};
@@ -0,0 +1,111 @@
+// Change feed: long-polls /changes (feed.register_feed) for deadlines, tasks, attendance and
+// notes rows written in any session, and puts each batch of changes in the change-feed store. The
+// callbacks below apply them to whatever the page is showing. A busy server answers at once
+// with the seconds to wait before polling again (retry).
+
+const FEED_STORE = {index: 'change-feed', type: 'dynamic-output'};
+const UPCOMING_DAYS = 28;  // data.upcoming_deadlines window
+
+(function pollChanges() {
+    let versions = null;
+
+    function poll() {
+        const query = versions ? '?' + new URLSearchParams(versions).toString() : '';
+        fetch('/changes' + query, {cache: 'no-store'})
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(result => {
+                const first = versions === null;
+                versions = result.versions;
+                if (!first && (Object.keys(result.changes).length || result.reset.length)) {
+                    window.dash_clientside.set_props(FEED_STORE, {data: result});
+                }
+                if (result.retry) {
+                    setTimeout(poll, result.retry * 1000);
+                } else {
+                    poll();
+                }
+            })
+            // server restarting or unreachable, try again shortly
+            .catch(() => setTimeout(poll, 5000));
+    }
+
+    // wait for the dash renderer before the first update
+    window.addEventListener('load', poll);
+})();
+
+function changedRows(feed, table) {
+    return (feed.changes[table] || []).flatMap(entry => entry.rows);
+}
+
+function formatDue(date) {
+    return date.toLocaleDateString('en-US', {month: 'short', day: '2-digit', timeZone: 'UTC'});
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    feed: {
+        // add new deadlines in the upcoming window to the Upcoming Deadlines table, or reload
+        // it from the server if the feed was missing entries
+        deadlines: function(feed, table_data) {
+            const no_update = window.dash_clientside.no_update;
+            if (!feed || !table_data) {
+                return [no_update, no_update];
+            }
+            if (feed.reset.includes('deadlines')) {
+                return [no_update, true];
+            }
+            const rows = changedRows(feed, 'deadlines');
+            if (!rows.length) {
+                return [no_update, no_update];
+            }
+
+            const today = new Date(new Date().toISOString().slice(0, 10));
+            const end = new Date(today.getTime() + UPCOMING_DAYS * 86400000);
+            const key = row => [row.Task, row.Course, row.Block, row.Teacher, row.Due_date].join('|');
+            const existing = new Set(table_data.map(key));
+
+            const added = rows
+                .map(row => Object.assign({}, row, {Due_date: row.Due.slice(0, 10)}))
+                .filter(row => {
+                    const due = new Date(row.Due_date);
+                    return due >= today && due <= end && !existing.has(key(row));
+                })
+                .map(row => Object.assign(row, {Due: formatDue(new Date(row.Due_date))}));
+            if (!added.length) {
+                return [no_update, no_update];
+            }
+            const merged = table_data.concat(added).sort((a, b) => a.Due_date.localeCompare(b.Due_date));
+            return [merged, no_update];
+        },
+
+        // reload the student task table if the selected student's tasks changed
+        tasks: function(feed, role, student, saved) {
+            if (!feed || role !== 'Student' || !student) {
+                return window.dash_clientside.no_update;
+            }
+            const affected = feed.reset.includes('tasks') || changedRows(feed, 'tasks').some(row => row.Student === student);
+            return affected ? (saved || 0) + 1 : window.dash_clientside.no_update;
+        },
+
+        // reload the student tab if the selected student's attendance changed
+        attendance: function(feed, student, refresh) {
+            if (!feed || !student) {
+                return window.dash_clientside.no_update;
+            }
+            const affected = feed.reset.includes('attendance') || changedRows(feed, 'attendance').some(row => row.Student === student);
+            return affected ? (refresh || 0) + 1 : window.dash_clientside.no_update;
+        },
+
+        // show the selected student's note if it was saved in another session
+        notes: function(feed, student, note) {
+            const no_update = window.dash_clientside.no_update;
+            if (!feed || !student) {
+                return no_update;
+            }
+            const saved = changedRows(feed, 'notes').filter(row => row.Student === student);
+            if (!saved.length || saved[saved.length - 1].Note === note) {
+                return no_update;
+            }
+            return saved[saved.length - 1].Note;
+        }
+    }
+});
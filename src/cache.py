@@ -0,0 +1,354 @@
+import os
+import pickle
+import hashlib
+import threading
+import functools
+import contextlib
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from .config import TABLES, VERSIONS_DIR, MEMO_CACHE, MEMO_DIR, MEMO_SIZE
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+@contextlib.contextmanager
+def locked_file(path, mode='a+', exclusive=True):
+    """Context manager that opens a file and holds an flock on it. The lock is released before
+    the file is closed: a process forked in the meantime (a background callback job) shares the
+    open file, and would otherwise keep it locked for as long as the job runs.
+
+    Parameters
+    ----------
+    path: str
+        The path of the file.
+    mode: str
+        The mode to open the file with.
+    exclusive: bool
+        An exclusive lock if True, a shared one if False.
+    """
+    with open(path, mode) as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+# DATA VERSIONS
+# Each table has a counter, shared between processes through a small file, that every
+# write bumps. Together with the file's modification time and size it identifies the
+# current contents of the table, so cached results can be keyed by it.
+def file_signature(path):
+    """Identifies the current contents of a file by its modification time and size, to notice
+    writes made outside the app.
+
+    Parameters
+    ----------
+    path: str
+        The path of the file.
+
+    Returns
+    -------
+    tuple: (mtime_ns, size), or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _version_path(table):
+    return os.path.join(VERSIONS_DIR, table)
+
+def _read_counter(table):
+    try:
+        with open(_version_path(table)) as f:
+            return int(f.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+def data_version(table):
+    """Retrieves the current version of a table.
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, a key of config.TABLES.
+
+    Returns
+    -------
+    tuple: (counter, file signature). Changes whenever the table is written.
+    """
+    return (_read_counter(table), file_signature(TABLES[table]))
+
+def bump_version(table):
+    """Marks a table as changed. Called after every write to the table's CSV file.
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, a key of config.TABLES.
+
+    Returns
+    -------
+    int: The new counter value.
+    """
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    with locked_file(_version_path(table)) as f:
+        f.seek(0)
+        counter = int(f.read() or 0) + 1
+        f.seek(0)
+        f.truncate()
+        f.write(str(counter))
+        f.flush()
+    return counter
+
+_table_locks = {table: threading.Lock() for table in TABLES}
+
+def _reset_table_locks():
+    # a background job forked while another thread held a lock would wait for it forever
+    for table in _table_locks:
+        _table_locks[table] = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_table_locks)
+
+@contextlib.contextmanager
+def table_lock(table):
+    """Context manager that holds an exclusive lock on a table, across threads and worker
+    processes, for a load-modify-write of its CSV file.
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, a key of config.TABLES.
+    """
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    with _table_locks[table], locked_file(_version_path(table) + '.lock', 'a'):
+        yield
+
+# CACHE BACKENDS
+class LRUCache:
+    """In-process cache that keeps the most recently used entries.
+
+    Parameters
+    ----------
+    maxsize: int
+        The number of entries to keep.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (True, value) if key is cached, otherwise (False, None)."""
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class FileCache:
+    """Cache stored as pickle files in a directory, shared by every worker process on the machine.
+    The entries a process used last are also kept in memory, in front of the files: results are
+    keyed by data version and never change, and large ones (e.g. the student search index) are
+    slower to unpickle than to compute.
+
+    Parameters
+    ----------
+    directory: str
+        The directory to store entries in.
+    maxsize: int
+        The number of entries to keep. The least recently written entries are removed first.
+    prune_every: int
+        The number of entries a process writes between two scans of the directory for entries
+        to remove, so it may hold up to prune_every more entries per process in the meantime.
+    memory: int
+        The number of entries each process keeps in memory.
+    """
+    def __init__(self, directory, maxsize=1024, prune_every=64, memory=32):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self.memory = LRUCache(memory)
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(pickle.dumps(key)).hexdigest()
+        return os.path.join(self.directory, digest + '.pkl')
+
+    def get(self, key):
+        """Returns (True, value) if key is cached, otherwise (False, None)."""
+        found, value = self.memory.get(key)
+        if found:
+            return True, value
+        try:
+            with open(self._path(key), 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False, None
+        if stored_key != key:
+            return False, None
+        self.memory.set(key, value)
+        return True, value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((key, value), f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')]
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in entries[:len(entries) - self.maxsize]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        self.memory.clear()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                os.remove(entry.path)
+
+def make_cache(kind=MEMO_CACHE):
+    """Creates the cache backend named in the configuration.
+
+    Parameters
+    ----------
+    kind: str
+        'memory' for an in-process LRU cache, 'file' for a filesystem cache shared between
+        workers, or 'off' to disable memoization.
+
+    Returns
+    -------
+    LRUCache, FileCache or None.
+    """
+    if kind == 'memory':
+        return LRUCache(MEMO_SIZE)
+    if kind == 'file':
+        return FileCache(MEMO_DIR, MEMO_SIZE)
+    return None
+
+default_cache = make_cache()
+
+# MEMOIZATION
+# results made of these are returned as they are, without a call per value
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+# always on from pandas 3, an option before (reading it warns from pandas 3)
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+def _copy(value):
+    # a copy of a cached result the caller may modify without changing the cached one. DataFrames
+    # and Series are copied shallowly with copy-on-write, their data being copied only once either
+    # side modifies it, and deeply without. numpy arrays are not copied but made read-only, in
+    # the cached result too
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not COPY_ON_WRITE)
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value
+    if isinstance(value, dict):
+        return {key: item if type(item) in _IMMUTABLE else _copy(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [item if type(item) in _IMMUTABLE else _copy(item) for item in value]
+        return items if isinstance(value, list) else tuple(items)
+    return value
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _count(name, outcome):
+    with _stats_lock:
+        counts = _stats.setdefault(name, {'hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+def memoize(*tables, cache=None):
+    """Decorator that caches a read-only data function's results, keyed by its arguments and the
+    current versions of the tables it reads. A write to any of the tables bumps its version, so
+    stale results are never returned. Calls given a pre-loaded DataFrame are not cached. Each
+    call returns its own copy of the result, with numpy arrays read-only.
+
+    Parameters
+    ----------
+    *tables: str
+        The tables (keys of config.TABLES) the function reads.
+    cache: LRUCache or FileCache, optional
+        The cache backend. Defaults to the one named in the configuration.
+
+    Returns
+    -------
+    callable: The decorator.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            backend = cache if cache is not None else default_cache
+            values = list(args) + list(kwargs.values())
+            if backend is None or any(isinstance(value, pd.DataFrame) for value in values):
+                return func(*args, **kwargs)
+
+            key = (name, args, tuple(sorted(kwargs.items())), tuple(data_version(table) for table in tables))
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            found, result = backend.get(key)
+            if found:
+                _count(name, 'hits')
+                return _copy(result)
+
+            _count(name, 'misses')
+            result = func(*args, **kwargs)
+            backend.set(key, result)
+            return _copy(result)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+def cache_stats():
+    """Retrieves the hit and miss counts of each memoized function in this process.
+
+    Returns
+    -------
+    dict: Keyed by function name, with 'hits', 'misses' and 'hit_rate'.
+    """
+    with _stats_lock:
+        stats = {name: dict(counts) for name, counts in _stats.items()}
+    for counts in stats.values():
+        calls = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / calls if calls else 0.0
+    return stats
@@ -1,24 +1,33 @@
 import dash
 from dash import ctx
-import dash.html as html
-import dash.dcc as dcc
 from datetime import datetime, timedelta
-import os
-from dash.dependencies import Input, Output, State, MATCH
-from dash import dash_table
-from .data import student_list, student_schedule, teacher_list, student_deadlines, teacher_roster, teacher_tasks, get_student_note, save_student_note, save_workhabits_data, save_deadlines_data, save_deleted_changes, save_checked_changes, workhabit_trend, upcoming_deadlines
-from .graphs import attendance_barchart, workhabit_timeline, timespent_barchart
+import json
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from .data import teacher_list, student_task_page, TASK_KEY, teacher_roster, teacher_tasks, save_student_note, save_workhabits_data, save_deadlines_data, save_task_changes, upcoming_deadlines
+from .graphs import student_bundle, cohort_heatmap_dict, deadline_load_dict
+from .risk import risk_page, roster_risk
+from .streaks import pattern_page, pattern_report, ALL_CLASSES
+from .search import search_students, match_student
+from .workload import crunch_page, crunch_report, student_load
+from .export import export_url
 from dash import callback_context
 from .components import *
 from .config import * 
 
-# FIX 
-#start = datetime.today() - timedelta(weeks=70)
-# end = datetime.today() + timedelta(weeks=3)
-# start_str = start.strftime('%Y-%m-%d')
-# end_str = end.strftime('%Y-%m-%d')
-# dcc.Store(id={'type': 'dynamic-input', 'index': 'start-date'}, data=start_str), 
-# dcc.Store(id={'type': 'dynamic-input', 'index': 'end-date'}, data=end_str),
+def task_key(row):
+    """Identifies a student task table row by its task, course, teacher and block, as a string 
+    to use as a key in the browser stores."""
+    return json.dumps([row.get(col) for col in TASK_KEY])
+
+def student_options(options, search_value=None, selected=None):
+    """Prepares searched students as dropdown options. The selected student is kept, or its label 
+    would disappear, and the typed text is added to each option's search field: the dropdown also 
+    filters its options by the typed text, and would hide names matched by their letters only."""
+    if selected and selected not in [option['value'] for option in options]:
+        options = [{'label': selected, 'value': selected}] + options
+    if search_value:
+        options = [dict(option, search=f"{option['label']} {search_value}") for option in options]
+    return options
 
 def register_callbacks(app):
 
@@ -44,100 +53,104 @@ def register_callbacks(app):
         elif tab == 'task-tab':
             return task_tab
 
+        elif tab == 'risk-tab':
+            return risk_tab
+
     # TAB 1 
-    # Updating student schedule when the student is selected 
+    # Student options, searched on the server as the name is typed
     @app.callback(
-        Output({'type': 'dynamic-output', 'index': 'course-table'}, 'data'), 
-        Input({'type': 'dynamic-input', 'index': 'student-select'}, 'value') 
+        Output({'type': 'dynamic-input', 'index': 'student-select'}, 'options'),
+        [
+            Input({'type': 'dynamic-input', 'index': 'student-select'}, 'search_value'),
+            Input({'type': 'dynamic-input', 'index': 'student-teacher-filter'}, 'value'),
+            Input({'type': 'dynamic-input', 'index': 'student-course-filter'}, 'value')
+        ],
+        State({'type': 'dynamic-input', 'index': 'student-select'}, 'value')
     )
-    def update_schedule(selected_student):
-        if selected_student:
-            return student_schedule(selected_student)
-        return default_schedule
+    def update_student_options(search_value, teacher, course, selected_student):
+        return student_options(search_students(search_value, teacher, course), search_value, selected_student)
 
-    # Update Work habit card
+    # Student selection and note saving. One request per selection loads everything the 
+    # student tab shows, each CSV is read once.
     @app.callback(
         [
+            Output({'type': 'dynamic-output', 'index': 'student-bundle'}, 'data'), 
+            Output({'type':'dynamic-output','index':'output-msg-note'}, 'children'),
+            Output({'type': 'dynamic-input', 'index': 'save-note-button'}, 'n_clicks')
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'student-select'}, 'value'),
+            Input({'type': 'dynamic-input', 'index': 'save-note-button'},'n_clicks'),
+            Input({'type': 'dynamic-output', 'index': 'student-refresh'}, 'data')
+        ],
+        State({'type': 'note-input', 'index': 'teacher-notes'}, 'value')      
+    )
+    def update_student(selected_student, n_clicks, refresh, note_value):
+        triggered_id = callback_context.triggered[0]['prop_id'].split('.')[0]
+
+        # reload when the student's attendance was changed in another session
+        if 'student-refresh' in triggered_id:
+            if selected_student:
+                return student_bundle(selected_student), dash.no_update, dash.no_update
+            return dash.no_update, dash.no_update, dash.no_update
+
+        # save note when save is clicked
+        if 'save-note-button' in triggered_id:
+            if n_clicks and selected_student and note_value:
+                save_student_note(selected_student, note_value)
+                return dash.no_update, "Note saved.", 0 
+            return dash.no_update, '', 0
+
+        # load the selected student
+        if selected_student:
+            return student_bundle(selected_student), '', 0
+        return student_bundle(None), '', 0
+
+    # Schedule, work habit card, notes and attendance patterns are filled in from the bundle in the browser (assets/charts.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='charts', function_name='student_details'),
+        [
+            Output({'type': 'dynamic-output', 'index': 'course-table'}, 'data'), 
             Output({'type': 'dynamic-output', 'index': 'work-habit-message'}, 'children'),
             Output({'type': 'dynamic-output', 'index': 'work-habit-icon'}, 'children'), 
-            Output({'type': 'dynamic-output', 'index': 'work-habit-avg'}, 'children')
+            Output({'type': 'dynamic-output', 'index': 'work-habit-avg'}, 'children'),
+            Output({'type': 'note-input', 'index': 'teacher-notes'}, 'value'),
+            Output({'type': 'dynamic-output', 'index': 'attendance-patterns'}, 'children')
         ],
-        Input({'type': 'dynamic-input', 'index': 'student-select'}, 'value')
+        Input({'type': 'dynamic-output', 'index': 'student-bundle'}, 'data'),
+        State({'type': 'dynamic-input', 'index': 'chart-templates'}, 'data')
     )
-    def update_workhabit_card(selected_student):
-        if selected_student:
-            message, avg, icon = workhabit_trend(selected_student)         
-            return message, icon, avg
-        return "Trend", "∅", "∅"
 
-    # Update attendance graph based on student and graph type 
-    @app.callback(
+    # Clear the note output message when the note is edited
+    app.clientside_callback(
+        "function(note) { return ''; }",
+        Output({'type':'dynamic-output','index':'output-msg-note'}, 'children', allow_duplicate=True),
+        Input({'type': 'note-input', 'index': 'teacher-notes'}, 'value'),
+        prevent_initial_call=True
+    )
+
+    # Attendance graph, the toggle is handled in the browser
+    app.clientside_callback(
+        ClientsideFunction(namespace='charts', function_name='attendance'),
         Output({'type': 'dynamic-output', 'index': 'attendance-graph'}, 'figure'), 
         [
             Input({'type': 'dynamic-input', 'index': 'attendance-toggle'}, 'value'),
-            Input({'type': 'dynamic-input', 'index': 'student-select'}, 'value')
-        ]  
+            Input({'type': 'dynamic-output', 'index': 'student-bundle'}, 'data')
+        ],
+        State({'type': 'dynamic-input', 'index': 'chart-templates'}, 'data')
     )
-    def update_attendance_bar_chart(selected_graph, selected_student):
-        if not selected_student:
-            return attendance_barchart()
-        if selected_graph:
-            return attendance_barchart(selected_student, False)
-        else:
-            return attendance_barchart(selected_student, True)
         
-    # Updating timeline/barchart graph based on student and graph selection 
-    @app.callback(
+    # Timeline/barchart graph, the toggle is handled in the browser
+    app.clientside_callback(
+        ClientsideFunction(namespace='charts', function_name='study_habits'),
         Output({'type': 'dynamic-output', 'index': 'graph-output'}, 'figure'),
-        [Input({'type': 'dynamic-input', 'index': 'graph-toggle'}, 'value'),
-        Input({'type': 'dynamic-input', 'index': 'student-select'}, 'value')],
-    )
-    def update_graph(selected_graph, selected_student):      
-        if selected_graph:  
-            return timespent_barchart(selected_student)
-        else:  
-            return workhabit_timeline(selected_student)
-
-    # Update Notes when student is selected
-    @app.callback(
-        Output({'type': 'note-input', 'index': 'teacher-notes'}, 'value'), 
-        Input({'type': 'dynamic-input', 'index': 'student-select'}, 'value')
-    )
-    def update_notes(student_selected):
-        if not student_selected:
-            return "Select a student to view/edit notes..."
-        else:
-            # get to display
-            student_note = get_student_note(student_selected)
-            if student_note:
-                return student_note
-            return f"Type notes for {student_selected} here..."
-
-    # Update student notes in CSV when save is clicked
-    @app.callback(
         [
-            Output({'type':'dynamic-output','index':'output-msg-note'}, 'children'),
-            Output({'type': 'dynamic-input', 'index': 'save-note-button'}, 'n_clicks')
+            Input({'type': 'dynamic-input', 'index': 'graph-toggle'}, 'value'),
+            Input({'type': 'dynamic-output', 'index': 'student-bundle'}, 'data')
         ],
-        [   
-            Input({'type': 'note-input', 'index': 'teacher-notes'}, 'value'),  
-            Input({'type': 'dynamic-input', 'index': 'save-note-button'},'n_clicks'),
-            Input({'type': 'dynamic-input', 'index': 'student-select'}, 'value')
-        ], 
-        State({'type': 'note-input', 'index': 'teacher-notes'}, 'value')      
+        State({'type': 'dynamic-input', 'index': 'chart-templates'}, 'data')
     )
 
-    def save_notes(note_value, n_clicks, student_selected, current_note_value):
-        if student_selected is None or note_value != current_note_value: 
-            return '', 0  # clears output message and resets button
-        
-        if n_clicks > 0: 
-
-            if student_selected and note_value:
-                save_student_note(student_selected, note_value)
-                return "Note saved.", 0 
-        return '', 0 
-    
     # Work Habit Data - User input 
     @app.callback(
         [
@@ -177,6 +190,18 @@ def register_callbacks(app):
             # error message for no valid data 
             if not cleaned_data:
                 return existing_data, 'No valid data to save.'
+
+            # only names on the roster are saved (ignoring case and spacing), others are
+            # reported with the students they could be
+            unknown = []
+            for row in cleaned_data:
+                student = match_student(row['Student'])
+                if student is None:
+                    candidates = [option['value'] for option in search_students(row['Student'], limit=3)] if row['Student'] else []
+                    unknown.append((row['Student'] or '(blank)') + (f" (did you mean {', '.join(candidates)}?)" if candidates else ''))
+                row['Student'] = student or row['Student']
+            if unknown:
+                return existing_data, f"Unknown student: {'; '.join(unknown)}."
             
             saved_message = save_workhabits_data(cleaned_data, date)
             reset_data = [{'Student': '', 'Workhabit Score': '', 'Focus': '', 'Support Attendance': ''}]
@@ -185,216 +210,372 @@ def register_callbacks(app):
         return existing_data, ''
       
     # TAB 2
-    # Update 2nd Dropdown when first dropdown is selected
+    # Update 2nd Dropdown when first dropdown is selected, students are searched as they are typed
     @app.callback(
         [
             Output({'type': 'dynamic-input', 'index': 'select-item'}, 'options'),
             Output({'type': 'dynamic-input', 'index': 'select-item'}, 'placeholder')
         ],
-        Input({'type': 'dynamic-input', 'index': 'select-type'}, 'value')
+        [
+            Input({'type': 'dynamic-input', 'index': 'select-type'}, 'value'),
+            Input({'type': 'dynamic-input', 'index': 'select-item'}, 'search_value')
+        ],
+        State({'type': 'dynamic-input', 'index': 'select-item'}, 'value')
     )
-    def update_dropdown(selected_type=None):
+    def update_dropdown(selected_type=None, search_value=None, selected_item=None):
+        triggered_id = callback_context.triggered[0]['prop_id'].split('.')[0]
+        if 'select-item' in triggered_id and selected_type != 'Student':
+            return dash.no_update, dash.no_update
+
         if selected_type == 'Teacher':
             options = teacher_list()
             placeholder = "Select a teacher"
         elif selected_type == 'Student':
-            options = student_list()
-            placeholder = "Select a student"
+            selected = selected_item if 'select-item' in triggered_id else None
+            options = student_options(search_students(search_value), search_value, selected)
+            placeholder = "Type to search students"
         else:
             options = []
             placeholder = ""
         return options, placeholder
     
     # Tab 2 - Col 2 task tables 
-    task_default_df = pd.DataFrame([['','','','']]*3)
-
+    # The panels are part of the layout, only their visibility and data change
     @app.callback(
-        Output({'type': 'dynamic-input', 'index': 'dynamic-task-tables'}, 'children'), 
+        [
+            Output({'type': 'dynamic-output', 'index': 'default-task-panel'}, 'style'),
+            Output({'type': 'dynamic-output', 'index': 'student-task-panel'}, 'style'),
+            Output({'type': 'dynamic-output', 'index': 'teacher-task-panel'}, 'style')
+        ],
         [
             Input({'type': 'dynamic-input', 'index': 'select-type'}, 'value'), 
             Input({'type': 'dynamic-input', 'index': 'select-item'}, 'value'), 
         ],
         prevent_initial_call=True
+    )
+    def update_task_panels(role, name):
+        shown = {}
+        if role == 'Student' and name:
+            return hidden_panel, shown, hidden_panel
+        elif role == 'Teacher' and name:
+            return hidden_panel, hidden_panel, shown
+        return shown, hidden_panel, hidden_panel
 
+    # Teacher panel - assigned tasks, roster and class attendance
+    @app.callback(
+        [
+            Output({'type': 'dynamic-output', 'index': 'teacher-task-title'}, 'children'),
+            Output({'type': 'dynamic-input', 'index': 'teacher-task-table'}, 'columns'),
+            Output({'type': 'dynamic-input', 'index': 'teacher-task-table'}, 'data'),
+            Output({'type': 'dynamic-input', 'index': 'date-picker-tasks'}, 'start_date'),
+            Output({'type': 'dynamic-input', 'index': 'date-picker-tasks'}, 'end_date'),
+            Output({'type': 'dynamic-output', 'index': 'cohort-heatmap'}, 'figure')
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'select-type'}, 'value'), 
+            Input({'type': 'dynamic-input', 'index': 'select-item'}, 'value'), 
+        ],
+        prevent_initial_call=True
     )
-    def update_content_t2col2(role, name):
+    def update_teacher_panel(role, name):
+        if role != 'Teacher' or not name:
+            return [dash.no_update] * 6
+
+        teacher_roster_dict = teacher_roster(name)
+        start = datetime.today() - timedelta(weeks=70)
+        end = datetime.today() + timedelta(weeks=3)
+
+        start_str = start.strftime('%Y-%m-%d')
+        end_str = end.strftime('%Y-%m-%d')
+
+        teacher_task_dict = teacher_tasks(name, start_str, end_str)
+        columns = [{'name': col, 'id': col} for col in teacher_roster_dict.keys()]
+        data = [{col: '\n'.join(map(str, students)) for col, students in teacher_task_dict.items()},
+                {col: '\n'.join(map(str, students)) for col, students in teacher_roster_dict.items()}]
+        return f'{name} - Assigned Tasks', columns, data, start_str, end_str, cohort_heatmap_dict(name)
 
-        if role == 'Student' and name:
-            table_data, selected_indicies = student_deadlines(name)
-
-            return html.Div([
-                html.H6(f'{name} - Tasks'),
-                dash_table.DataTable(
-                    id={'type':'dynamic-input', 'index':'student-task-table'}, 
-                    columns=[{'name':'Due', 'id':'Due'}, 
-                             {'name':'Task', 'id':'Task'}, 
-                             {'name':'Course', 'id':'Course'}, 
-                             {'name':'Teacher', 'id':'Teacher'}, 
-                             {'name':'Block', 'id':'Block'}], 
-                    data=table_data,
-                    style_cell={'textAlign':'center', 'fontSize':'0.7rem'}, 
-                    style_header={'fontWeight': 'bold', 'textAlign':'center'},                  
-                    row_selectable='multi', 
-                    row_deletable=True, 
-                    selected_rows=selected_indicies
-                ), 
-                html.Div([
-                    # Output message
-                    html.Div(id={'type':'dynamic-output','index':'output-student-task'}, style={'marginRight':'10px','fontSize':'0.7rem'}),
-
-                    # Save button
-                    dbc.Button('Save', id={'type': 'dynamic-input', 'index': 'save-student-tasks'}, n_clicks=0, 
-                            style={'marginTop': '10px','fontSize':'0.7rem'})
-                ], style={
-                    'display': 'flex',
-                    'justifyContent': 'flex-end',  
-                    'marginTop': '10px', 
-                    'alignItems': 'center'
-                })     
-            ])
-
-        elif role == 'Teacher' and name: 
-
-            teacher_roster_dict = teacher_roster(name)
-            start = datetime.today() - timedelta(weeks=70)
-            end = datetime.today() + timedelta(weeks=3)
-
-            start_str = start.strftime('%Y-%m-%d')
-            end_str = end.strftime('%Y-%m-%d')
-
-            teacher_task_dict = teacher_tasks(name, start_str, end_str)
-            return html.Div([
-                    html.Div([
-                        html.H6(f'{name} - Assigned Tasks'), 
-                        # Date 
-                        dcc.DatePickerRange(
-                            id={'type': 'dynamic-input', 'index': 'date-picker-tasks'},
-                            start_date_placeholder_text="Start date",
-                            end_date_placeholder_text="End date",
-                            start_date=start_str,
-                            end_date=end_str, 
-                            style={'marginBottom':'10px'}
-                        ),
-                    ], 
-                        style={'display': 'flex', 'justify-content': 'space-between', 'align-items': 'center', 'width': '100%'}  
-                    ), 
-            # Table
-            dash_table.DataTable(
-                columns=[{'name': col, 'id': col} for col in teacher_roster_dict.keys()], 
-                data=[{col: '\n'.join(map(str, students)) for col, students in teacher_task_dict.items()},
-                    {col: '\n'.join(map(str, students)) for col, students in teacher_roster_dict.items()}],
-                style_data={'whiteSpace': 'pre-line'},
-                style_cell={'textAlign':'center', 'fontSize':'0.7rem'}, 
-                style_header={'fontWeight': 'bold', 'textAlign':'center'},  
-            )
-            ])
-        else:
-            return html.Div([
-                html.H6('Tasks'), 
-                dash_table.DataTable(
-                    id='default-table',
-                    columns=[{'name': '', 'id': ''}, {'name': '', 'id': ''}, {'name': '', 'id': ''}],
-                    data=task_default_df.to_dict('records'),
-                    style_table={'height': '200px', 'width': '100%'},
-                )
-            ])
-# FIX
     # Adjust Teacher Assigned Task table when date range is changed
-    # @app.callback(
-    #     Output({'type': 'dynamic-input', 'index': 'teacher-task-table'}, 'data'),
-    #     [
-    #         Input({'type': 'dynamic-input', 'index': 'start-date'}, 'data'),
-    #         Input({'type': 'dynamic-input', 'index': 'end-date'}, 'data'),
-    #         Input({'type': 'dynamic-input', 'index': 'select-item'}, 'value'),  # Teacher selected
-    #     ],
-    #     prevent_initial_call=True
-    # )
-    # def update_teacher_task_table(start_date, end_date, teacher_name):
-    #     print('Triggered')
-    #     if not teacher_name or not start_date or not end_date:
-    #         return dash.no_update  # If no teacher or no dates, do not update
-
-    #     # Fetch and filter teacher task data based on the selected date range
-    #     teacher_task_dict = teacher_tasks(teacher_name, start_date, end_date)
-
-    #     # Format the teacher's task data to match the table structure
-    #     table_data = [{col: '\n'.join(map(str, students)) for col, students in teacher_task_dict.items()}]
-
-    #     return table_data
+    @app.callback(
+        Output({'type': 'dynamic-input', 'index': 'teacher-task-table'}, 'data', allow_duplicate=True),
+        [
+            Input({'type': 'dynamic-input', 'index': 'date-picker-tasks'}, 'start_date'),
+            Input({'type': 'dynamic-input', 'index': 'date-picker-tasks'}, 'end_date'),
+        ],
+        [
+            State({'type': 'dynamic-input', 'index': 'select-type'}, 'value'), 
+            State({'type': 'dynamic-input', 'index': 'select-item'}, 'value')  # Teacher selected
+        ],
+        prevent_initial_call=True
+    )
+    def update_teacher_task_table(start_date, end_date, role, teacher_name):
+        if role != 'Teacher' or not teacher_name or not start_date or not end_date:
+            return dash.no_update  # If no teacher or no dates, do not update
 
-        
+        # Only the teacher's tasks in the new range are looked up, the roster is cached
+        teacher_task_dict = teacher_tasks(teacher_name, start_date, end_date)
+        teacher_roster_dict = teacher_roster(teacher_name)
+        return [{col: '\n'.join(map(str, tasks)) for col, tasks in teacher_task_dict.items()},
+                {col: '\n'.join(map(str, students)) for col, students in teacher_roster_dict.items()}]
+
+    # Teacher panel - spreadsheet links for the selected teacher and date range
+    @app.callback(
+        [
+            Output({'type': 'dynamic-output', 'index': 'export-xlsx'}, 'href'),
+            Output({'type': 'dynamic-output', 'index': 'export-roster'}, 'href'),
+            Output({'type': 'dynamic-output', 'index': 'export-tasks'}, 'href'),
+            Output({'type': 'dynamic-output', 'index': 'export-attendance'}, 'href'),
+            Output({'type': 'dynamic-output', 'index': 'export-school'}, 'href')
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'date-picker-tasks'}, 'start_date'),
+            Input({'type': 'dynamic-input', 'index': 'date-picker-tasks'}, 'end_date'),
+        ],
+        State({'type': 'dynamic-input', 'index': 'select-item'}, 'value'),
+        prevent_initial_call=True
+    )
+    def update_export_links(start_date, end_date, teacher_name):
+        if not teacher_name:
+            return [dash.no_update] * 5
+        return [export_url(teacher_name, start_date, end_date)] + \
+               [export_url(teacher_name, start_date, end_date, 'csv', part) for part in ['roster', 'tasks', 'attendance']] + \
+               [export_url(None, start_date, end_date)]
+
+
+    # Student task table - current page, after sorting and filtering. Selecting a student 
+    # starts again from the first page.
+    @app.callback(
+        [
+            Output({'type': 'dynamic-output', 'index': 'student-task-title'}, 'children'),
+            Output({'type': 'dynamic-input', 'index': 'student-task-table'}, 'data'),
+            Output({'type': 'dynamic-input', 'index': 'student-task-table'}, 'selected_rows'),
+            Output({'type': 'dynamic-input', 'index': 'student-task-table'}, 'page_count'),
+            Output({'type': 'dynamic-input', 'index': 'student-task-table'}, 'page_current'),
+            Output({'type': 'dynamic-output', 'index': 'student-task-keys'}, 'data'),
+            Output({'type': 'dynamic-output', 'index': 'student-task-edits'}, 'data', allow_duplicate=True),
+            Output({'type': 'dynamic-output', 'index': 'output-student-task'}, 'children', allow_duplicate=True)
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'select-type'}, 'value'), 
+            Input({'type': 'dynamic-input', 'index': 'select-item'}, 'value'),
+            Input({'type': 'dynamic-input', 'index': 'student-task-table'}, 'page_current'),
+            Input({'type': 'dynamic-input', 'index': 'student-task-table'}, 'sort_by'),
+            Input({'type': 'dynamic-input', 'index': 'student-task-table'}, 'filter_query'),
+            Input({'type': 'dynamic-output', 'index': 'student-task-saved'}, 'data')
+        ],
+        State({'type': 'dynamic-output', 'index': 'student-task-edits'}, 'data'),
+        prevent_initial_call=True
+    )
+    def update_student_task_page(role, student_name, page_current, sort_by, filter_query, saved, edits):
+        if role != 'Student' or not student_name:
+            return [dash.no_update] * 8
+
+        # new student
+        triggered_id = callback_context.triggered[0]['prop_id'].split('.')[0]
+        message, edits_reset = dash.no_update, dash.no_update
+        if 'select-item' in triggered_id or 'select-type' in triggered_id:
+            page_current = 0
+            edits = edits_reset = initial_task_edits
+            message = ''
+
+        sort_by = tuple((col['column_id'], col['direction']) for col in sort_by or [])
+        exclude = tuple(tuple(json.loads(key)) for key in edits['hidden'])
+        table_data, completed, page_count = student_task_page(
+            student_name, page_current or 0, TASK_PAGE_SIZE, sort_by, filter_query or '', exclude)
+
+        # unsaved checks override the saved state, which is kept to tell the checks changed
+        keys = [task_key(row) for row in table_data]
+        selected_rows = [i for i, key in enumerate(keys) if edits['completed'].get(key, completed[i])]
+        loaded = dict(zip(keys, completed))
+        return f'{student_name} - Tasks', table_data, selected_rows, page_count, page_current or 0, loaded, edits_reset, message
+
+    # Student deadline load - tasks due each week and overloaded stretches, again after saving
+    @app.callback(
+        [
+            Output({'type': 'dynamic-output', 'index': 'deadline-load'}, 'figure'),
+            Output({'type': 'dynamic-output', 'index': 'deadline-windows'}, 'children')
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'select-type'}, 'value'), 
+            Input({'type': 'dynamic-input', 'index': 'select-item'}, 'value'),
+            Input({'type': 'dynamic-output', 'index': 'student-task-saved'}, 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def update_deadline_load(role, student_name, saved):
+        if role != 'Student' or not student_name:
+            return dash.no_update, dash.no_update
+        windows = student_load(student_name)['windows']
+        text = 'Overloaded:\n' + '\n'.join(windows) if windows else 'No overloaded weeks.'
+        return deadline_load_dict(student_name), text
+
+    # Student task table - remember deletions and checks on the current page until saved
+    @app.callback(
+        Output({'type': 'dynamic-output', 'index': 'student-task-edits'}, 'data'),
+        [
+            Input({'type': 'dynamic-input', 'index': 'student-task-table'}, 'data'),
+            Input({'type': 'dynamic-input', 'index': 'student-task-table'}, 'selected_rows')
+        ],
+        [
+            State({'type': 'dynamic-output', 'index': 'student-task-keys'}, 'data'),
+            State({'type': 'dynamic-output', 'index': 'student-task-edits'}, 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def track_student_task_edits(data, selected_rows, loaded, edits):
+        keys = [task_key(row) for row in data or []]
+        selected = {keys[i] for i in selected_rows or [] if i < len(keys)}
+        hidden = set(edits['hidden'])
+        completed = dict(edits['completed'])
+
+        # only the rows deleted or checked differently than when the page was loaded
+        for key, was_completed in (loaded or {}).items():
+            if key not in keys:
+                hidden.add(key)
+                completed.pop(key, None)
+            elif (key in selected) != was_completed:
+                completed[key] = key in selected
+            else:
+                completed.pop(key, None)
+        return {'hidden': sorted(hidden), 'completed': completed}
+
+    # Student task table - save deletions and checks
     @app.callback(
-        Output({'type': 'dynamic-output', 'index': 'output-student-task'}, 'children'),
+        [
+            Output({'type': 'dynamic-output', 'index': 'output-student-task'}, 'children'),
+            Output({'type': 'dynamic-output', 'index': 'student-task-edits'}, 'data', allow_duplicate=True),
+            Output({'type': 'dynamic-output', 'index': 'student-task-saved'}, 'data')
+        ],
         Input({'type': 'dynamic-input', 'index': 'save-student-tasks'}, 'n_clicks'),
-        State({'type': 'dynamic-input', 'index': 'student-task-table'}, 'data'),
-        State({'type': 'dynamic-input', 'index': 'student-task-table'}, 'derived_virtual_selected_rows'),
-        State({'type': 'dynamic-input', 'index': 'select-item'}, 'value'), 
+        [
+            State({'type': 'dynamic-output', 'index': 'student-task-edits'}, 'data'),
+            State({'type': 'dynamic-output', 'index': 'student-task-saved'}, 'data'),
+            State({'type': 'dynamic-input', 'index': 'select-item'}, 'value')
+        ],
         prevent_initial_call=True
     )
-    def save_task_updates(n_clicks, data, selected_rows_ind, student_name):
-        # current csv
-        df_tasks = pd.read_csv(STUDENT_TASKS)
-        df_student_tasks  = df_tasks[df_tasks['Student'] == student_name]
-        msg = ""
-                
-        # update status of deleted rows in csv
-        if len(df_student_tasks) > len(data):
-            msg = save_deleted_changes(data, student_name)
-        
-        # update status of selected rows in csv
-        if selected_rows_ind is not None:
-            selected_rows_data = [data[i] for i in selected_rows_ind]
-            msg = save_checked_changes(selected_rows_data, student_name)
-        return msg
+    def save_task_updates(n_clicks, edits, saved, student_name):
+        # only the tasks deleted or checked differently are changed, in one read/write of the csv
+        hidden = [dict(zip(TASK_KEY, json.loads(key))) for key in edits['hidden']]
+        completed = [dict(zip(TASK_KEY, json.loads(key)), Completed=value) for key, value in edits['completed'].items()]
+        diff = save_task_changes(student_name, hidden=hidden, completed=completed)
+
+        if not any(diff.values()):
+            return "No changes to save.", initial_task_edits, saved
+        message = (f"Changes saved successfully ({len(diff['hidden'])} removed, {len(diff['completed'])} completed, "
+                   f"{len(diff['uncompleted'])} unchecked).")
+        return message, initial_task_edits, (saved or 0) + 1
     
     # Task Deadlines - User input
-    # Add row/submit data/append to csv/reset table
+    # Add row/clear message when cell edited
     @app.callback(
         [
             Output({'type': 'user-input', 'index': 'deadlines-table'}, 'rowData'),
-            Output({'type': 'dynamic-output', 'index': 'output-msg-deadlines'}, 'children'), 
-            Output({'index':'csv-write-flag','type':'dynamic-output'}, 'data') # to ensure csv is written prior to updating table    
+            Output({'type': 'dynamic-output', 'index': 'output-msg-deadlines'}, 'children')
         ], 
         [
             Input({'type': 'dynamic-input', 'index': 'add-row-deadlines'}, 'n_clicks'),
-            Input({'type': 'dynamic-input', 'index': 'submit-deadlines'}, 'n_clicks'), 
             Input({'type': 'user-input', 'index': 'deadlines-table'}, 'cellValueChanged')
        ], 
         State({'type': 'user-input', 'index': 'deadlines-table'}, 'rowData'),
         prevent_initial_call=True
     )
-    def update_deadlines_table(add_clicks, submit_clicks, cell_change, existing_data):
+    def update_deadlines_table(add_clicks, cell_change, existing_data):
         
         ctx = dash.callback_context 
         if not ctx.triggered:
-            return existing_data, dash.no_update, False
+            return existing_data, dash.no_update
         
         triggered_id = ctx.triggered[0]['prop_id'].split('.')[0] 
 
         # add row
         if 'add-row-deadlines' in triggered_id: 
             existing_data.append({'Task': '', 'Course': '', 'Block': '', 'Teacher': '', 'Due':''})
-            return existing_data, '', False
+            return existing_data, ''
         
         # clear message when cell edited
         if 'deadlines-table' in triggered_id and cell_change:
-            return dash.no_update, '', False
-        
-        # save submitted data
-        elif 'submit-deadlines' in triggered_id:
+            return dash.no_update, ''
+        return existing_data, ''
+
+    # Submit data/append to csv/reset table
+    # Runs as a background job, the csv files are rewritten and student tasks regenerated 
+    # without holding up a web worker. The flag is only set once the job has finished.
+    @app.callback(
+        [
+            Output({'type': 'user-input', 'index': 'deadlines-table'}, 'rowData', allow_duplicate=True),
+            Output({'type': 'dynamic-output', 'index': 'output-msg-deadlines'}, 'children', allow_duplicate=True), 
+            Output({'index':'csv-write-flag','type':'dynamic-output'}, 'data') # to ensure csv is written prior to updating table    
+        ], 
+        Input({'type': 'dynamic-input', 'index': 'submit-deadlines'}, 'n_clicks'), 
+        State({'type': 'user-input', 'index': 'deadlines-table'}, 'rowData'),
+        background=True,
+        progress=Output({'type': 'dynamic-output', 'index': 'output-msg-deadlines'}, 'children', allow_duplicate=True),
+        running=[
+            (Output({'type': 'dynamic-input', 'index': 'submit-deadlines'}, 'disabled'), True, False),
+            (Output({'type': 'dynamic-input', 'index': 'add-row-deadlines'}, 'disabled'), True, False)
+        ],
+        prevent_initial_call=True
+    )
+    def submit_deadlines(set_progress, submit_clicks, existing_data):
 
-            cleaned_data = [row for row in existing_data if any(row.values())] 
+        cleaned_data = [row for row in existing_data if any(row.values())] 
 
-            if not cleaned_data:
-                return existing_data, 'No valid data to save.', False
-
-            saved = save_deadlines_data(cleaned_data)
-           
-            # reset data
-            reset_data = [{'Task': '', 'Course': '', 'Block': '', 'Teacher': '', 'Due':''}]
-            return reset_data, saved, True
-        return existing_data, '', False
+        if not cleaned_data:
+            return existing_data, 'No valid data to save.', False
+
+        saved = save_deadlines_data(cleaned_data, progress=set_progress)
+        
+        # reset data
+        reset_data = [{'Task': '', 'Course': '', 'Block': '', 'Teacher': '', 'Due':''}]
+        return reset_data, saved, True
     
+    # CHANGE FEED
+    # Rows written in any session arrive in the change-feed store (assets/feed.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='feed', function_name='deadlines'),
+        [
+            Output({'type': 'dynamic-output', 'index': 'deadlines-table'}, 'data', allow_duplicate=True),
+            Output({'index':'csv-write-flag','type':'dynamic-output'}, 'data', allow_duplicate=True)
+        ],
+        Input({'type': 'dynamic-output', 'index': 'change-feed'}, 'data'),
+        State({'type': 'dynamic-output', 'index': 'deadlines-table'}, 'data'),
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='feed', function_name='tasks'),
+        Output({'type': 'dynamic-output', 'index': 'student-task-saved'}, 'data', allow_duplicate=True),
+        Input({'type': 'dynamic-output', 'index': 'change-feed'}, 'data'),
+        [
+            State({'type': 'dynamic-input', 'index': 'select-type'}, 'value'), 
+            State({'type': 'dynamic-input', 'index': 'select-item'}, 'value'),
+            State({'type': 'dynamic-output', 'index': 'student-task-saved'}, 'data')
+        ],
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='feed', function_name='attendance'),
+        Output({'type': 'dynamic-output', 'index': 'student-refresh'}, 'data'),
+        Input({'type': 'dynamic-output', 'index': 'change-feed'}, 'data'),
+        [
+            State({'type': 'dynamic-input', 'index': 'student-select'}, 'value'),
+            State({'type': 'dynamic-output', 'index': 'student-refresh'}, 'data')
+        ],
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='feed', function_name='notes'),
+        Output({'type': 'note-input', 'index': 'teacher-notes'}, 'value', allow_duplicate=True),
+        Input({'type': 'dynamic-output', 'index': 'change-feed'}, 'data'),
+        [
+            State({'type': 'dynamic-input', 'index': 'student-select'}, 'value'),
+            State({'type': 'note-input', 'index': 'teacher-notes'}, 'value')
+        ],
+        prevent_initial_call=True
+    )
+
     # Update Upcoming Deadlines
     @app.callback(
         Output({'type': 'dynamic-output', 'index': 'deadlines-table'}, 'data'),   
@@ -406,5 +587,73 @@ def register_callbacks(app):
             return upcoming_deadlines()
         return dash.no_update
 
+    # TAB 3
+    # Risk view - current page of the ranked roster, after sorting and filtering
+    @app.callback(
+        [
+            Output({'type': 'dynamic-output', 'index': 'risk-title'}, 'children'),
+            Output({'type': 'dynamic-input', 'index': 'risk-table'}, 'data'),
+            Output({'type': 'dynamic-input', 'index': 'risk-table'}, 'page_count')
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'risk-table'}, 'page_current'),
+            Input({'type': 'dynamic-input', 'index': 'risk-table'}, 'sort_by'),
+            Input({'type': 'dynamic-input', 'index': 'risk-table'}, 'filter_query')
+        ]
+    )
+    def update_risk_table(page_current, sort_by, filter_query):
+        sort_by = tuple((col['column_id'], col['direction']) for col in sort_by or [])
+        rows, page_count, matched = risk_page(page_current or 0, RISK_PAGE_SIZE, sort_by, filter_query or '')
+        roster = roster_risk()
+        title = f"Early Warning - {int((roster['Risk'] >= RISK_HIGH).sum())} of {len(roster)} students at high risk"
+        if filter_query:
+            title += f' ({matched} matching)'
+        return title, rows, page_count
+
+    # Attendance patterns - current page of the roster's streaks and weekday patterns
+    @app.callback(
+        [
+            Output({'type': 'dynamic-output', 'index': 'pattern-title'}, 'children'),
+            Output({'type': 'dynamic-input', 'index': 'pattern-table'}, 'data'),
+            Output({'type': 'dynamic-input', 'index': 'pattern-table'}, 'page_count')
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'pattern-table'}, 'page_current'),
+            Input({'type': 'dynamic-input', 'index': 'pattern-table'}, 'sort_by'),
+            Input({'type': 'dynamic-input', 'index': 'pattern-table'}, 'filter_query')
+        ]
+    )
+    def update_pattern_table(page_current, sort_by, filter_query):
+        sort_by = tuple((col['column_id'], col['direction']) for col in sort_by or [])
+        rows, page_count, matched = pattern_page(page_current or 0, RISK_PAGE_SIZE, sort_by, filter_query or '')
+        report = pattern_report()
+        absent = report.loc[report['Course'] == ALL_CLASSES, 'Absent Now']
+        title = f"Attendance Patterns - {int((absent >= STREAK_MIN).sum())} students absent {STREAK_MIN}+ school days in a row"
+        if filter_query:
+            title += f' ({matched} matching)'
+        return title, rows, page_count
+
+    # Crunch weeks - current page of the weeks with the most overloaded students
+    @app.callback(
+        [
+            Output({'type': 'dynamic-output', 'index': 'crunch-title'}, 'children'),
+            Output({'type': 'dynamic-input', 'index': 'crunch-table'}, 'data'),
+            Output({'type': 'dynamic-input', 'index': 'crunch-table'}, 'page_count')
+        ],
+        [
+            Input({'type': 'dynamic-input', 'index': 'crunch-table'}, 'page_current'),
+            Input({'type': 'dynamic-input', 'index': 'crunch-table'}, 'sort_by'),
+            Input({'type': 'dynamic-input', 'index': 'crunch-table'}, 'filter_query')
+        ]
+    )
+    def update_crunch_table(page_current, sort_by, filter_query):
+        sort_by = tuple((col['column_id'], col['direction']) for col in sort_by or [])
+        rows, page_count, matched = crunch_page(page_current or 0, RISK_PAGE_SIZE, sort_by, filter_query or '')
+        report = crunch_report()
+        title = f"Crunch Weeks - {int((report['Overloaded'] > 0).sum())} of {len(report)} weeks with overloaded students"
+        if filter_query:
+            title += f' ({matched} matching)'
+        return title, rows, page_count
+
 
     
@@ -4,8 +4,10 @@ import pandas as pd
 import dash_ag_grid as dag
 from collections import OrderedDict
 from dash import dash_table, html, dcc
-from .data import  student_list, upcoming_deadlines, save_workhabits_data, teacher_list, course_list
-from .graphs import attendance_barchart, workhabit_timeline, timespent_barchart
+from .data import  upcoming_deadlines, save_workhabits_data, teacher_list, course_list
+from .graphs import attendance_barchart, workhabit_timeline, timespent_barchart, chart_templates
+from .search import filter_options
+from .config import TASK_PAGE_SIZE, RISK_PAGE_SIZE, RISK_HIGH, STREAK_MIN, LOAD_WINDOW, LOAD_TASKS, LOAD_TESTS
 
 # HEADER
 title = html.H5(
@@ -57,6 +59,12 @@ def create_tabs():
             value='task-tab', 
             style={'paddingTop': '0.7rem'},
             selected_style={'paddingTop': '0.7rem'}  
+        ),
+        dcc.Tab(
+            label='Risk View', 
+            value='risk-tab', 
+            style={'paddingTop': '0.7rem'},
+            selected_style={'paddingTop': '0.7rem'}  
         )
     ],
     style={'height': '3rem'}
@@ -76,38 +84,59 @@ default_schedule = [{'Block': '1-1', 'Course': None, 'Teacher': None},
 initial_attendance_graph = attendance_barchart()  
 initial_workhabit_graph = workhabit_timeline()
 initial_timespent_graph = timespent_barchart()
+initial_chart_templates = dict(chart_templates(), default_schedule=default_schedule)
 initial_workhabit_data = [{'Student': '', 'Workhabit Score': '', 'Focus': '', 'Support Attendance': ''}]
 
 default_student_tasks = [{'Due': None, 'Task': None, 'Course': None, 'Teacher': None, 'Block': None }]
+default_task_table = pd.DataFrame([['','','','']]*3).to_dict('records')
+initial_task_edits = {'hidden': [], 'completed': {}}
 initial_deadlines_data = [{'Task': '', 'Course': '', 'Block': '', 'Teacher': '', 'Due':''}]
 
 
-# User input options
-students_dict = student_list()
-students = [i['label'] for i in students_dict]
-
+# User input options, students are searched as they are typed (see search.py)
 teachers_dict = teacher_list()
 teachers = [i['label'] for i in teachers_dict]
 
 courses_dict = course_list()
 courses = [i['label'] for i in courses_dict]
 
+search_teachers, search_courses = filter_options()
+
 # Student Tab 
 student_tab = dbc.Row([
     # COLUMN 1
     dbc.Col([   
     html.Div([
-    # Student Selection
+    # Student Selection, narrowed to a teacher's or course's students
+        html.Div([
+            dcc.Dropdown(
+                id={'type': 'dynamic-input', 'index': 'student-teacher-filter'},
+                options=search_teachers, 
+                placeholder='Any teacher', 
+                style={'flex': 1, 'fontSize': '0.7rem'}
+            ),
+            dcc.Dropdown(
+                id={'type': 'dynamic-input', 'index': 'student-course-filter'},
+                options=search_courses, 
+                placeholder='Any course', 
+                style={'flex': 1, 'fontSize': '0.7rem'}
+            )
+        ], style={'display': 'flex', 'gap': '0.25rem', 'marginBottom': '0.25rem'}),
         dcc.Dropdown(
             id={'type': 'dynamic-input', 'index': 'student-select'},
-            options=student_list(), 
+            options=[], 
             value='A', 
-            placeholder='Select a student...', 
+            placeholder='Type to search students...', 
+            search_order='original',
             style={
                 'marginBottom': '0.25rem', 
                 'fontSize': '0.8rem'
             } 
         ),  
+        # Selected student's data, the student tab is drawn from it in the browser
+        dcc.Store(id={'type': 'dynamic-output', 'index': 'student-bundle'}),
+        dcc.Store(id={'type': 'dynamic-output', 'index': 'student-refresh'}, data=0),
+        dcc.Store(id={'type': 'dynamic-input', 'index': 'chart-templates'}, data=initial_chart_templates),
         # Student Schedule 
         html.Div([
             html.H6("Schedule"),
@@ -191,6 +220,22 @@ student_tab = dbc.Row([
                 'padding':'10px', 
                 'marginBottom': '0.8rem', 
         } 
+        ),
+        # Attendance patterns 
+        html.Div([
+            html.H6("Attendance Patterns"),
+            html.Div(
+                "Select a student...",
+                id={'type': 'dynamic-output', 'index': 'attendance-patterns'},
+                style={'fontSize': '0.8rem', 'whiteSpace': 'pre-line', 'maxHeight': '8rem', 'overflowY': 'auto'}
+            )],
+            style={
+                'border': '0.1rem solid #387c9f',
+                'border-radius': '8px', 
+                'box-shadow': '0 4px 8px rgba(0, 0, 0, 0.1)', 
+                'padding':'10px', 
+                'marginBottom': '0.8rem', 
+        } 
         )
     ], style={'display': 'flex', 'flexDirection': 'column', 'height': '100%'})
     ], width=3,), 
@@ -325,8 +370,9 @@ student_tab = dbc.Row([
             dag.AgGrid(
                 id={'type': 'user-input', 'index': 'workhabit-table'},
                 columnDefs=[
+                    # students are searched on the server as they are typed (assets/dashAgGridComponentFunctions.js)
                     {'headerName': 'Student', 'field': 'Student', 'editable': True, 
-                        'cellEditor':'agSelectCellEditor', "cellEditorParams": {"values": students }, 'flex': 1},
+                        'cellEditor': {'function': 'StudentSelect'}, 'cellEditorPopup': True, 'flex': 1},
                     {'headerName': 'WH Score', 'field': 'Workhabit Score', 'editable': True, 
                         'cellEditor':'agSelectCellEditor', "cellEditorParams": {"values": ["0", "1", "2", "3", "4"]},  'flex': 1},
                     {'headerName': 'Subject', 'field': 'Focus', 'editable': True, 
@@ -382,6 +428,109 @@ style={
         'flexGrow': 1, 
         'overflowX': 'hidden'}
 )
+# Task Tab - task panels, only the one for the selected type is displayed and callbacks
+# update their data
+hidden_panel = {'display': 'none'}
+
+default_task_panel = html.Div([
+    html.H6('Tasks'), 
+    dash_table.DataTable(
+        id='default-table',
+        columns=[{'name': '', 'id': ''}, {'name': '', 'id': ''}, {'name': '', 'id': ''}],
+        data=default_task_table,
+        style_table={'height': '200px', 'width': '100%'},
+    )
+], id={'type': 'dynamic-output', 'index': 'default-task-panel'})
+
+student_task_panel = html.Div([
+    html.H6(id={'type': 'dynamic-output', 'index': 'student-task-title'}),
+    # Paged, sorted and filtered on the server, only the visible page is sent
+    dash_table.DataTable(
+        id={'type':'dynamic-input', 'index':'student-task-table'}, 
+        columns=[{'name':'Due', 'id':'Due'}, 
+                 {'name':'Task', 'id':'Task'}, 
+                 {'name':'Course', 'id':'Course'}, 
+                 {'name':'Teacher', 'id':'Teacher'}, 
+                 {'name':'Block', 'id':'Block'}], 
+        data=[],
+        style_cell={'textAlign':'center', 'fontSize':'0.7rem'}, 
+        style_header={'fontWeight': 'bold', 'textAlign':'center'},                  
+        row_selectable='multi', 
+        row_deletable=True, 
+        selected_rows=[],
+        page_action='custom',
+        page_current=0,
+        page_size=TASK_PAGE_SIZE,
+        page_count=1,
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query=''
+    ), 
+    # Tasks on the current page (completed or not when loaded), and unsaved deletions/checks across pages
+    dcc.Store(id={'type':'dynamic-output', 'index':'student-task-keys'}, data={}),
+    dcc.Store(id={'type':'dynamic-output', 'index':'student-task-edits'}, data=initial_task_edits),
+    dcc.Store(id={'type':'dynamic-output', 'index':'student-task-saved'}, data=0),
+    html.Div([
+        # Output message
+        html.Div(id={'type':'dynamic-output','index':'output-student-task'}, style={'marginRight':'10px','fontSize':'0.7rem'}),
+
+        # Save button
+        dbc.Button('Save', id={'type': 'dynamic-input', 'index': 'save-student-tasks'}, n_clicks=0, 
+                style={'marginTop': '10px','fontSize':'0.7rem'})
+    ], style={
+        'display': 'flex',
+        'justifyContent': 'flex-end',  
+        'marginTop': '10px', 
+        'alignItems': 'center'
+    }),
+    # Tasks due each week (workload.py), overloaded weeks shaded
+    html.H6('Deadline Load', style={'marginTop': '10px'}),
+    dcc.Graph(
+        id={'type': 'dynamic-output', 'index': 'deadline-load'},
+        config={'displayModeBar': False}
+    ),
+    html.Div(id={'type': 'dynamic-output', 'index': 'deadline-windows'}, style={'fontSize': '0.7rem', 'whiteSpace': 'pre-line'})
+], id={'type': 'dynamic-output', 'index': 'student-task-panel'}, style=hidden_panel)
+
+teacher_task_panel = html.Div([
+    html.Div([
+        html.H6(id={'type': 'dynamic-output', 'index': 'teacher-task-title'}), 
+        # Date 
+        dcc.DatePickerRange(
+            id={'type': 'dynamic-input', 'index': 'date-picker-tasks'},
+            start_date_placeholder_text="Start date",
+            end_date_placeholder_text="End date",
+            style={'marginBottom':'10px'}
+        ),
+    ], 
+        style={'display': 'flex', 'justify-content': 'space-between', 'align-items': 'center', 'width': '100%'}  
+    ), 
+    # Table
+    dash_table.DataTable(
+        id={'type': 'dynamic-input', 'index': 'teacher-task-table'},
+        columns=[],
+        data=[],
+        style_data={'whiteSpace': 'pre-line'},
+        style_cell={'textAlign':'center', 'fontSize':'0.7rem'}, 
+        style_header={'fontWeight': 'bold', 'textAlign':'center'},
+    ),
+    # Spreadsheet downloads, streamed by /export (links set in callbacks)
+    html.Div([
+        dbc.Button(label, id={'type': 'dynamic-output', 'index': f'export-{name}'}, href='', external_link=True,
+                   outline=True, color='secondary', size='sm', style={'marginRight': '10px', 'fontSize': '0.7rem'})
+        for name, label in [('xlsx', 'Excel'), ('roster', 'Roster CSV'), ('tasks', 'Tasks CSV'),
+                            ('attendance', 'Attendance CSV'), ('school', 'Whole School (Excel)')]
+    ], style={'marginTop': '10px'}),
+    # Attendance and work habits of the teacher's students
+    html.H6('Class Attendance', style={'marginTop': '10px'}),
+    dcc.Graph(
+        id={'type': 'dynamic-output', 'index': 'cohort-heatmap'},
+        config={'displayModeBar': False}
+    )
+], id={'type': 'dynamic-output', 'index': 'teacher-task-panel'}, style=hidden_panel)
+
 # Task Tab 
 task_tab = dbc.Row([
         # COLUMN 1 
@@ -434,7 +583,8 @@ task_tab = dbc.Row([
         dbc.Col([
             # Task Display Table
             html.Div([
-                html.Div(id={'type': 'dynamic-input', 'index': 'dynamic-task-tables'}),
+                html.Div([default_task_panel, student_task_panel, teacher_task_panel], 
+                         id={'type': 'dynamic-input', 'index': 'dynamic-task-tables'}),
             ], style={
                 'border': '2px solid #387c9f',
                 'border-radius': '8px', 
@@ -507,6 +657,121 @@ class_name='g-2',
 style={'display': 'flex', 'justify-content': 'space-between', 'flex-wrap': 'wrap', 'paddingTop':'0.5rem', 'width': '100%'}
 )
 
+# Risk Tab - every student ranked by risk score (risk.py), paged, sorted and filtered on the server
+risk_tab = html.Div([
+    # Early warning
+    html.Div([
+        html.H6(id={'type': 'dynamic-output', 'index': 'risk-title'}),
+        dash_table.DataTable(
+            id={'type': 'dynamic-input', 'index': 'risk-table'},
+            columns=[{'name': 'Student', 'id': 'Student'}, 
+                     {'name': 'Grade', 'id': 'Grade', 'type': 'numeric'}, 
+                     {'name': 'Risk', 'id': 'Risk', 'type': 'numeric'}, 
+                     {'name': 'Absence %', 'id': 'Absence %', 'type': 'numeric'}, 
+                     {'name': 'Days Missed in a Row', 'id': 'Streak', 'type': 'numeric'}, 
+                     {'name': 'Habit Avg', 'id': 'Habit Avg', 'type': 'numeric'}, 
+                     {'name': 'Habit Change', 'id': 'Habit Change', 'type': 'numeric'}, 
+                     {'name': 'Overdue Tasks', 'id': 'Overdue', 'type': 'numeric'}],
+            data=[],
+            style_cell={'textAlign':'center', 'fontSize':'0.7rem'}, 
+            style_header={'fontWeight': 'bold', 'textAlign':'center'},
+            style_data_conditional=[
+                {'if': {'filter_query': f'{{Risk}} >= {RISK_HIGH}'}, 'backgroundColor': 'rgba(194, 27, 24, 0.15)'}
+            ],
+            page_action='custom',
+            page_current=0,
+            page_size=RISK_PAGE_SIZE,
+            page_count=1,
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[{'column_id': 'Risk', 'direction': 'desc'}],
+            filter_action='custom',
+            filter_query=''
+        ),
+        html.Div('Risk combines absences, days missed in a row, recent work habits and their trend, and overdue tasks (0-100).', 
+                 style={'fontSize': '0.7rem', 'marginTop': '10px'})
+    ], style={
+        'border': '2px solid #387c9f',
+        'border-radius': '8px', 
+        'box-shadow': '0 4px 8px rgba(0, 0, 0, 0.1)', 
+        'padding': '10px', 
+        'margin': '0.5rem'
+    }),
+
+    # Attendance patterns
+    html.Div([
+        html.H6(id={'type': 'dynamic-output', 'index': 'pattern-title'}),
+        dash_table.DataTable(
+            id={'type': 'dynamic-input', 'index': 'pattern-table'},
+            columns=[{'name': 'Student', 'id': 'Student'}, 
+                     {'name': 'Course', 'id': 'Course'}, 
+                     {'name': 'Absent Now', 'id': 'Absent Now', 'type': 'numeric'}, 
+                     {'name': 'Longest Absence', 'id': 'Longest Absence', 'type': 'numeric'}, 
+                     {'name': 'Late Now', 'id': 'Late Now', 'type': 'numeric'}, 
+                     {'name': 'Longest Late', 'id': 'Longest Late', 'type': 'numeric'}, 
+                     {'name': 'Often Absent On', 'id': 'Absent On'}, 
+                     {'name': 'Often Late On', 'id': 'Late On'}],
+            data=[],
+            style_cell={'textAlign':'center', 'fontSize':'0.7rem'}, 
+            style_header={'fontWeight': 'bold', 'textAlign':'center'},
+            style_data_conditional=[
+                {'if': {'filter_query': f'{{Absent Now}} >= {STREAK_MIN}'}, 'backgroundColor': 'rgba(194, 27, 24, 0.15)'}
+            ],
+            page_action='custom',
+            page_current=0,
+            page_size=RISK_PAGE_SIZE,
+            page_count=1,
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query=''
+        ),
+        html.Div(f'Streaks count school days for All classes and classes for a course. Only streaks of {STREAK_MIN} or more and weekday patterns are listed.', 
+                 style={'fontSize': '0.7rem', 'marginTop': '10px'})
+    ], style={
+        'border': '2px solid #387c9f',
+        'border-radius': '8px', 
+        'box-shadow': '0 4px 8px rgba(0, 0, 0, 0.1)', 
+        'padding': '10px', 
+        'margin': '0.5rem'
+    }),
+
+    # Crunch weeks
+    html.Div([
+        html.H6(id={'type': 'dynamic-output', 'index': 'crunch-title'}),
+        dash_table.DataTable(
+            id={'type': 'dynamic-input', 'index': 'crunch-table'},
+            columns=[{'name': 'Week Of', 'id': 'Week'}, 
+                     {'name': 'Overloaded Students', 'id': 'Overloaded', 'type': 'numeric'}, 
+                     {'name': 'Students with Tasks', 'id': 'Students', 'type': 'numeric'}, 
+                     {'name': 'Tasks Due', 'id': 'Tasks', 'type': 'numeric'}, 
+                     {'name': 'Tests Due', 'id': 'Tests', 'type': 'numeric'}, 
+                     {'name': 'Busiest Courses', 'id': 'Courses'}],
+            data=[],
+            style_cell={'textAlign':'center', 'fontSize':'0.7rem'}, 
+            style_header={'fontWeight': 'bold', 'textAlign':'center'},
+            page_action='custom',
+            page_current=0,
+            page_size=RISK_PAGE_SIZE,
+            page_count=1,
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query=''
+        ),
+        html.Div(f'Students are overloaded with {LOAD_TASKS} tasks, or {LOAD_TESTS} tests, due within {LOAD_WINDOW} days. Busiest courses count the tasks due in overloaded stretches.', 
+                 style={'fontSize': '0.7rem', 'marginTop': '10px'})
+    ], style={
+        'border': '2px solid #387c9f',
+        'border-radius': '8px', 
+        'box-shadow': '0 4px 8px rgba(0, 0, 0, 0.1)', 
+        'padding': '10px', 
+        'margin': '0.5rem'
+    })
+])
+
 # FOOTER
 footer_info = [
     html.A('Source Code on GitHub.', href='<link>', style={'font-size': '14px', 'margin-bottom': '10px', 'color': 'white'}),
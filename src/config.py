@@ -2,7 +2,9 @@ import os
 
 # Directories
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATA_DIR = os.path.join(ROOT_DIR, 'data')
+# (can be pointed elsewhere, e.g. at generated data for benchmarks)
+DATA_DIR = os.environ.get('SYNCED_SUPPORT_DATA_DIR', os.path.join(ROOT_DIR, 'data'))
+CACHE_DIR = os.environ.get('SYNCED_SUPPORT_CACHE_DIR', os.path.join(ROOT_DIR, 'cache'))
 
 # file paths 
 STUDENT_DATA = os.path.join(DATA_DIR, 'student.csv')
@@ -10,3 +12,110 @@ ATTEND_DATA = os.path.join(DATA_DIR, 'attendance_habits.csv')
 DEADLINES_DATA = os.path.join(DATA_DIR, 'master_deadlines.csv')
 STUDENT_NOTE = os.path.join(DATA_DIR, 'student_notes.csv')
 STUDENT_TASKS = os.path.join(DATA_DIR, 'student_tasks.csv')
+
+# tables, by name
+TABLES = {
+    'students': STUDENT_DATA, 
+    'attendance': ATTEND_DATA, 
+    'deadlines': DEADLINES_DATA, 
+    'notes': STUDENT_NOTE, 
+    'tasks': STUDENT_TASKS
+}
+
+# rows per page of the task tables
+TASK_PAGE_SIZE = 10
+
+# background callback jobs
+JOBS_CACHE = os.path.join(CACHE_DIR, 'jobs')
+
+# data versions and memoized results ('memory', 'file' or 'off')
+VERSIONS_DIR = os.path.join(CACHE_DIR, 'versions')
+MEMO_CACHE = os.environ.get('SYNCED_SUPPORT_CACHE', 'memory')
+MEMO_DIR = os.path.join(CACHE_DIR, 'memo')
+MEMO_SIZE = int(os.environ.get('SYNCED_SUPPORT_CACHE_SIZE', 256))
+
+# change feed of written rows, long-polled by open pages
+FEED_DIR = os.path.join(CACHE_DIR, 'changes')
+FEED_TABLES = ['deadlines', 'tasks', 'attendance', 'notes']
+FEED_SIZE = 500
+FEED_TIMEOUT = 25
+# long-polls each worker holds open at once, further polls are answered straight away and told
+# to poll again after FEED_RETRY seconds
+FEED_LONG_POLLS = int(os.environ.get('SYNCED_SUPPORT_FEED_LONG_POLLS', 4))
+FEED_RETRY = 5
+
+# event log of every write, with a copy of each table from before its first logged write (data that
+# is kept, unlike the cache), and the views derived from tables, saved with the log position they
+# reflect every VIEW_CHECKPOINT events replayed
+EVENTS_DIR = os.environ.get('SYNCED_SUPPORT_EVENTS_DIR', os.path.join(DATA_DIR, 'events'))
+VIEWS_DIR = os.path.join(CACHE_DIR, 'views')
+VIEW_CHECKPOINT = 100
+
+# callback and data function metrics on /metrics, off unless SYNCED_SUPPORT_METRICS=1
+METRICS_ENABLED = os.environ.get('SYNCED_SUPPORT_METRICS', '0') == '1'
+METRICS_DIR = os.path.join(CACHE_DIR, 'metrics')
+
+# callbacks to profile: names, '*' or 'header' (X-Profile request header), off if unset
+PROFILE_CALLBACKS = [name.strip() for name in os.environ.get('SYNCED_SUPPORT_PROFILE', '').split(',') if name.strip()]
+PROFILE_DIR = os.path.join(CACHE_DIR, 'profiles')
+
+def parse_weights(variable, defaults):
+    """Reads weights given as 'name=weight,...' in an environment variable over the default ones.
+
+    Parameters
+    ----------
+    variable: str
+        The environment variable, e.g. set to 'absence=2,overdue=0.5'. Empty items are skipped.
+    defaults: dict
+        The default weight of every name.
+
+    Returns
+    -------
+    dict: The default weights updated with the given ones.
+
+    Raises
+    ------
+    ValueError: If an item is not name=number, or a name is not one of the defaults.
+    """
+    weights = dict(defaults)
+    for item in filter(None, (item.strip() for item in os.environ.get(variable, '').split(','))):
+        name, _, weight = (part.strip() for part in item.partition('='))
+        if name not in defaults:
+            raise ValueError(f"{variable}: unknown name {name!r} in {item!r}, expected one of {', '.join(defaults)}")
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"{variable}: {item!r} is not name=number") from None
+    return weights
+
+# early warning risk score: weight of each signal, e.g. SYNCED_SUPPORT_RISK_WEIGHTS='absence=2,overdue=0.5',
+# the value at which each signal counts in full, and the score shown as high risk
+RISK_WEIGHTS = parse_weights('SYNCED_SUPPORT_RISK_WEIGHTS',
+                             {'absence': 3, 'streak': 2, 'habits': 1, 'trend': 1, 'overdue': 2})
+RISK_LIMITS = {'absence': 0.2, 'streak': 5, 'habits': 3, 'trend': 2, 'overdue': 5}
+RISK_HIGH = 50
+RISK_PAGE_SIZE = 20
+
+# attendance patterns: streaks listed in the roster report from this length, and weekdays with at
+# least PATTERN_MIN absences (or lates), on at least PATTERN_SHARE of those weekdays and at
+# PATTERN_RATIO times the student's rate on other days
+STREAK_MIN = 3
+PATTERN_MIN = 3
+PATTERN_SHARE = 0.5
+PATTERN_RATIO = 2
+
+# student names returned per search of the student dropdowns
+SEARCH_LIMIT = 50
+
+# rows read and sent at a time by the spreadsheet export
+EXPORT_CHUNK = 20000
+
+# printable progress reports, one HTML file per student (python -m src.reports)
+REPORTS_DIR = os.environ.get('SYNCED_SUPPORT_REPORTS_DIR', os.path.join(ROOT_DIR, 'reports'))
+
+# deadline load: a student is overloaded when LOAD_TASKS tasks, or LOAD_TESTS tests (tasks named
+# like TEST_PATTERN), are due within LOAD_WINDOW days
+LOAD_WINDOW = 7
+LOAD_TASKS = 5
+LOAD_TESTS = 3
+TEST_PATTERN = r'\b(?:test|quiz|exam|midterm)'
@@ -0,0 +1,135 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from .events import refresh_view, drop_views
+
+# Aggregate counts over attendance_habits.csv, kept as a view of the event log (see events.py):
+# updated with the rows of each new habit entry, and saved, so a new process catches up from there
+#   attendance: Student x Course x Attendance -> count
+#   work:       Student x Work -> count, support classes only
+_cube = {'view': None}
+
+# attendance_habits.csv columns the counts are made from
+CUBE_COLUMNS = ['Student', 'Course', 'Attendance', 'Work']
+_cube_lock = threading.Lock()
+
+def _reset_cube_lock():
+    # a background job forked while another thread was building the counts would wait forever
+    global _cube_lock
+    _cube_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_cube_lock)
+
+def build_cube(attendance):
+    """Counts the attendance codes and support class work subjects in the attendance data.
+
+    Parameters
+    ----------
+    attendance: pd.DataFrame
+        Rows in the format of attendance_habits.csv.
+
+    Returns
+    -------
+    dict: 'attendance' and 'work' count series, indexed by (Student, Course, Attendance) and
+          (Student, Work).
+    """
+    attendance_counts = attendance.groupby(['Student', 'Course', 'Attendance']).size()
+    support = attendance[attendance['Course'].str.contains('Support')]
+    work_counts = support.groupby(['Student', 'Work']).size()
+    return {'attendance': attendance_counts.sort_index(), 'work': work_counts.sort_index()}
+
+def add_to_cube(cube, rows):
+    """Adds newly saved attendance rows to the aggregate counts, instead of recounting the file.
+
+    Parameters
+    ----------
+    cube: dict
+        Aggregate counts from build_cube().
+    rows: pd.DataFrame
+        The rows appended to attendance_habits.csv.
+
+    Returns
+    -------
+    dict: The updated counts.
+    """
+    if rows.empty:
+        return cube
+    added = build_cube(rows)
+    return {'attendance': cube['attendance'].add(added['attendance'], fill_value=0).astype(int).sort_index(),
+            'work': cube['work'].add(added['work'], fill_value=0).astype(int).sort_index()}
+
+def attendance_cube():
+    """Retrieves the aggregate counts for attendance_habits.csv, adding the rows logged since
+    they were counted (e.g. by another process), or counting them again if the file changed
+    outside the app.
+
+    Returns
+    -------
+    dict: 'attendance' and 'work' count series (see build_cube). Do not modify.
+    """
+    with _cube_lock:
+        _cube['view'] = refresh_view('cube', 'attendance', _cube['view'], build_cube, add_to_cube, CUBE_COLUMNS)
+        return dict(_cube['view']['data'])
+
+def reset_cube(saved=True):
+    """Drops the counts kept in memory.
+
+    Parameters
+    ----------
+    saved: bool
+        Also delete the saved counts, so they are counted again from the CSV file on next use.
+        If False, they are loaded and caught up from the log, as in a process just started.
+    """
+    with _cube_lock:
+        _cube['view'] = None
+    if saved:
+        drop_views('cube')
+
+def _student_rows(counts, students):
+    # the counts of the given students. The counts are sorted by student, so a few students are
+    # found by binary search instead of scanning every row
+    index = counts.index
+    if len(students) > 50 or not index.is_monotonic_increasing:
+        return counts[index.get_level_values('Student').isin(students)]
+    # (no student selected is None, which slice_locs would take as an open bound: every row)
+    bounds = [index.slice_locs(student, student) for student in dict.fromkeys(students) if student is not None]
+    return counts.iloc[np.concatenate([np.arange(start, stop) for start, stop in sorted(bounds)] or [[]]).astype(int)]
+
+def cube_attendance(cube, students=None):
+    """Slices attendance code counts for some or all students.
+
+    Parameters
+    ----------
+    cube: dict
+        Aggregate counts from attendance_cube() or build_cube().
+    students: list, optional
+        The students to include. All students if None.
+
+    Returns
+    -------
+    pd.DataFrame: Counts indexed by (Student, Course), one column per attendance code.
+    """
+    counts = cube['attendance']
+    if students is not None:
+        counts = _student_rows(counts, students)
+    return counts.unstack('Attendance', fill_value=0)
+
+def cube_work(cube, students=None):
+    """Slices support class work subject counts for some or all students.
+
+    Parameters
+    ----------
+    cube: dict
+        Aggregate counts from attendance_cube() or build_cube().
+    students: list, optional
+        The students to include. All students if None.
+
+    Returns
+    -------
+    pd.DataFrame: Counts indexed by Student, one column per subject.
+    """
+    counts = cube['work']
+    if students is not None:
+        counts = _student_rows(counts, students)
+    return counts.unstack('Work', fill_value=0)
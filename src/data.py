@@ -1,10 +1,41 @@
 import pandas as pd
 from datetime import datetime, timedelta
 import math
+import numpy as np
 from .config import STUDENT_DATA, DEADLINES_DATA, STUDENT_NOTE, ATTEND_DATA, STUDENT_TASKS
 import os
+import threading
+from .cache import memoize
+from .feed import publish
+from .metrics import read_csv, instrument_module
+from .events import logged_write
+
+# Ordinal scales 
+ATTENDANCE_CODES = ['P', 'L', 'AE', 'A']
+WORKHABIT_SCORES = {'Off-task': 0, 'Mostly Off-task': 1,'Equally On/Off-task': 2, 'Mostly On-task': 3,'On-task': 4}
+
+# Columns identifying a student's task
+TASK_KEY = ['Task', 'Course', 'Teacher', 'Block']
+TASK_COLUMNS = ['Due', 'Task', 'Course', 'Teacher', 'Block']
+FILTER_OPERATORS = [['>=', 'ge'], ['<=', 'le'], ['<', 'lt'], ['>', 'gt'], ['!=', 'ne'], ['=', 'eq'], ['contains'], ['datestartswith']]
+
+def write_csv(df, path):
+    """Replaces a CSV file with the given data in one step, so readers see either the old or
+    the new file and never a partly written one.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        The data to save.
+    path: str
+        The path of the CSV file.
+    """
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
 
 # TAB 1 - DATA 
+@memoize('students')
 def student_list():
     """Retrieves the list of student names in the CSV file then formats them into a list
     to use in the drop down selection component. 
@@ -14,30 +45,33 @@ def student_list():
     list : A list of dictionaries containing labels and values to correspond to each 
             student in the dataset, to be used as the dropdown options.
     """
-    df = pd.read_csv(STUDENT_DATA)
+    df = read_csv(STUDENT_DATA)
     student_names = df['Student'].unique()
     options = [{'label': name, 'value': name} for name in student_names]
     return options 
 
-def student_schedule(student_name):
+@memoize('students')
+def student_schedule(student_name, students=None):
     """Retrieves the student schedule (course, block, and teacher) from the CSV file for a given student.
     
     Parameters
     ----------
     student_name: str
         The name of the student to fetch the schedule for
+    students: pd.DataFrame, optional
+        Contents of student.csv, if already loaded. 
     
     Returns
     -------
     list: List of dictionaties containing the course, teacher and block. 
     """
-    df = pd.read_csv(STUDENT_DATA)
+    df = students if students is not None else read_csv(STUDENT_DATA)
     df_student = df[df['Student'] == student_name]
     schedule = df_student[['Block', 'Course', 'Teacher' ]]
     schedule = schedule.sort_values(by='Block')
     return schedule.to_dict('records')
 
-def workhabit_trend(student_name):
+def workhabit_trend(student_name, attendance=None):
     """Calculuate trend in given student's work habit score over the past 6 days, and provides a message
     describing the increase, decrease or consistency in their worhabits. 
     
@@ -45,6 +79,8 @@ def workhabit_trend(student_name):
     ----------
     student_name: str
         The name of the student to determine the workhabit trend for. 
+    attendance: pd.DataFrame, optional
+        Contents of attendance_habits.csv, if already loaded. 
     
     Returns
     -------
@@ -55,12 +91,11 @@ def workhabit_trend(student_name):
         The student's average work habit score for their 3 most recent classes. 
     """
     # set up data
-    workhabit_scores = {'Off-task': 0, 'Mostly Off-task': 1,'Equally On/Off-task': 2, 'Mostly On-task': 3,'On-task': 4}
-    df_workhabits = pd.read_csv(ATTEND_DATA)
+    df_workhabits = attendance if attendance is not None else read_csv(ATTEND_DATA)
     df_student = df_workhabits[df_workhabits['Student'] == student_name]
     df_student = df_student[df_student['Course'].str.contains('Support', regex=True)]
     df_student = df_student[df_student['Habit'].notna()]
-    df_student['Score'] = df_student['Habit'].apply(lambda x: workhabit_scores.get(x))
+    df_student['Score'] = df_student['Habit'].apply(lambda x: WORKHABIT_SCORES.get(x))
     df_student.sort_values(by='Date', ascending=False, inplace=True)
 
     # Check if enougth data exists
@@ -96,26 +131,28 @@ def workhabit_trend(student_name):
     message = mag + ' ' + trend 
     return message, round(recent_avg,1), icon  
 
-def get_student_note(student_name):
+def get_student_note(student_name, notes=None):
     """Retrieves the note from the CSV file for the given student.
     
     Parameters
     ----------
     student_name: str
         The name of the student to fetch the note for.
+    notes: pd.DataFrame, optional
+        Contents of student_notes.csv, if already loaded. 
     
     Returns
     -------
     note: str
         The note for the given student.  
     """
-    if os.path.exists(STUDENT_NOTE):
-        df = pd.read_csv(STUDENT_NOTE)
-        student_note = df[df['Student'] == student_name]['Note']
+    note = None
+    if notes is None and os.path.exists(STUDENT_NOTE):
+        notes = read_csv(STUDENT_NOTE)
+    if notes is not None:
+        student_note = notes[notes['Student'] == student_name]['Note']
         if not student_note.empty:
             note = student_note.iloc[0]
-        else:
-            note = None
     return note
 
 def save_student_note(student_name, note):
@@ -132,24 +169,27 @@ def save_student_note(student_name, note):
     -------
     str: Verified message.  
     """
-    if os.path.exists(STUDENT_NOTE):
-        df = pd.read_csv(STUDENT_NOTE)
+    with logged_write('notes') as record:
+        if os.path.exists(STUDENT_NOTE):
+            df = read_csv(STUDENT_NOTE)
         
-        # override previous note
-        if student_name in df['Student'].values:
-            df.loc[df['Student'] == student_name, 'Note'] = note
-        else:
-            # create a new note
-            new = pd.DataFrame({'Student': [student_name], 'Note' : [note]})
-            df = pd.concat([df, new], ignore_index=True)
+            # override previous note
+            if student_name in df['Student'].values:
+                df.loc[df['Student'] == student_name, 'Note'] = note
+            else:
+                # create a new note
+                new = pd.DataFrame({'Student': [student_name], 'Note' : [note]})
+                df = pd.concat([df, new], ignore_index=True)
 
-        df.to_csv(STUDENT_NOTE, index=False)
+            write_csv(df, STUDENT_NOTE)
 
-    else:
-        # create dataframe
-        df = pd.DataFrame({'Student': [student_name], 'Note': [note]})
-        df.to_csv(STUDENT_NOTE, index=False)
+        else:
+            # create dataframe
+            df = pd.DataFrame({'Student': [student_name], 'Note': [note]})
+            write_csv(df, STUDENT_NOTE)
 
+        record('note', [{'Student': student_name, 'Note': note}])
+        publish('notes', [{'Student': student_name, 'Note': note}])
     return "Note Saved."
 
 def save_workhabits_data(data, date):
@@ -169,7 +209,7 @@ def save_workhabits_data(data, date):
     str: Verified message.  
         
     """
-    df_student = pd.read_csv(STUDENT_DATA)
+    df_student = read_csv(STUDENT_DATA)
     clean_data = []
     workhabit_scores = {'0':'Off-task', '1':'Mostly Off-task', '2':'Equally On/Off-task', '3':'Mostly On-task', '4':'On-task'}
 
@@ -197,14 +237,18 @@ def save_workhabits_data(data, date):
         clean_data.append(temp_pt)
 
     # Save data
-    current_data = pd.read_csv(ATTEND_DATA)
-    df_clean = pd.DataFrame(clean_data)
-    df_updated = pd.concat([current_data, df_clean], ignore_index=True)
-    df_updated = df_updated.sort_values(by=['Student', 'Date'], ascending=[True, True])
-    df_updated.to_csv(ATTEND_DATA, index=False)
+    with logged_write('attendance') as record:
+        current_data = read_csv(ATTEND_DATA)
+        df_clean = pd.DataFrame(clean_data)
+        df_updated = pd.concat([current_data, df_clean], ignore_index=True)
+        df_updated = df_updated.sort_values(by=['Student', 'Date'], ascending=[True, True])
+        write_csv(df_updated, ATTEND_DATA)
+        record('append', df_clean)
+        publish('attendance', df_clean)
     return "Data Saved."
 
 # TAB 2 - DATA
+@memoize('students')
 def teacher_list():
     """Retrieves the list of teacher's names in the CSV file then formats them into a list
     to use in the drop down selection component. 
@@ -214,12 +258,13 @@ def teacher_list():
     list : A list of dictionaries containing labels and values to correspond to each 
             teacher in the dataset, to be used as the dropdown options.
     """
-    df = pd.read_csv(STUDENT_DATA)
+    df = read_csv(STUDENT_DATA)
     df = df[~df['Course'].str.contains('Support', regex=True)]
     teachers = df['Teacher'].unique()
     options = [{'label': name, 'value': name} for name in teachers]
     return options 
 
+@memoize('students')
 def course_list():
     """Retrieves the list of courses in the CSV file then formats them into a list
     to use in the drop down selection component. 
@@ -229,7 +274,7 @@ def course_list():
     list : A list of dictionaries containing labels and values to correspond to each 
             course in the dataset, to be used as the dropdown options.
     """
-    df = pd.read_csv(STUDENT_DATA)
+    df = read_csv(STUDENT_DATA)
     df = df[~df['Course'].str.contains('Support', regex=True)]
     courses = df['Course'].unique()
     options = [{'label': name, 'value': name} for name in courses]
@@ -243,15 +288,17 @@ def upcoming_deadlines():
     -------- 
     list : A list of dictionaries containing tasks due within 4 weeks. 
     """
-    df = pd.read_csv(DEADLINES_DATA)
+    df = read_csv(DEADLINES_DATA)
     df['Due'] = pd.to_datetime(df['Due'])
     today = datetime.today().date()
     upcoming_weeks = today + timedelta(weeks=4)
     df_upcoming = df[(df['Due'].dt.date >= today) & ((df['Due'].dt.date <= upcoming_weeks))].copy()
     df_upcoming = df_upcoming.sort_values(by='Due')
+    df_upcoming['Due_date'] = df_upcoming['Due'].dt.strftime('%Y-%m-%d')  # not displayed, to merge new deadlines in order
     df_upcoming['Due'] = df_upcoming['Due'].dt.strftime('%b %d')  
     return df_upcoming.to_dict('records') 
 
+@memoize('tasks')
 def student_deadlines(student):
     """Retrieves the tasks in the deadlines CSV file for the given student, keeping hidden or selected
     rows consistent from previous session. 
@@ -269,7 +316,7 @@ def student_deadlines(student):
         A list of indicies of rows to display with check marks for completed tasks. 
 
     """
-    df_tasks = pd.read_csv(STUDENT_TASKS)
+    df_tasks = read_csv(STUDENT_TASKS)
     df_tasks_student = df_tasks[df_tasks['Student'] == student].copy()
     df_tasks_student['Due'] = pd.to_datetime(df_tasks_student['Due']).dt.strftime('%b %d')
     
@@ -285,6 +332,187 @@ def student_deadlines(student):
     format_dict = df_format.to_dict('records')
     return format_dict, selected_rows
 
+@memoize('tasks')
+def student_task_index():
+    """Sorts the visible (not hidden) rows of student_tasks.csv by student and due date, so 
+    pages of a student's tasks can be sliced without reading the file again. 
+    
+    Returns:
+    -------- 
+    dict : tasks (Due, Task, Course, Teacher, Block and Completed of each row, sorted by student 
+           and due date), students (the sorted student names) and starts (the first row of each 
+           student, then the number of rows). 
+    """
+    df_tasks = read_csv(STUDENT_TASKS)
+    df_tasks = df_tasks[(df_tasks['Hidden'] != True) & df_tasks['Student'].notna()].copy()
+    df_tasks['Due'] = pd.to_datetime(df_tasks['Due'])
+    df_tasks['Completed'] = df_tasks['Completed'] == True
+    df_tasks = df_tasks.sort_values(by='Due', kind='stable').sort_values(by='Student', kind='stable')
+    student, students = pd.factorize(df_tasks['Student'], sort=True)
+    return {'tasks': df_tasks[TASK_COLUMNS + ['Completed']].reset_index(drop=True), 
+            'students': students, 'starts': np.searchsorted(student, np.arange(len(students) + 1))}
+
+def parse_filter_query(filter_query):
+    """Splits a DataTable filter query (e.g. "{Course} contains 'Math' && {Due} >= 2025-01-01") into 
+    its conditions. 
+    
+    Parameters
+    ----------
+    filter_query: str
+        The filter_query of the table.  
+
+    Returns:
+    -------- 
+    list : A list of (column, operator, value) tuples. 
+    """
+    conditions = []
+    for part in (filter_query or '').split(' && '):
+        for operator_type in FILTER_OPERATORS:
+            for operator in operator_type:
+                if operator not in part:
+                    continue
+                name_part, value_part = part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+                value = value_part.strip()
+                if value and value[0] == value[-1] and value[0] in ("'", '"', '`'):
+                    value = value[1:-1].replace('\\' + value[0], value[0])
+                conditions.append((name, operator_type[-1], value))
+                break
+            else:
+                continue
+            break
+    return conditions
+
+def frame_page(df, page_current=0, page_size=10, sort_by=(), filter_query=''):
+    """Filters, sorts and slices a table for a DataTable with custom paging, sorting and 
+    filtering. Numeric columns are compared as numbers, others as text. 
+    
+    Parameters
+    ----------
+    df: pd.DataFrame
+        The table, one column per DataTable column. 
+    page_current: int
+        The page to retrieve, starting from 0. 
+    page_size: int
+        The number of rows per page. 
+    sort_by: list
+        A list of (column, direction) pairs, direction being 'asc' or 'desc'. 
+    filter_query: str
+        The filter_query of the table (see parse_filter_query). 
+
+    Returns:
+    -------- 
+    rows : list
+        A list of dictionaries containing the rows on the page, missing values as None. 
+    page_count : int
+        The number of pages. 
+    matched : int
+        The number of rows after filtering. 
+    """
+    mask = pd.Series(True, index=df.index)
+    for column, operator, value in parse_filter_query(filter_query):
+        if column not in df.columns:
+            continue
+        if operator in ('contains', 'datestartswith') or not pd.api.types.is_numeric_dtype(df[column]):
+            text = df[column].astype(str)
+            if operator == 'contains':
+                mask &= text.str.contains(value, case=False, regex=False)
+            elif operator == 'datestartswith':
+                mask &= text.str.startswith(value)
+            else:
+                mask &= getattr(text, operator)(value)
+        else:
+            number = pd.to_numeric(value, errors='coerce')
+            if pd.notna(number):
+                mask &= getattr(df[column], operator)(number)
+    df = df[mask]
+
+    # sort
+    if sort_by:
+        columns = [column for column, _ in sort_by]
+        ascending = [direction == 'asc' for _, direction in sort_by]
+        df = df.sort_values(by=columns, ascending=ascending, kind='stable')
+
+    # page
+    page_count = max(1, math.ceil(len(df) / page_size))
+    page = df.iloc[page_current * page_size: (page_current + 1) * page_size]
+    rows = page.astype(object).where(page.notna(), None).to_dict('records')
+    return rows, page_count, len(df)
+
+@memoize('tasks')
+def student_task_page(student, page_current=0, page_size=10, sort_by=(), filter_query='', exclude=()):
+    """Retrieves one page of a student's tasks, after filtering and sorting, for a DataTable with 
+    custom paging, sorting and filtering. 
+    
+    Parameters
+    ----------
+    student: str
+        The name of the student.  
+    page_current: int
+        The page to retrieve, starting from 0. 
+    page_size: int
+        The number of rows per page. 
+    sort_by: list
+        A list of (column, direction) pairs, direction being 'asc' or 'desc'. 
+    filter_query: str
+        The filter_query of the table (see parse_filter_query). 
+    exclude: list
+        Tasks to leave out (e.g. deleted but not yet saved), as (Task, Course, Teacher, Block) tuples. 
+
+    Returns:
+    -------- 
+    rows : list
+        A list of dictionaries containing the tasks on the page. 
+    completed : list
+        Whether each task on the page is completed. 
+    page_count : int
+        The number of pages. 
+    """
+    index = student_task_index()
+    position = index['students'].get_indexer([student])[0]
+    if position < 0:
+        return [], [], 1
+    df = index['tasks'].iloc[index['starts'][position]:index['starts'][position + 1]].reset_index(drop=True)
+
+    display_due = df['Due'].dt.strftime('%b %d')
+    mask = pd.Series(True, index=df.index)
+
+    # leave out pending deletions
+    if exclude:
+        keys = pd.Series(list(zip(*[df[col] for col in TASK_KEY])), index=df.index, dtype=object)
+        mask &= ~keys.isin(set(map(tuple, exclude)))
+
+    # filter
+    for column, operator, value in parse_filter_query(filter_query):
+        if column not in TASK_COLUMNS:
+            continue
+        text = display_due if column == 'Due' else df[column].astype(str)
+        if operator == 'contains':
+            mask &= text.str.contains(value, case=False, regex=False)
+        elif operator == 'datestartswith':
+            mask &= text.str.startswith(value)
+        elif column == 'Due':
+            # compare dates, not the displayed month/day
+            date = pd.to_datetime(value, errors='coerce')
+            if pd.notna(date):
+                mask &= getattr(df['Due'], operator)(date)
+        else:
+            mask &= getattr(text, operator)(value)
+    df = df[mask]
+
+    # sort
+    if sort_by:
+        columns = [column for column, _ in sort_by]
+        ascending = [direction == 'asc' for _, direction in sort_by]
+        df = df.sort_values(by=columns, ascending=ascending, kind='stable')
+
+    # page
+    page_count = max(1, math.ceil(len(df) / page_size))
+    page = df.iloc[page_current * page_size: (page_current + 1) * page_size].copy()
+    page['Due'] = page['Due'].dt.strftime('%b %d')
+    return page[TASK_COLUMNS].to_dict('records'), page['Completed'].tolist(), page_count
+
+@memoize('deadlines', 'students')
 def teacher_roster(teacher):
     """Retrieves the students in each of the teachers classes. 
     
@@ -297,8 +525,8 @@ def teacher_roster(teacher):
     -------- 
     list : A list of dictionaries containing the courses and student lists. 
     """
-    df_deadlines = pd.read_csv(DEADLINES_DATA)
-    df_student = pd.read_csv(STUDENT_DATA)
+    df_deadlines = read_csv(DEADLINES_DATA)
+    df_student = read_csv(STUDENT_DATA)
     df_merged = pd.merge(df_deadlines, df_student, on=['Course', 'Teacher', 'Block'])
     df_teacher = df_merged[df_merged['Teacher'] == teacher].copy()
     df_teacher['Course_block'] = df_teacher['Course'] + " (" + df_teacher['Block'] + ")"
@@ -308,6 +536,86 @@ def teacher_roster(teacher):
         df_clean_dict[col] = list(set(df_pivot[col].dropna()))
     return df_clean_dict
 
+def cohort_attendance(teacher, attendance=None):
+    """Retrieves the attendance codes and support work habit scores of every student in the given 
+    teacher's classes, by date, with a single pivot over the attendance data. 
+    
+    Parameters
+    ----------
+    teacher: str
+        The name of the teacher.     
+    attendance: pd.DataFrame, optional
+        Contents of attendance_habits.csv, if already loaded. 
+    
+    Returns:
+    -------- 
+    dict : The students (rows) and dates (columns), with a matrix of attendance codes in the teacher's 
+           classes (index into ATTENDANCE_CODES, the worst code if the student has more than one of the 
+           teacher's classes that day) and a matrix of work habit scores (0-4) from support class. 
+           Missing values are None. 
+    """
+    roster = teacher_roster(teacher)
+    students = sorted(set().union(*roster.values()))
+    if attendance is None:
+        attendance = read_csv(ATTEND_DATA)
+    
+    # codes from the teacher's classes, scores from support class
+    df = attendance[attendance['Student'].isin(students)]
+    df = pd.DataFrame({
+        'Student': df['Student'], 
+        'Date': df['Date'], 
+        'Code': df['Attendance'].map({code: n for n, code in enumerate(ATTENDANCE_CODES)}).where(df['Teacher'] == teacher),
+        'Score': df['Habit'].map(WORKHABIT_SCORES)
+    })
+
+    # Students x Dates
+    df_pivot = df.pivot_table(index='Student', columns='Date', values=['Code', 'Score'], aggfunc='max', dropna=False)
+    dates = sorted(df['Date'].unique())
+    codes = df_pivot.reindex(columns=pd.MultiIndex.from_product([['Code'], dates])).reindex(index=students)
+    scores = df_pivot.reindex(columns=pd.MultiIndex.from_product([['Score'], dates])).reindex(index=students)
+    return {
+        'students': students, 
+        'dates': dates, 
+        'codes': codes.astype('Int64').astype(object).where(codes.notna(), None).values.tolist(), 
+        'scores': scores.astype('Int64').astype(object).where(scores.notna(), None).values.tolist()
+    }
+
+@memoize('deadlines', 'students')
+def teacher_task_index(teacher):
+    """Retrieves the assignments/tests of the given teacher's classes (courses with students), sorted 
+    by due date, so a date range can be looked up with a binary search instead of a scan. 
+    
+    Parameters
+    ----------
+    teacher: str
+        The name of the teacher. 
+
+    Returns:
+    -------- 
+    dict : 'due' (sorted numpy datetime64 array), 'course_block' and 'task_due' (numpy arrays aligned
+           with 'due'). Do not modify. 
+    """
+    df_deadlines = read_csv(DEADLINES_DATA)
+    df_student = read_csv(STUDENT_DATA)
+    df_deadlines = df_deadlines[df_deadlines['Teacher'] == teacher].copy()
+
+    # classes with at least one student
+    classes = df_student[df_student['Teacher'] == teacher][['Course', 'Teacher', 'Block']].drop_duplicates()
+    df_teacher = pd.merge(df_deadlines, classes, on=['Course', 'Teacher', 'Block'])
+
+    # convert to dates, sort
+    df_teacher['Due'] = pd.to_datetime(df_teacher['Due'], errors='coerce').dt.normalize()
+    df_teacher = df_teacher.dropna(subset=['Due']).drop_duplicates().sort_values(by='Due', kind='stable')
+
+    # format for table
+    task_due = df_teacher['Task'].str.cat(df_teacher['Due'].dt.strftime('%b %d'), sep=' - ')
+    course_block = df_teacher['Course'] + " (" + df_teacher['Block'] + ")"
+    return {
+        'due': df_teacher['Due'].to_numpy(dtype='datetime64[ns]'), 
+        'course_block': course_block.to_numpy(), 
+        'task_due': task_due.to_numpy()
+    }
+
 def teacher_tasks(teacher, start_date, end_date):
     """Retrieves the assignments/tests due within the specified time for each course the given teacher teaches. 
     
@@ -326,60 +634,55 @@ def teacher_tasks(teacher, start_date, end_date):
     -------- 
     list : A list of dictionaries containing the courses as keys and a list of assignments/tests as items. 
     """
-    df_deadlines = pd.read_csv(DEADLINES_DATA)
-    df_student = pd.read_csv(STUDENT_DATA)
+    index = teacher_task_index(teacher)
+    start_date_obj = np.datetime64(start_date[:10], 'ns')
+    end_date_obj = np.datetime64(end_date[:10], 'ns')
 
-    # convert to dates
-    df_deadlines['Due'] = pd.to_datetime(df_deadlines['Due'], errors='coerce').dt.date
-    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
+    # due dates are sorted, find the range 
+    first = np.searchsorted(index['due'], start_date_obj, side='left')
+    last = np.searchsorted(index['due'], end_date_obj, side='right')
 
-    df_merged = pd.merge(df_deadlines, df_student, on=['Course', 'Teacher', 'Block'])
-    
-    # filter by teacher & date
-    df_teacher = df_merged[df_merged['Teacher'] == teacher].copy()
-    df_teacher = df_teacher[(df_teacher['Due'] >= start_date_obj) & (df_teacher['Due'] <= end_date_obj)]
-    
-    # format for table
-    df_teacher['Due_display'] = pd.to_datetime(df_teacher['Due']).dt.strftime('%b %d')  
-    df_teacher['Task_due'] = df_teacher['Task'].str.cat(df_teacher['Due_display'], sep=' - ')
-    df_teacher['Course_block'] = df_teacher['Course'] + " (" + df_teacher['Block'] + ")"
-    df_pivot = df_teacher.pivot(columns='Course_block', values='Task_due')    
     df_clean_dict = {}
-    
-    for col in df_pivot.columns:
-        df_clean_dict[col] = list(set(df_pivot[col].dropna()))
-    return df_clean_dict
+    for col, task in zip(index['course_block'][first:last], index['task_due'][first:last]):
+        df_clean_dict.setdefault(col, {})[task] = None
+    return {col: list(tasks) for col, tasks in df_clean_dict.items()}
 
 def student_tasks_update():
     """Generates and updates student_tasks.csv to include newly entered deadlines. 
     """
-    # load data
-    df_master = pd.read_csv(DEADLINES_DATA)
-    student_schedule = pd.read_csv(STUDENT_DATA)
+    with logged_write('tasks') as record:
+        # load data
+        df_master = read_csv(DEADLINES_DATA)
+        student_schedule = read_csv(STUDENT_DATA)
     
-    # create file 
-    if not os.path.isfile(STUDENT_TASKS):
+        # load current tasks, none yet if the file is missing
         columns = ['Student', 'Task', 'Course', 'Block', 'Teacher', 'Grade', 'Due', 'Completed', 'Hidden']
-        pd.DataFrame(columns=columns).to_csv(STUDENT_TASKS, index=False)
-    
-    df_student_tasks = pd.read_csv(STUDENT_TASKS) 
-    
-    # obtain new tasks to include    
-    match_cols=['Task', 'Course', 'Block', 'Teacher', 'Due']
-    merged = df_master.merge(df_student_tasks[match_cols].drop_duplicates(), on=match_cols, how='left', indicator=True)
-    new_tasks = merged[merged['_merge'] == 'left_only'].drop(columns='_merge')
-
-    # match with students and format
-    new_data = pd.merge(student_schedule, new_tasks, on=['Course', 'Teacher', 'Block'], how='inner')
-    new_data['Completed'] = False
-    new_data['Hidden'] = False
-    new_data = new_data[['Student', 'Task', 'Course', 'Block', 'Teacher', 'Grade', 'Due', 'Completed', 'Hidden']]
-
-    # save new data
-    new_data.to_csv(STUDENT_TASKS, mode='a', header=False, index=False)  
-
-def save_deadlines_data(data):
+        if os.path.isfile(STUDENT_TASKS):
+            df_student_tasks = read_csv(STUDENT_TASKS) 
+        else:
+            df_student_tasks = pd.DataFrame(columns=columns)
+    
+        # obtain new tasks to include    
+        match_cols=['Task', 'Course', 'Block', 'Teacher', 'Due']
+        merged = df_master.merge(df_student_tasks[match_cols].drop_duplicates(), on=match_cols, how='left', indicator=True)
+        new_tasks = merged[merged['_merge'] == 'left_only'].drop(columns='_merge')
+
+        # match with students and format
+        new_data = pd.merge(student_schedule, new_tasks, on=['Course', 'Teacher', 'Block'], how='inner')
+        new_data['Completed'] = False
+        new_data['Hidden'] = False
+        new_data = new_data[columns]
+
+        # save new data
+        if len(new_data):
+            df_student_tasks = pd.concat([df_student_tasks, new_data], ignore_index=True) if len(df_student_tasks) else new_data
+            write_csv(df_student_tasks, STUDENT_TASKS)
+            record('append', new_data)
+            publish('tasks', new_data)
+        elif not os.path.isfile(STUDENT_TASKS):
+            write_csv(df_student_tasks, STUDENT_TASKS)
+
+def save_deadlines_data(data, progress=None):
     """Updates master_deadlines.csv to include user entered data. Then calls student_task_updates() to 
     update student_tasks.csv with newly entered tasks. 
     
@@ -388,10 +691,17 @@ def save_deadlines_data(data):
     data: list
         A list of dictionaries obtained from the the dash table.
 
+    progress: callable, optional
+        Called with a status message before each step, to report progress of a long save. 
+
     Returns
     -------
     str: Verified message.  
     """
+    if progress is None:
+        progress = lambda message: None
+
+    progress(f"Saving {len(data)} deadline(s)...")
     clean_data = []
     
     for data_pt in data:        
@@ -406,78 +716,103 @@ def save_deadlines_data(data):
         clean_data.append(temp_pt)
 
     # Save data
-    current_data = pd.read_csv(DEADLINES_DATA)
-    df_clean = pd.DataFrame(clean_data)
-    df_updated = pd.concat([current_data, df_clean], ignore_index=True)
-    df_updated = df_updated.sort_values(by=['Due', 'Teacher'], ascending=[True, True])
-    df_updated.to_csv(DEADLINES_DATA, index=False)
+    with logged_write('deadlines') as record:
+        current_data = read_csv(DEADLINES_DATA)
+        df_clean = pd.DataFrame(clean_data)
+        df_updated = pd.concat([current_data, df_clean], ignore_index=True)
+        df_updated = df_updated.sort_values(by=['Due', 'Teacher'], ascending=[True, True])
+        write_csv(df_updated, DEADLINES_DATA)
+        record('append', df_clean)
+        publish('deadlines', df_clean)
     
     # update student_tasks.csv
+    progress("Updating student tasks...")
     student_tasks_update()
 
     return "Data saved successfully."
 
-def save_deleted_changes(data, student_name):
-    """Updates student_tasks.csv to includes changes to 'Hidden' column when user deletes
-    rows in student task table.
+def save_task_changes(student_name, data=None, selected_rows_data=None, hidden=None, completed=None):
+    """Updates the 'Hidden' and 'Completed' columns of student_tasks.csv for the given student 
+    from the student task table, with a single read and write while holding the table lock.
+    Either from the whole table (data, selected_rows_data): rows missing from the table are hidden, 
+    and only the selected rows are completed. Or from the edits made in it (hidden, completed): 
+    only the tasks edited are changed, so edits saved meanwhile from elsewhere to other tasks are kept. 
     
     Parameters
     ----------
-    data: list
-        A list of dictionaries obtained from the the dash table.
-    
     student_name: string  
         The name of the students data to edit. 
 
-    Returns
-    -------
-    str: Verified message.  
-    """
-    df_tasks = pd.read_csv(STUDENT_TASKS)
-    df_student_tasks = df_tasks[df_tasks['Student'] == student_name]
-  
-    # find deleted rows 
-    data_compare = [{k: v for k, v in row.items() if k != 'Due'} for row in data] 
-    for ind, row in df_student_tasks.iterrows():
-        row_dict = row[['Task', 'Course', 'Teacher', 'Block']].to_dict()
-        if row_dict not in data_compare:
-            df_student_tasks.at[ind, 'Hidden'] = True
-    
-    # Save changes
-    df_tasks.update(df_student_tasks)
-    df_tasks.to_csv(STUDENT_TASKS, index=False)
-    return "Changes saved successfully."
-
-def save_checked_changes(selected_rows_data, student_name):
-    """Updates student_tasks.csv to include changes to 'Completed' column when user checks
-    rows in student task table.
-    
-    Parameters
-    ----------
-    selected_rows_ind: list
-        A list of indicies of selected rows obtained from the the dash table.
-    
-    student_name: string  
-        The name of the students data to edit. 
+    data: list, optional
+        A list of dictionaries of the rows remaining in the dash table. Hidden rows are left 
+        unchanged if None.
+
+    selected_rows_data: list, optional
+        A list of dictionaries of the checked rows in the dash table. Completed rows are left 
+        unchanged if None.
+
+    hidden: list, optional
+        A list of dictionaries of the tasks deleted from the table, to hide. 
+
+    completed: list, optional
+        A list of dictionaries of the tasks checked or unchecked in the table, with 'Completed' 
+        True or False. 
 
     Returns
     -------
-    str: Verified message.  
+    dict: The tasks that changed, as lists of dictionaries with the task, course, teacher and 
+          block, under 'hidden', 'completed' and 'uncompleted'.
     """
-    df_tasks = pd.read_csv(STUDENT_TASKS)
-    df_student_tasks = df_tasks[df_tasks['Student'] == student_name].copy()
-
-    # handle unchecking
-    df_student_tasks['Completed'] = False
-
-    # find checked rows
-    data_compare = [{k: v for k, v in row.items() if k != 'Due'} for row in selected_rows_data] 
-    for ind, row in df_student_tasks.iterrows():
-        row_dict = row[['Task', 'Course', 'Teacher', 'Block']].to_dict()
-        if row_dict in data_compare:
-            df_student_tasks.at[ind, 'Completed'] = True
-    
-    # Save changes
-    df_tasks.update(df_student_tasks)
-    df_tasks.to_csv(STUDENT_TASKS, index=False)
-    return "Changes saved successfully."
\ No newline at end of file
+    diff = {'hidden': [], 'completed': [], 'uncompleted': []}
+    changed = None
+
+    with logged_write('tasks') as record:
+        df_tasks = read_csv(STUDENT_TASKS)
+        # only rows that were in the table, tasks hidden earlier keep their state
+        table_rows = (df_tasks['Student'] == student_name) & (df_tasks['Hidden'] != True)
+        keys = pd.Series(list(zip(*[df_tasks[col] for col in TASK_KEY])), index=df_tasks.index, dtype=object)
+        was_completed = df_tasks['Completed'] == True
+
+        # hide rows deleted from the table
+        if data is not None or hidden is not None:
+            if data is not None:
+                remaining = {tuple(row.get(col) for col in TASK_KEY) for row in data}
+                hide = table_rows & ~keys.isin(remaining)
+            else:
+                hide = table_rows & keys.isin({tuple(row.get(col) for col in TASK_KEY) for row in hidden})
+            df_tasks.loc[hide, 'Hidden'] = True
+            changed = hide
+            diff['hidden'] = df_tasks.loc[hide, TASK_KEY].to_dict('records')
+
+        # complete checked rows, uncheck the rest (of the table, or of the rows edited)
+        if selected_rows_data is not None or completed is not None:
+            if selected_rows_data is not None:
+                checked = {tuple(row.get(col) for col in TASK_KEY) for row in selected_rows_data}
+                edited = table_rows
+                complete = table_rows & keys.isin(checked)
+            else:
+                states = {tuple(row.get(col) for col in TASK_KEY): bool(row['Completed']) for row in completed}
+                edited = table_rows & keys.isin(set(states))
+                complete = pd.Series(False, index=df_tasks.index)
+                complete[edited] = [states[key] for key in keys[edited]]
+            diff['completed'] = df_tasks.loc[complete & ~was_completed, TASK_KEY].to_dict('records')
+            diff['uncompleted'] = df_tasks.loc[edited & ~complete & was_completed, TASK_KEY].to_dict('records')
+            df_tasks.loc[edited, 'Completed'] = complete[edited]
+            toggled = edited & (complete != was_completed)
+            changed = toggled if changed is None else changed | toggled
+
+        # save changes
+        if any(diff.values()):
+            write_csv(df_tasks, STUDENT_TASKS)
+            record('update', df_tasks[changed])
+            publish('tasks', df_tasks[changed])
+    return diff
+
+# latency metrics, when enabled
+instrument_module(globals(), [
+    'student_list', 'student_schedule', 'workhabit_trend', 'get_student_note', 'save_student_note',
+    'save_workhabits_data', 'teacher_list', 'course_list', 'upcoming_deadlines',
+    'student_deadlines', 'student_task_index', 'student_task_page', 'teacher_roster',
+    'cohort_attendance', 'teacher_task_index', 'teacher_tasks', 'student_tasks_update',
+    'save_deadlines_data', 'save_task_changes'
+])
@@ -0,0 +1,299 @@
+import os
+import json
+import pickle
+import shutil
+import contextlib
+import pandas as pd
+from datetime import datetime
+from .config import TABLES, EVENTS_DIR, VIEWS_DIR, VIEW_CHECKPOINT
+from .cache import locked_file, table_lock, file_signature
+from .feed import json_records
+from .metrics import read_csv, instrument_module
+
+# EVENT LOG
+# Every write to a table is appended to events.jsonl under EVENTS_DIR as one event
+#   {'table', 'kind', 'time', 'signature', 'rows'}
+# kind being 'append' (rows added: work habit entries, deadlines and the tasks they give students),
+# 'update' (student tasks hidden, completed or uncompleted, as they are after the change) or 'note'
+# (a student's note), and signature the table's file signature after the write. An event is
+# identified by its byte position in the log. Before the first logged write to a table its CSV
+# file is copied to base/, so the table at any time is that copy with the events up to then replayed.
+EVENT_LOG = os.path.join(EVENTS_DIR, 'events.jsonl')
+BASE_DIR = os.path.join(EVENTS_DIR, 'base')
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+# appended rows are sorted as the saves in data.py sort them
+APPEND_ORDER = {'attendance': ['Student', 'Date'], 'deadlines': ['Due', 'Teacher']}
+
+# the columns identifying the rows an update or note replaces, and the columns it sets
+REPLACE = {
+    'update': (['Student', 'Task', 'Course', 'Teacher', 'Block', 'Due'], ['Completed', 'Hidden']),
+    'note': (['Student'], ['Note'])
+}
+
+def _base_path(table):
+    return os.path.join(BASE_DIR, os.path.basename(TABLES[table]))
+
+def _copy_base(table):
+    # the table as it is before its first logged write, an empty file if it has none yet
+    path = _base_path(table)
+    if os.path.exists(path):
+        return
+    os.makedirs(BASE_DIR, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(TABLES[table]):
+        shutil.copyfile(TABLES[table], tmp_path)
+    else:
+        open(tmp_path, 'w').close()
+    os.replace(tmp_path, path)
+
+def record_event(table, kind, rows):
+    """Appends a write to the event log. Called after the table's CSV file is written, while
+    holding its lock (see logged_write).
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, a key of config.TABLES.
+    kind: str
+        'append', 'update' or 'note'.
+    rows: pd.DataFrame or list
+        The rows added or changed by the write.
+
+    Returns
+    -------
+    int: The position of the event in the log.
+    """
+    os.makedirs(EVENTS_DIR, exist_ok=True)
+    event = {'table': table, 'kind': kind, 'time': datetime.now().strftime(TIME_FORMAT),
+             'signature': file_signature(TABLES[table]), 'rows': json_records(rows)}
+    line = (json.dumps(event, default=str) + '\n').encode()
+    with locked_file(EVENT_LOG, 'ab') as f:
+        position = f.seek(0, os.SEEK_END)
+        f.write(line)
+        f.flush()
+    return position
+
+@contextlib.contextmanager
+def logged_write(table):
+    """Context manager for a load-modify-write of a table's CSV file that is kept in the event
+    log. Holds the table lock (see cache.table_lock), copies the file to the log's base before
+    the table's first logged write, and yields a function to call with the event's kind and
+    rows once the file is written (see record_event).
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, a key of config.TABLES.
+    """
+    with table_lock(table):
+        _copy_base(table)
+        yield lambda kind, rows: record_event(table, kind, rows)
+
+def log_position():
+    """The position after the last event in the log, 0 if it is empty."""
+    try:
+        return os.path.getsize(EVENT_LOG)
+    except FileNotFoundError:
+        return 0
+
+def read_events(position=0, table=None):
+    """Reads the events logged from a position on.
+
+    Parameters
+    ----------
+    position: int
+        The position to read from, 0 for the whole log.
+    table: str, optional
+        Only the events of this table. All tables if None.
+
+    Returns
+    -------
+    events : list
+        The events, oldest first, each with its 'position'. None if the log ends before the
+        position (it was cleared).
+    end : int
+        The position after the last event read.
+    """
+    try:
+        with locked_file(EVENT_LOG, 'rb', exclusive=False) as f:
+            end = f.seek(0, os.SEEK_END)
+            if position > end:
+                return None, end
+            f.seek(position)
+            lines = f.read().splitlines(keepends=True)
+    except FileNotFoundError:
+        return (None if position else []), 0
+
+    # the table is the first key of an event, so other tables' events are skipped unparsed
+    prefix = (json.dumps({'table': table})[:-1] + ',').encode() if table else b''
+    events = []
+    for line in lines:
+        if line.endswith(b'\n') and line.startswith(prefix):
+            events.append(dict(json.loads(line), position=position))
+        position += len(line)
+    return events, position
+
+# REPLAY
+def _append(table, df, added):
+    # rows added by consecutive append events: the saves sort the table after every append, and
+    # the sort is stable, so sorting once after all of them gives the same rows in the same order
+    frames = [frame for frame in [df] + added if len(frame.columns)]
+    if not added or not frames:
+        return df
+    df = pd.concat(frames, ignore_index=True)
+    if table in APPEND_ORDER:
+        df = df.sort_values(by=APPEND_ORDER[table])
+    return df
+
+def _replace(df, rows, key, columns):
+    # sets the columns of the rows with the same key, and adds rows not in the table yet
+    rows = rows.drop_duplicates(key, keep='last')
+    if df.empty:
+        return pd.concat([df, rows], ignore_index=True) if len(df.columns) else rows.reset_index(drop=True)
+    changed, keys = pd.MultiIndex.from_frame(rows[key]), pd.MultiIndex.from_frame(df[key])
+    found = changed.get_indexer(keys)
+    hit = found >= 0
+    df = df.copy()
+    df.loc[hit, columns] = rows[columns].to_numpy()[found[hit]]
+    added = rows[~changed.isin(keys)]
+    return pd.concat([df, added], ignore_index=True) if len(added) else df
+
+def replay(table, df, events):
+    """Applies logged events to a table's rows.
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, a key of config.TABLES.
+    df: pd.DataFrame
+        The table's rows before the events.
+    events: list
+        Events of the table, oldest first (see read_events).
+
+    Returns
+    -------
+    pd.DataFrame: The table's rows after the events.
+    """
+    added = []
+    for event in events:
+        rows = pd.DataFrame(event['rows'])
+        if event['kind'] == 'append':
+            added.append(rows)
+            continue
+        df, added = _append(table, df, added), []
+        key, columns = REPLACE[event['kind']]
+        df = _replace(df, rows, key, columns)
+    return _append(table, df, added)
+
+def table_at(table, when=None):
+    """Reconstructs a table as it was at a point in time, from the event log.
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, a key of config.TABLES.
+    when: str or datetime, optional
+        The point in time, e.g. '2025-03-01 15:00' (a date alone is its start). Now if None.
+
+    Returns
+    -------
+    pd.DataFrame: The table's rows at that time.
+    """
+    base = _base_path(table)
+    if not os.path.exists(base):
+        # no logged writes, the table is as it is now
+        return read_csv(TABLES[table])
+    df = read_csv(base) if os.path.getsize(base) else pd.DataFrame()
+    events, _ = read_events(0, table)
+    if when is not None:
+        until = pd.Timestamp(when).strftime(TIME_FORMAT)
+        events = [event for event in events if event['time'] <= until]
+    return replay(table, df, events)
+
+# MATERIALIZED VIEWS
+# Data derived from a table (the attendance cube, the risk signals) is kept with the log position
+# and file signature it reflects, and saved under VIEWS_DIR. After a write, or in a process just
+# started, it is brought up to date by replaying only the newer events of the table, and read
+# again from the CSV file only if the file changed outside the app or the log was cleared.
+def _view_path(name):
+    return os.path.join(VIEWS_DIR, f'{name}.pkl')
+
+def _load_view(name):
+    try:
+        with open(_view_path(name), 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # missing, or saved by another version of the code: built again
+        return None
+
+def _save_view(name, view):
+    os.makedirs(VIEWS_DIR, exist_ok=True)
+    tmp_path = f'{_view_path(name)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(dict(view, replayed=0), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, _view_path(name))
+
+def drop_views(*names):
+    """Deletes saved views, they are built again from the CSV files on next use.
+
+    Parameters
+    ----------
+    *names: str
+        The names of the views.
+    """
+    for name in names:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(_view_path(name))
+
+def refresh_view(name, table, view, build, apply=None, columns=None):
+    """Brings a view of a table up to date with the event log.
+
+    Parameters
+    ----------
+    name: str
+        The name the view is saved under.
+    table: str
+        The name of the table, a key of config.TABLES.
+    view: dict
+        The view as last returned, None in a new process (the saved view is loaded).
+    build: callable
+        Builds the data from the table's rows.
+    apply: callable, optional
+        Applies the rows added or changed by newer events to the data, returning the new data,
+        or None if it cannot (the data is built again). Built again after every write if None.
+    columns: list, optional
+        The columns of the CSV file build needs. All if None.
+
+    Returns
+    -------
+    dict: The data under 'data', with the 'position' and 'signature' it reflects. Do not modify.
+    """
+    signature = file_signature(TABLES[table])
+    if view is None:
+        view = _load_view(name)
+    if view is not None and view['signature'] == signature:
+        return view
+
+    if view is not None and apply is not None:
+        events, position = read_events(view['position'], table)
+        if events and tuple(events[-1]['signature'] or ()) == signature:
+            data = apply(view['data'], pd.DataFrame([row for event in events for row in event['rows']]))
+            if data is not None:
+                view = {'data': data, 'position': position, 'signature': signature,
+                        'replayed': view.get('replayed', 0) + len(events)}
+                if view['replayed'] >= VIEW_CHECKPOINT:
+                    _save_view(name, view)
+                return view
+
+    # read while no write is in progress, so the position and signature match the rows read
+    with table_lock(table):
+        position = log_position()
+        signature = file_signature(TABLES[table])
+        df = read_csv(TABLES[table], usecols=columns)
+    view = {'data': build(df), 'position': position, 'signature': signature, 'replayed': 0}
+    _save_view(name, view)
+    return view
+
+# latency metrics, when enabled
+instrument_module(globals(), ['record_event', 'read_events', 'replay', 'table_at', 'refresh_view'])
@@ -0,0 +1,277 @@
+import re
+import zipfile
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from urllib.parse import urlencode
+from flask import request, Response, stream_with_context
+from .config import STUDENT_DATA, DEADLINES_DATA, EXPORT_CHUNK
+from .cube import attendance_cube
+from .data import ATTENDANCE_CODES
+from .metrics import read_csv
+
+# EXPORT
+# Spreadsheets of a teacher's classes, or of the whole school, streamed to the browser as they
+# are written:
+#   Roster:     the students of each of the teacher's classes
+#   Tasks:      the tasks due in a date range, in classes with students (as in data.teacher_tasks)
+#   Attendance: each student's attendance codes in each class, from the attendance cube
+# student.csv and master_deadlines.csv are read EXPORT_CHUNK rows at a time and each chunk is
+# sent before the next is read, so an export of the whole school needs no more memory than one
+# chunk (a single teacher's rows are collected first, to be sorted by class). XLSX files are
+# written as the zipped XML of their sheets, no spreadsheet library needed.
+PARTS = {
+    'roster': ['Course', 'Block', 'Teacher', 'Student', 'Grade'],
+    'tasks': ['Due', 'Task', 'Course', 'Block', 'Teacher'],
+    'attendance': ['Course', 'Block', 'Teacher', 'Student', 'Grade', 'Classes'] + ATTENDANCE_CODES + ['Absence %']
+}
+CLASS_KEY = ['Course', 'Teacher', 'Block']
+
+def _chunks(path, columns, teacher=None):
+    # the rows of a CSV file, EXPORT_CHUNK at a time, only the teacher's if given
+    for chunk in read_csv(path, usecols=columns, chunksize=EXPORT_CHUNK):
+        yield chunk[chunk['Teacher'] == teacher] if teacher else chunk
+
+def _ordered(chunks, teacher, by):
+    # a teacher's rows are few, sort them; the whole school is sent in file order
+    if not teacher:
+        yield from chunks
+        return
+    rows = [chunk for chunk in chunks if len(chunk)]
+    if rows:
+        yield pd.concat(rows).sort_values(by=by, kind='stable')
+
+def roster_rows(teacher=None):
+    """The students of each of the teacher's classes, support classes included.
+
+    Parameters
+    ----------
+    teacher: str, optional
+        The name of the teacher. Every class in the school if None.
+
+    Returns
+    -------
+    generator: DataFrames with the roster columns of PARTS, one chunk at a time.
+    """
+    chunks = _chunks(STUDENT_DATA, PARTS['roster'], teacher)
+    for chunk in _ordered(chunks, teacher, ['Course', 'Block', 'Student']):
+        yield chunk[PARTS['roster']]
+
+def task_rows(teacher=None, start_date=None, end_date=None):
+    """The tasks due in a date range, in classes with at least one student, as in
+    data.teacher_tasks.
+
+    Parameters
+    ----------
+    teacher: str, optional
+        The name of the teacher. Every class in the school if None.
+    start_date, end_date: str, optional
+        The first and last due dates (YYYY-MM-DD). Open-ended if None.
+
+    Returns
+    -------
+    generator: DataFrames with the task columns of PARTS, due dates as YYYY-MM-DD.
+    """
+    classes = pd.concat([chunk[CLASS_KEY].drop_duplicates() for chunk in _chunks(STUDENT_DATA, CLASS_KEY, teacher)])
+    classes = pd.MultiIndex.from_frame(classes.drop_duplicates())
+    start = pd.Timestamp(start_date[:10]) if start_date else None
+    end = pd.Timestamp(end_date[:10]) if end_date else None
+
+    def chunks():
+        for chunk in _chunks(DEADLINES_DATA, PARTS['tasks'], teacher):
+            due = pd.to_datetime(chunk['Due'], errors='coerce').dt.normalize()
+            keep = due.notna() & pd.MultiIndex.from_frame(chunk[CLASS_KEY]).isin(classes)
+            if start is not None:
+                keep &= due >= start
+            if end is not None:
+                keep &= due <= end
+            yield chunk[keep].assign(Due=due[keep].dt.strftime('%Y-%m-%d'))
+
+    for chunk in _ordered(chunks(), teacher, ['Due', 'Course', 'Block']):
+        yield chunk[PARTS['tasks']]
+
+def attendance_rows(teacher=None):
+    """Each student's attendance code counts in each of the teacher's classes, and the share
+    of classes missed (A or AE).
+
+    Parameters
+    ----------
+    teacher: str, optional
+        The name of the teacher. Every class in the school if None.
+
+    Returns
+    -------
+    generator: DataFrames with the attendance columns of PARTS.
+    """
+    counts = attendance_cube()['attendance']
+    for chunk in roster_rows(teacher):
+        # counts of each code, looked up by student and course
+        keys = pd.MultiIndex.from_frame(chunk[['Student', 'Course']])
+        codes = pd.DataFrame({code: counts.reindex(pd.MultiIndex.from_arrays(
+                    [keys.get_level_values(0), keys.get_level_values(1), np.full(len(keys), code)])).fillna(0).astype(int).to_numpy()
+                 for code in ATTENDANCE_CODES}, index=chunk.index)
+        classes = codes.sum(axis=1)
+        missed = codes['A'] + codes['AE']
+        yield chunk.assign(Classes=classes, **codes, **{'Absence %': (100 * missed / classes.where(classes > 0)).round(1)})[PARTS['attendance']]
+
+def part_rows(part, teacher=None, start_date=None, end_date=None):
+    """The rows of one part of an export (see PARTS)."""
+    if part == 'tasks':
+        return task_rows(teacher, start_date, end_date)
+    return roster_rows(teacher) if part == 'roster' else attendance_rows(teacher)
+
+def stream_csv(part, teacher=None, start_date=None, end_date=None):
+    """Writes one part of an export as CSV, a chunk at a time.
+
+    Returns
+    -------
+    generator: The CSV text, header first.
+    """
+    yield ','.join(PARTS[part]) + '\n'
+    for chunk in part_rows(part, teacher, start_date, end_date):
+        if len(chunk):
+            yield chunk.to_csv(index=False, header=False)
+
+# XLSX
+# The smallest package Excel, LibreOffice and pandas open: a workbook listing the sheets, and the
+# sheets with their text inline (no shared strings table, which would have to be kept in memory).
+XLSX_CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>')
+XLSX_SHEET_TYPE = ('<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>')
+XLSX_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>')
+XLSX_WORKBOOK = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>{sheets}</sheets></workbook>')
+XLSX_WORKBOOK_SHEET = '<sheet name="{name}" sheetId="{n}" r:id="rId{n}"/>'
+XLSX_WORKBOOK_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{sheets}</Relationships>')
+XLSX_WORKBOOK_REL = ('<Relationship Id="rId{n}" Target="worksheets/sheet{n}.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>')
+XLSX_SHEET_START = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+XLSX_SHEET_END = '</sheetData></worksheet>'
+
+# characters XML 1.0 does not allow
+INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _text_cells(values):
+    # inline string cells, escaped, blank for missing values
+    text = values.astype(str).str.replace(INVALID_XML, '', regex=True)
+    text = text.str.replace('&', '&amp;').str.replace('<', '&lt;').str.replace('>', '&gt;')
+    return ('<c t="inlineStr"><is><t xml:space="preserve">' + text + '</t></is></c>').where(values.notna(), '<c/>')
+
+def _number_cells(values):
+    return ('<c><v>' + values.astype(str) + '</v></c>').where(values.notna(), '<c/>')
+
+def sheet_rows(df):
+    """Writes rows as the XML of a worksheet: numbers as numbers, anything else as text.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        The rows, in column order.
+
+    Returns
+    -------
+    str: The <row> elements.
+    """
+    if not len(df):
+        return ''
+    cells = [(_number_cells if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])
+              else _text_cells)(df[column]) for column in df.columns]
+    rows = cells[0].str.cat(cells[1:]) if len(cells) > 1 else cells[0]
+    return ('<row>' + rows + '</row>').str.cat()
+
+class _Sink:
+    """A write-only file for zipfile, handing over what was written since it was last emptied."""
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+def stream_xlsx(teacher=None, start_date=None, end_date=None):
+    """Writes every part of an export as a sheet of an XLSX workbook, a chunk at a time.
+
+    Returns
+    -------
+    generator: The bytes of the file.
+    """
+    names = [name.capitalize() for name in PARTS]
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as xlsx:
+        xlsx.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES.format(
+            sheets=''.join(XLSX_SHEET_TYPE.format(n=n) for n in range(1, len(names) + 1))))
+        xlsx.writestr('_rels/.rels', XLSX_RELS)
+        xlsx.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(
+            sheets=''.join(XLSX_WORKBOOK_SHEET.format(name=name, n=n) for n, name in enumerate(names, 1))))
+        xlsx.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS.format(
+            sheets=''.join(XLSX_WORKBOOK_REL.format(n=n) for n in range(1, len(names) + 1))))
+        yield sink.take()
+
+        for n, part in enumerate(PARTS, 1):
+            with xlsx.open(f'xl/worksheets/sheet{n}.xml', 'w') as sheet:
+                sheet.write((XLSX_SHEET_START + sheet_rows(pd.DataFrame([PARTS[part]]))).encode())
+                for chunk in part_rows(part, teacher, start_date, end_date):
+                    sheet.write(sheet_rows(chunk).encode())
+                    yield sink.take()
+                sheet.write(XLSX_SHEET_END.encode())
+    yield sink.take()
+
+def export_url(teacher=None, start_date=None, end_date=None, file_format='xlsx', part=None):
+    """The /export link for a teacher's (or the whole school's) spreadsheet."""
+    query = {'teacher': teacher, 'start': start_date and start_date[:10], 'end': end_date and end_date[:10],
+             'format': file_format, 'part': part}
+    return '/export?' + urlencode({key: value for key, value in query.items() if value})
+
+def register_export(server):
+    """Adds the /export download endpoint to the Flask server.
+
+    GET /export?teacher=<name>&start=<YYYY-MM-DD>&end=<YYYY-MM-DD>&format=xlsx
+    streams the teacher's roster, tasks due from start to end and attendance as an XLSX workbook,
+    and &format=csv&part=roster|tasks|attendance one of them as CSV. Without a teacher, the whole
+    school is exported.
+
+    Parameters
+    ----------
+    server: flask.Flask
+        The app's server.
+    """
+    @server.route('/export')
+    def export():
+        teacher = request.args.get('teacher') or None
+        start_date, end_date = request.args.get('start'), request.args.get('end')
+        file_format = request.args.get('format', 'xlsx')
+        part = request.args.get('part', 'roster')
+        for date in (start_date, end_date):
+            if date and not re.fullmatch(r'\d{4}-\d{2}-\d{2}', date):
+                return Response('Dates must be YYYY-MM-DD.\n', status=400, mimetype='text/plain')
+        if file_format not in ('xlsx', 'csv') or part not in PARTS:
+            return Response('Unknown format or part.\n', status=400, mimetype='text/plain')
+
+        name = re.sub(r'[^\w.-]+', '_', teacher or 'school').strip('_')
+        stamp = datetime.today().strftime('%Y-%m-%d')
+        if file_format == 'csv':
+            body = stream_csv(part, teacher, start_date, end_date)
+            filename, mimetype = f'{name}-{part}-{stamp}.csv', 'text/csv'
+        else:
+            body = stream_xlsx(teacher, start_date, end_date)
+            filename, mimetype = f'{name}-{stamp}.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return Response(stream_with_context(body), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import struct
+import threading
+import contextlib
+import numpy as np
+import pandas as pd
+from flask import request, jsonify
+from .cache import bump_version, data_version, locked_file
+from .config import FEED_DIR, FEED_TABLES, FEED_SIZE, FEED_TIMEOUT, FEED_LONG_POLLS, FEED_RETRY
+
+# CHANGE FEED
+# Every write to a feed table is published as an entry {'version', 'rows'} in an append-only
+# log under cache/changes, numbered by the table's data version. Open pages long-poll
+# /changes with the last version they have seen and get back only the newer entries.
+# Next to each log, an index of fixed-size (version, offset) records locates the entries, so
+# publishing only appends and a poll reads only the entries it returns. Once a log holds
+# 2 * FEED_SIZE entries it starts again with the last FEED_SIZE.
+INDEX_RECORD = struct.Struct('<qq')
+
+def _feed_path(table):
+    return os.path.join(FEED_DIR, f'{table}.jsonl')
+
+def _index_path(table):
+    return os.path.join(FEED_DIR, f'{table}.idx')
+
+@contextlib.contextmanager
+def _feed_lock(table, exclusive=True):
+    # a separate file, as the log and index are replaced when they start again
+    with locked_file(os.path.join(FEED_DIR, f'{table}.lock'), 'a', exclusive=exclusive):
+        yield
+
+def _read_index(table):
+    # the (version, offset) of every entry, oldest first
+    try:
+        with open(_index_path(table), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return np.zeros((0, 2), dtype=np.int64)
+    data = data[:len(data) - len(data) % INDEX_RECORD.size]
+    return np.frombuffer(data, dtype='<i8').reshape(-1, 2)
+
+def _compact(table, index):
+    # keeps the last FEED_SIZE entries, written to new files that replace the log and index
+    keep = index[-FEED_SIZE:]
+    with open(_feed_path(table), 'rb') as f:
+        f.seek(keep[0, 1])
+        lines = f.read()
+    keep = keep - [0, keep[0, 1]]
+    for path, data in [(_feed_path(table), lines), (_index_path(table), keep.astype('<i8').tobytes())]:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+def json_records(rows):
+    """Converts rows to JSON friendly dictionaries."""
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.astype(object).where(rows.notna(), None).to_dict('records')
+    return [{k: (v.isoformat() if hasattr(v, 'isoformat') else v) for k, v in row.items()} for row in rows]
+
+def publish(table, rows):
+    """Bumps the table's data version and appends the changed rows to its change feed. Called
+    after the table's CSV file is written.
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, one of config.FEED_TABLES.
+    rows: pd.DataFrame or list
+        The rows added or changed by the write.
+
+    Returns
+    -------
+    int: The new version of the table.
+    """
+    os.makedirs(FEED_DIR, exist_ok=True)
+    entry = {'rows': json_records(rows)}
+    with _feed_lock(table):
+        entry['version'] = version = bump_version(table)
+        with open(_feed_path(table), 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write((json.dumps(entry, default=str) + '\n').encode())
+        with open(_index_path(table), 'ab') as f:
+            f.write(INDEX_RECORD.pack(version, offset))
+
+        count = os.path.getsize(_index_path(table)) // INDEX_RECORD.size
+        if count >= 2 * FEED_SIZE:
+            _compact(table, _read_index(table))
+    return version
+
+def feed_versions():
+    """Retrieves the current version of every feed table.
+
+    Returns
+    -------
+    dict: The version counter of each table in config.FEED_TABLES.
+    """
+    return {table: data_version(table)[0] for table in FEED_TABLES}
+
+def changes_since(table, version, latest):
+    """Retrieves the change feed entries of a table newer than the given version.
+
+    Parameters
+    ----------
+    table: str
+        The name of the table, one of config.FEED_TABLES.
+    version: int
+        The last version the client has seen.
+    latest: int
+        The newest version to include.
+
+    Returns
+    -------
+    entries : list
+        The newer entries, oldest first, each with 'version' and 'rows'.
+    complete : bool
+        False if older entries were already dropped from the feed, the client should reload
+        the table instead.
+    """
+    os.makedirs(FEED_DIR, exist_ok=True)
+    with _feed_lock(table, exclusive=False):
+        index = _read_index(table)
+        versions = index[:, 0]
+        start, stop = np.searchsorted(versions, version, 'right'), np.searchsorted(versions, latest, 'right')
+        if start == stop:
+            return [], latest == version
+        end = index[stop, 1] if stop < len(index) else None
+        with open(_feed_path(table), 'rb') as f:
+            f.seek(index[start, 1])
+            data = f.read() if end is None else f.read(end - index[start, 1])
+
+    entries = [json.loads(line) for line in data.splitlines() if line.strip()]
+    return entries, len(entries) == latest - version
+
+# long-polls open in this worker, each holds one of its threads
+_long_polls = 0
+_long_polls_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _long_poll_slot():
+    # yields False if the worker already holds FEED_LONG_POLLS long-polls
+    global _long_polls
+    with _long_polls_lock:
+        free = _long_polls < FEED_LONG_POLLS
+        _long_polls += free
+    try:
+        yield free
+    finally:
+        if free:
+            with _long_polls_lock:
+                _long_polls -= 1
+
+def register_feed(server):
+    """Adds the /changes long-poll endpoint to the Flask server.
+
+    GET /changes?deadlines=<version>&tasks=<version>&attendance=<version>&notes=<version>[&timeout=<seconds>]
+    waits until any of the tables is newer than the given version (or the timeout passes) and
+    returns {'versions': {...}, 'changes': {table: [entries]}, 'reset': [tables]}. Without
+    versions it returns the current versions straight away. Once config.FEED_LONG_POLLS
+    long-polls are open in the worker, further polls return straight away with 'retry', the
+    seconds to wait before polling again, so the worker keeps threads for other requests.
+
+    Parameters
+    ----------
+    server: flask.Flask
+        The app's server.
+    """
+    @server.route('/changes')
+    def changes():
+        known = {table: request.args.get(table, type=int) for table in FEED_TABLES}
+        timeout = min(request.args.get('timeout', FEED_TIMEOUT, type=float), FEED_TIMEOUT)
+        deadline = time.monotonic() + timeout
+        retry = {}
+
+        with _long_poll_slot() as free:
+            if not free:
+                deadline, retry = 0, {'retry': FEED_RETRY}
+
+            # wait for a newer version, only version counters are read while waiting
+            versions = feed_versions()
+            while all(known[table] is None or versions[table] == known[table] for table in FEED_TABLES):
+                if any(version is None for version in known.values()) or time.monotonic() >= deadline:
+                    return jsonify(versions=versions, changes={}, reset=[], **retry)
+                time.sleep(0.25)
+                versions = feed_versions()
+
+        result, reset = {}, []
+        for table in FEED_TABLES:
+            if known[table] is None or versions[table] == known[table]:
+                continue
+            # versions start again if the cache directory was cleared
+            entries, complete = changes_since(table, known[table], versions[table]) if versions[table] > known[table] else ([], False)
+            result[table] = entries
+            if not complete:
+                reset.append(table)
+        return jsonify(versions=versions, changes=result, reset=reset, **retry)
@@ -1,6 +1,233 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
+from functools import lru_cache
 from .config import *
+from .metrics import read_csv, instrument_module
+from .cube import attendance_cube, build_cube, cube_attendance, cube_work
+import os
+from .data import student_schedule, workhabit_trend, get_student_note, cohort_attendance, ATTENDANCE_CODES
+from .streaks import student_patterns
+from .workload import student_load
+
+# FIGURE TEMPLATES 
+# Static parts of each chart, kept as plain dicts so the fast path skips plotly's validation.
+ATTENDANCE_STATUS = ['Present', 'Late', 'Excused', 'Absent']
+ATTENDANCE_COLORS = ['rgba(41, 118, 74, 0.8)', 'rgba(33, 42, 168, 0.8)', 
+                     'rgba(239, 164, 107, 0.8)', 'rgba(194, 27, 24, 0.8)']
+ATTENDANCE_HOVER = [f'{status}: %{{x:.0f}}% - %{{customdata}} time(s)<extra></extra>' for status in ATTENDANCE_STATUS]
+ATTENDANCE_LAYOUT = {
+    'barmode': 'stack', 
+    'margin': {'l': 20, 'r': 20, 't': 20, 'b': 20}, 
+    'xaxis': {
+        'tickvals': [0, 20, 40, 60, 80, 100], 
+        'ticktext': ['0%', '20%', '40%', '60%', '80%', '100%'], 
+    },
+    'autosize': True,
+    'legend': {
+        'orientation': 'h', 
+        'yanchor': 'top', 
+        'y': -0.2, 
+        'xanchor': 'left',
+        'x': 0,
+        'itemwidth': 30, 
+        'traceorder': 'normal'
+    },
+}
+
+HABIT_CATEGORIES = ['Off-task', 'Mostly Off-task', 'Equally On/Off-task',  'Mostly On-task', 'On-task']
+WORKHABIT_TRACE = {
+    'type': 'scatter',
+    'mode': 'lines+markers',
+    'line': {'dash': 'dot', 'color': 'rgba(41, 118, 74, 0.8)'},
+    'hovertemplate': "<b>Date:</b> %{x|%b-%d}<br><b>Habit:</b> %{y}<br><extra></extra>" 
+}
+WORKHABIT_LAYOUT = {
+    'yaxis': {
+        'tickmode': 'array',
+        'tickvals': list(range(len(HABIT_CATEGORIES))), 
+        'ticktext': HABIT_CATEGORIES, 
+        'range': [-0.5, len(HABIT_CATEGORIES)-0.5]  
+    },
+    'showlegend': False, 
+    'margin': {'l': 10, 'r': 10, 't': 20, 'b': 10}, 
+    'dragmode': 'zoom'
+}
+WORKHABIT_XAXIS = {
+    'tickformat': "%b-%d",  
+    'ticks': "inside",  
+    'showgrid': True, 
+    'tickangle': 45,
+}
+ABSENCE_SHAPE = {
+    'type': 'line', 
+    'xref': 'x', 
+    'y0': 0, 
+    'y1': 1, 
+    'yref': 'y domain', 
+    'line': {'color': 'rgba(194, 27, 24, 0.8)', 'width': 1}
+}
+ABSENCE_ANNOTATION = {
+    'y': len(HABIT_CATEGORIES) - 0.5,  
+    'text': "A",
+    'showarrow': True,
+    'ax': 0,  
+    'ay': -10,  
+    'font': {'size': 12, 'color': "red"},
+    'align': "center",
+    'arrowcolor': "red",
+    'opacity': 0.7
+}
+
+COHORT_TRACE = {
+    'type': 'heatmap',
+    'zmin': -0.5,
+    'zmax': len(ATTENDANCE_CODES) - 0.5,
+    'colorscale': [[stop, color] for n, color in enumerate(ATTENDANCE_COLORS) 
+                   for stop in (n/len(ATTENDANCE_COLORS), (n+1)/len(ATTENDANCE_COLORS))],
+    'colorbar': {
+        'tickvals': list(range(len(ATTENDANCE_CODES))), 
+        'ticktext': ATTENDANCE_STATUS, 
+        'thickness': 10
+    },
+    'xgap': 1,
+    'ygap': 1,
+    'texttemplate': '%{text}',
+    'hovertemplate': "<b>%{y}</b> %{x|%b-%d}<br>Attendance: %{customdata}<br>Habit: %{text}<extra></extra>"
+}
+COHORT_LAYOUT = {
+    'xaxis': {'tickformat': "%b-%d", 'tickangle': 45, 'showgrid': False},
+    'yaxis': {'autorange': 'reversed', 'showgrid': False},
+    'margin': {'l': 10, 'r': 10, 't': 10, 'b': 10}, 
+}
+
+WORK_SUBJECTS = ["Art", "English", "French", "Math", "Science", "Socials", "Other"]
+TIMESPENT_TRACE = {
+    'type': 'bar',
+    'marker': {'color': 'rgba(33, 42, 168, 0.8)'}, 
+    'hovertemplate': (
+        "<b>%{x}</b><br>"                 
+        "Count: %{customdata}<br>"     
+        "Percentage: %{y:.0%}<br>"       
+        "<extra></extra>"                
+    ),
+}
+LOAD_TRACE = {
+    'type': 'bar',
+    'hovertemplate': "Week of %{x|%b-%d}<br>%{fullData.name}: %{y}<extra></extra>"
+}
+LOAD_NAMES = ['Tests', 'Other Tasks']
+LOAD_COLORS = ['rgba(33, 42, 168, 0.8)', 'rgba(239, 164, 107, 0.8)']
+LOAD_LAYOUT = {
+    'barmode': 'stack',
+    'xaxis': {'tickformat': "%b-%d", 'tickangle': 45},
+    'yaxis': {'title': {'text': 'Tasks Due'}, 'rangemode': 'tozero', 'tickformat': 'd'},
+    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1, 'xanchor': 'left', 'x': 0},
+    'margin': {'l': 10, 'r': 10, 't': 10, 'b': 10},
+    'height': 220
+}
+OVERLOAD_SHAPE = {
+    'type': 'rect',
+    'xref': 'x',
+    'yref': 'y domain',
+    'y0': 0,
+    'y1': 1,
+    'fillcolor': 'rgba(194, 27, 24, 0.12)',
+    'line': {'width': 0},
+    'layer': 'below'
+}
+
+TIMESPENT_LAYOUT = {
+    'xaxis': {'title': {'text': 'Subject Worked On'}},
+    'yaxis': {
+        'tickformat': ".0%", 
+        'title': {'text': "Percentage of Time Spent"},
+        'range': [0, 1], 
+        'dtick': 0.25
+    },
+    'margin': {'l': 5, 'r': 5, 't': 10, 'b': 35}, 
+}
+
+@lru_cache(maxsize=None)
+def layout_template(name='plotly_white'):
+    """Expands a named plotly template into a plain dict, once per process.
+    
+    Parameter
+    ---------
+    name : str
+        Name of a registered plotly template.
+    
+    Returns
+    -------
+    dict : The template as plotly would embed it in a figure. Shared between figures, do not modify.
+    """
+    return pio.templates[name].to_plotly_json()
+
+def chart_templates():
+    """Collects the static parts of the student tab charts, so the browser can draw them 
+    from a student bundle without asking the server (assets/charts.js).
+    
+    Returns
+    -------
+    dict : Chart templates, keyed by chart.
+    """
+    return {
+        'template': layout_template(),
+        'attendance': {
+            'status': ATTENDANCE_STATUS, 
+            'colors': ATTENDANCE_COLORS, 
+            'hover': ATTENDANCE_HOVER, 
+            'layout': ATTENDANCE_LAYOUT
+        },
+        'workhabit': {
+            'trace': WORKHABIT_TRACE, 
+            'layout': WORKHABIT_LAYOUT, 
+            'xaxis': WORKHABIT_XAXIS, 
+            'shape': ABSENCE_SHAPE, 
+            'annotation': ABSENCE_ANNOTATION
+        },
+        'timespent': {
+            'subjects': WORK_SUBJECTS, 
+            'trace': TIMESPENT_TRACE, 
+            'layout': TIMESPENT_LAYOUT
+        }
+    }
+
+def student_bundle(student_name):
+    """Collects everything the student tab shows for one student, in a compact form 
+    to keep in a dcc.Store. The charts are drawn from it in the browser.
+    
+    Parameter
+    ---------
+    student_name : str
+        The name of the student. If None, only the data for the empty charts is included.
+    
+    Returns
+    -------
+    bundle : dict
+        The student's schedule, attendance crosstab, habit series, work subject counts,
+        work habit trend, note and attendance patterns. 
+    """
+    # load each table once for the whole bundle
+    attendance = read_csv(ATTEND_DATA)
+    if student_name == None:
+        return {'student': None, 'habits': habit_series(None, attendance), 'work': work_counts(None)}
+
+    students = read_csv(STUDENT_DATA)
+    notes = read_csv(STUDENT_NOTE) if os.path.exists(STUDENT_NOTE) else None
+
+    message, avg, icon = workhabit_trend(student_name, attendance)
+    return {
+        'student': student_name,
+        'schedule': student_schedule(student_name, students), 
+        'attendance': attendance_crosstab(student_name),
+        'habits': habit_series(student_name, attendance),
+        'work': work_counts(student_name),
+        'trend': {'message': message, 'avg': avg, 'icon': icon},
+        'note': get_student_note(student_name, notes),
+        'patterns': student_patterns(student_name)
+    }
 
 def attendance_counts(selected_student=None):
     """Fuction to calculate the number of times a student was present (P), late (L), 
@@ -19,128 +246,143 @@ def attendance_counts(selected_student=None):
     if selected_student == None:
         return {'P': 0, 'L': 0, 'A': 0, 'AE': 0}  
     
-    df = pd.read_csv(ATTEND_DATA)
-    df_student = df[df['Student'] == selected_student]
-    student_attendance = df_student['Attendance']
-    attendance = student_attendance.value_counts().to_dict()
+    counts = cube_attendance(attendance_cube(), [selected_student])
+    attendance = {code: int(count) for code, count in counts.sum().items()}
     required = {'P': 0, 'L': 0, 'A': 0, 'AE': 0}   
     for key, value in required.items():
         attendance.setdefault(key, value)
     return attendance
 
-def attendance_barchart(selected_student=None, overall=True):
-    """Fuction to generate bar charts for the selected student's attendance record, either one
-    single accumulated attendance bar chart or a bar chart for each course..
+def attendance_crosstab(selected_student=None, attendance=None, cube=None):
+    """Fuction to count the selected student's attendance codes in each course.
     
     Parameter
     ---------
     selected_student : str
         User selected student from dropdown, to calculate the attendance count for.
+    attendance : pd.DataFrame, optional
+        Contents of attendance_habits.csv, if already loaded. 
+    cube : dict, optional
+        Output of build_cube(), if already built.
+    
+    Returns
+    -------
+    crosstab : dict 
+        Courses in chart order (reverse alphabetical) and, for each course, the counts of
+        P, L, AE and A. None if no student is selected.  
+    """
+    if selected_student == None: 
+        return None
+    
+    if cube is None:
+        cube = build_cube(attendance) if attendance is not None else attendance_cube()
+    counts = cube_attendance(cube, [selected_student])
+    if counts.empty:
+        return {'courses': [], 'counts': []}
+
+    counts = counts.droplevel('Student').reindex(columns=ATTENDANCE_CODES, fill_value=0).sort_index(ascending=False)
+    return {'courses': counts.index.tolist(), 'counts': counts.values.tolist()}
+
+def attendance_figure(crosstab, overall=True):
+    """Fuction to build the attendance bar chart figure dict from an attendance crosstab. The 
+    student tab draws the same figure in the browser (assets/charts.js).
+    
+    Parameter
+    ---------
+    crosstab : dict
+        Output of attendance_crosstab(). If None, the empty initial chart is returned. 
     overall: bool
         If true, generates a single bar chart for the accumulated attendance. If False, a bar chart
         for each course is returned. 
     
     Returns
     -------
-    fig : plotly obj 
-        Plotly figure of the attendance barchart.
+    fig : dict 
+        Figure dict of the attendance barchart.
     """
-
     # Initial Chart 
-    if selected_student == None: 
+    if crosstab is None: 
         attend_percent_t = [[0], [0], [0], [0]]
         ordered_subjects=['']
         attend_counts_t  = [[0], [0], [0], [0]]   
         gap = 0    
-    else:    
-        # Import and set up data to plot 
-        attendance = pd.read_csv(ATTEND_DATA)
-        attendance_student = attendance[attendance['Student'] == selected_student]
-            
-        student_attendance_dict = {}
-        totals = {'P': 0, 'L': 0, 'AE': 0, 'A': 0}   
-
-        # get attendance for each course
-        for course in attendance_student['Course'].unique():
-                
-            attendance_course = attendance_student[attendance_student['Course'] == course]
-            attendance_col = attendance_course['Attendance']
-            attendance_counts = attendance_col.value_counts().to_dict()
-
-            for key, value in totals.items():
-                attendance_counts.setdefault(key, value)
-                student_attendance_dict[course] = attendance_counts
-
-        ordered_subjects = sorted(student_attendance_dict.keys(), reverse=True)
-        ordered_status = ['P', 'L', 'AE', 'A']    
-
-        # SET UP FOR OVERALL CHART   
-        if overall:
-            # Totals across courses 
-            for key, value in student_attendance_dict.items():
-                for key in totals:
-                    totals[key] += value.get(key, 0) 
-                
-            attend_counts=[totals[status] for status in ordered_status]
-            attend_counts_t=[[x] for x in attend_counts]
-            attend_percent_t=[[x/sum(attend_counts)*100 if sum(attend_counts) != 0 else 0] for x in attend_counts]
-            ordered_subjects=['']
-
-            # bar gap
-            gap = 0.7
-        else:
-        # SET UP FOR COURSE SPECIFIC CHARTS
-            attend_counts = [[student_attendance_dict[subject][status] for status in ordered_status] for subject in ordered_subjects]
-            attend_counts_t = [list(row) for row in zip(*attend_counts)]
-            attend_percent = [[round(x/sum(lst)*100, 2) if sum(lst) != 0 else 0 for x in lst] for lst in attend_counts]
-            attend_percent_t = [list(row) for row in zip(*attend_percent)]
-
-            # bar gap
-            gap = 0.2 
-        
-    # Plot 
-    status = ['Present', 'Late', 'Excused', 'Absent']
-    colors =['rgba(41, 118, 74, 0.8)', 'rgba(33, 42, 168, 0.8)', 
-                'rgba(239, 164, 107, 0.8)', 'rgba(194, 27, 24, 0.8)']
+
+    # SET UP FOR OVERALL CHART   
+    elif overall:
+        # Totals across courses 
+        attend_counts = [sum(course[n] for course in crosstab['counts']) for n in range(len(ATTENDANCE_CODES))]
+        attend_counts_t=[[x] for x in attend_counts]
+        attend_percent_t=[[x/sum(attend_counts)*100 if sum(attend_counts) != 0 else 0] for x in attend_counts]
+        ordered_subjects=['']
+
+        # bar gap
+        gap = 0.7
+
+    # SET UP FOR COURSE SPECIFIC CHARTS
+    else:
+        attend_counts = crosstab['counts']
+        attend_counts_t = [list(row) for row in zip(*attend_counts)]
+        attend_percent = [[round(x/sum(lst)*100, 2) if sum(lst) != 0 else 0 for x in lst] for lst in attend_counts]
+        attend_percent_t = [list(row) for row in zip(*attend_percent)]
+        ordered_subjects = crosstab['courses']
+
+        # bar gap
+        gap = 0.2 
         
     # plot barcharts 
-    fig = go.Figure()
-
+    traces = []
     for n, xd in enumerate(attend_percent_t):
-        fig.add_trace(go.Bar(
-            y=ordered_subjects, 
-            x=xd, 
-            name=status[n],
-            orientation='h',
-            marker=dict(
-                color=colors[n],
-                line=dict( width=1)
-            ), 
-            customdata=attend_counts_t[n], 
-            hovertemplate=f'{status[n]}: %{{x:.0f}}% - %{{customdata}} time(s)<extra></extra>' 
-        )) 
+        traces.append({
+            'type': 'bar',
+            'y': ordered_subjects, 
+            'x': xd, 
+            'name': ATTENDANCE_STATUS[n],
+            'orientation': 'h',
+            'marker': {'color': ATTENDANCE_COLORS[n], 'line': {'width': 1}}, 
+            'customdata': attend_counts_t[n], 
+            'hovertemplate': ATTENDANCE_HOVER[n] 
+        }) 
 
-    fig.update_layout(
-        barmode='stack', 
-        template="plotly_white", 
-        margin=dict(l=20, r=20, t=20, b=20), 
-        xaxis=dict(
-            tickvals=[0, 20, 40, 60, 80, 100], 
-            ticktext=['0%', '20%', '40%', '60%', '80%', '100%'], 
-        ),
-        bargap=gap, 
-        autosize=True,
-        legend=dict(
-            orientation='h', 
-            yanchor='top', 
-            y=-0.2, 
-            xanchor='left',
-            x=0,
-            itemwidth=30, 
-            traceorder='normal'
-        ),
-    )
-    return fig 
+    layout = dict(ATTENDANCE_LAYOUT, bargap=gap, template=layout_template())
+    return {'data': traces, 'layout': layout}
+
+def attendance_barchart_dict(selected_student=None, overall=True):
+    """Fuction to generate the attendance bar chart as a plain figure dict, either one
+    single accumulated attendance bar chart or a bar chart for each course.
+    
+    Parameter
+    ---------
+    selected_student : str
+        User selected student from dropdown, to calculate the attendance count for.
+    overall: bool
+        If true, generates a single bar chart for the accumulated attendance. If False, a bar chart
+        for each course is returned. 
+    
+    Returns
+    -------
+    fig : dict 
+        Figure dict of the attendance barchart, ready to return from a callback.
+    """
+    return attendance_figure(attendance_crosstab(selected_student), overall)
+
+def attendance_barchart(selected_student=None, overall=True):
+    """Fuction to generate bar charts for the selected student's attendance record, either one
+    single accumulated attendance bar chart or a bar chart for each course..
+    
+    Parameter
+    ---------
+    selected_student : str
+        User selected student from dropdown, to calculate the attendance count for.
+    overall: bool
+        If true, generates a single bar chart for the accumulated attendance. If False, a bar chart
+        for each course is returned. 
+    
+    Returns
+    -------
+    fig : plotly obj 
+        Plotly figure of the attendance barchart.
+    """
+    return go.Figure(attendance_barchart_dict(selected_student, overall))
 
 def attendance_barchart_none(selected_student=None):
     """Fuction to generate a barchart for the selected student's attendance record.
@@ -203,21 +445,25 @@ def attendance_barchart_none(selected_student=None):
         )
     return fig 
 
-def workhabit_timeline(selected_student=None):
-    """Fuction to generate a line chart for the selected student's work habits.
+def habit_series(selected_student=None, attendance=None):
+    """Fuction to get the selected student's work habit scores in support class, in date order. 
     
     Parameter
     ---------
     selected_student : str
-        User selected student from dropdown to generate the graph for.
+        User selected student from dropdown to get the scores for.
+    attendance : pd.DataFrame, optional
+        Contents of attendance_habits.csv, if already loaded. 
     
     Returns
     -------
-    fig : plotly obj 
-        Plotly figure of the student's work habits.
+    series : dict 
+        Dates ('YYYY-MM-DD') and habit codes (0 = Off-task to 4 = On-task) of the scored classes, 
+        and the dates of unscored classes (absences). If no student is selected, every date 
+        in the data with no scores, to draw an empty timeline.  
     """
-    attendance_data = pd.read_csv(ATTEND_DATA)
-    attendance_data = attendance_data[attendance_data['Course'].str.contains('Support')]
+    attendance_data = attendance if attendance is not None else read_csv(ATTEND_DATA)
+    attendance_data = attendance_data[attendance_data['Course'].str.contains('Support')].copy()
     attendance_data['Date'] = pd.to_datetime(attendance_data['Date'])
     attendance_data = attendance_data.sort_values(by='Date')
 
@@ -226,6 +472,7 @@ def workhabit_timeline(selected_student=None):
         date_range_end = attendance_data['Date'].max() 
         placeholder_dates = pd.date_range(start=date_range_start, end=date_range_end, freq='D')
         attendance_filter = pd.DataFrame({'Date': placeholder_dates, 'Habit': [None] * len(placeholder_dates)})
+        nan_dates = pd.Series([], dtype='datetime64[ns]')
     
     else:
         attendance_filter = attendance_data[attendance_data['Student'] == selected_student]
@@ -233,21 +480,37 @@ def workhabit_timeline(selected_student=None):
         nan_dates = attendance_filter.loc[attendance_data['Habit'].isna(), 'Date']
         attendance_filter = attendance_filter.dropna(subset=['Habit'])
     
-    attendance_filter = attendance_filter[['Date', 'Habit']]
-
     # Ordinal Categories 
-    habit_categories = ['Off-task', 'Mostly Off-task', 'Equally On/Off-task',  'Mostly On-task', 'On-task']
-    attendance_filter['Habit'] = pd.Categorical(attendance_filter['Habit'], categories=habit_categories, ordered=True)
+    habit_codes = pd.Categorical(attendance_filter['Habit'], categories=HABIT_CATEGORIES, ordered=True).codes
 
-    # Calculate the date range
-    date_range_start = attendance_filter['Date'].min()
-    date_range_end = attendance_filter['Date'].max()
+    return {
+        'dates': attendance_filter['Date'].dt.strftime('%Y-%m-%d').tolist(),
+        'codes': habit_codes.tolist(),
+        'absences': nan_dates.dt.strftime('%Y-%m-%d').tolist()
+    }
 
+def workhabit_figure(series):
+    """Fuction to build the work habit line chart figure dict from a habit series. The 
+    student tab draws the same figure in the browser (assets/charts.js).
+    
+    Parameter
+    ---------
+    series : dict
+        Output of habit_series().
+    
+    Returns
+    -------
+    fig : dict 
+        Figure dict of the student's work habits.
+    """
     # Compute the number of days in the selected range
-    total_days = (date_range_end - date_range_start).days
+    dates = series['dates']
+    total_days = (pd.Timestamp(dates[-1]) - pd.Timestamp(dates[0])).days if dates else None
 
     # Set dynamic dtick based on the range
-    if total_days <= 7: 
+    if total_days is None:
+        dticks = "Y1"
+    elif total_days <= 7: 
         dticks = "D1"  
     elif total_days <= 30:  
         dticks = "W1"  
@@ -256,58 +519,172 @@ def workhabit_timeline(selected_student=None):
     else:  
         dticks = "Y1"  
 
-
     # plot
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=attendance_filter['Date'], 
-        y=attendance_filter['Habit'].cat.codes, 
-        mode='lines+markers',
-        line=dict(dash='dot', color='rgba(41, 118, 74, 0.8)'),
-        hovertemplate="<b>Date:</b> %{x|%b-%d}<br><b>Habit:</b> %{y}<br><extra></extra>" 
-    )), 
+    trace = dict(WORKHABIT_TRACE, x=dates, y=series['codes'])
+    layout = dict(WORKHABIT_LAYOUT, 
+                  xaxis=dict(WORKHABIT_XAXIS, dtick=dticks),
+                  template=layout_template())
 
-    fig.update_layout(
-        yaxis=dict(
-            tickmode='array',
-            tickvals=list(range(len(habit_categories))), 
-            ticktext=habit_categories, 
-            range=[-0.5, len(habit_categories)-0.5]  
-        ),
-        title=None,
-        xaxis_title=None,
-        yaxis_title=None,
-        showlegend=False, 
-        xaxis=dict(
-            dtick=dticks, 
-            tickformat="%b-%d",  
-            ticks="inside",  
-            showgrid=True, 
-            tickangle=45,
-        ),
-        margin=dict(l=10, r=10, t=20, b=10), 
-        template="plotly_white",
-        dragmode='zoom'
-    )
+    if series['absences']:
+        # red line and annotation for each NaN value
+        layout['shapes'] = [dict(ABSENCE_SHAPE, x0=date, x1=date) for date in series['absences']]
+        layout['annotations'] = [dict(ABSENCE_ANNOTATION, x=date) for date in series['absences']]
+    return {'data': [trace], 'layout': layout}
+
+def workhabit_timeline_dict(selected_student=None):
+    """Fuction to generate the work habit line chart as a plain figure dict.
+    
+    Parameter
+    ---------
+    selected_student : str
+        User selected student from dropdown to generate the graph for.
+    
+    Returns
+    -------
+    fig : dict 
+        Figure dict of the student's work habits, ready to return from a callback.
+    """
+    return workhabit_figure(habit_series(selected_student))
+
+def workhabit_timeline(selected_student=None):
+    """Fuction to generate a line chart for the selected student's work habits.
+    
+    Parameter
+    ---------
+    selected_student : str
+        User selected student from dropdown to generate the graph for.
+    
+    Returns
+    -------
+    fig : plotly obj 
+        Plotly figure of the student's work habits.
+    """
+    return go.Figure(workhabit_timeline_dict(selected_student))
+
+def work_counts(selected_student=None, attendance=None, cube=None):
+    """Fuction to count the subjects the selected student worked on.
+    
+    Parameter
+    ---------
+    selected_student : str
+        User selected student from dropdown to count the subjects for.
+    attendance : pd.DataFrame, optional
+        Contents of attendance_habits.csv, if already loaded. 
+    cube : dict, optional
+        Output of build_cube(), if already built.
+    
+    Returns
+    -------
+    work : dict 
+        Counts for each subject in WORK_SUBJECTS order, and the total number of recorded subjects,
+        from support classes only. 
+    """
+    if cube is None:
+        cube = build_cube(attendance) if attendance is not None else attendance_cube()
+    counts = cube_work(cube, [selected_student])
+    counts = counts.iloc[0] if not counts.empty else pd.Series(dtype=int)
+    all_counts = counts.reindex(WORK_SUBJECTS, fill_value=0)
+    return {'counts': all_counts.astype(int).tolist(), 'total': int(counts.sum())}
+
+def timespent_figure(work):
+    """Fuction to build the time spent bar chart figure dict from work subject counts. The 
+    student tab draws the same figure in the browser (assets/charts.js).
+    
+    Parameter
+    ---------
+    work : dict
+        Output of work_counts().
+    
+    Returns
+    -------
+    fig : dict 
+        Figure dict of the student's time spent.
+    """
+    total = work['total']
+    subject_proportion = [count/total if total else None for count in work['counts']]
+
+    trace = dict(TIMESPENT_TRACE, x=WORK_SUBJECTS, y=subject_proportion, customdata=work['counts'])
+    layout = dict(TIMESPENT_LAYOUT, template=layout_template())
+    return {'data': [trace], 'layout': layout}
 
-    if selected_student != None:
-        # red line for each NaN value
-        for nan_date in nan_dates:
-            fig.add_vline(x=nan_date, line=dict(color='rgba(194, 27, 24, 0.8)', width=1 ))
-                # Add an annotation with hover text
-            fig.add_annotation(
-                x=nan_date,
-                y=len(habit_categories) - 0.5,  
-                text="A",
-                showarrow=True,
-                ax=0,  
-                ay=-10,  
-                font=dict(size=12, color="red"),
-                align="center",
-                arrowcolor="red",
-                opacity=0.7
-            )
-    return fig
+def timespent_barchart_dict(selected_student=None):
+    """Fuction to generate the time spent bar chart as a plain figure dict.
+    
+    Parameter
+    ---------
+    selected_student : str
+        User selected student from dropdown to generate the graph for.
+    
+    Returns
+    -------
+    fig : dict 
+        Figure dict of the student's time spent, ready to return from a callback.
+    """
+    return timespent_figure(work_counts(selected_student))
+
+def cohort_heatmap_dict(teacher, attendance=None):
+    """Fuction to generate a Students x Dates heatmap of attendance and work habits for the
+    given teacher's classes, as a plain figure dict. Cells are coloured by attendance code in the 
+    teacher's classes and labelled with the work habit score (0-4) from support class.
+    
+    Parameter
+    ---------
+    teacher : str
+        User selected teacher from dropdown to generate the graph for.
+    attendance : pd.DataFrame, optional
+        Contents of attendance_habits.csv, if already loaded. 
+    
+    Returns
+    -------
+    fig : dict 
+        Figure dict of the class heatmap, ready to return from a callback.
+    """
+    cohort = cohort_attendance(teacher, attendance)
+
+    # hover labels and cell text, missing values left blank
+    codes = np.array(cohort['codes'], dtype=float).reshape(len(cohort['students']), len(cohort['dates']))
+    labels = np.array([''] + ATTENDANCE_STATUS, dtype=object)[np.nan_to_num(codes, nan=-1).astype(int) + 1]
+    scores = np.array(cohort['scores'], dtype=object).reshape(codes.shape)
+    scores = np.where(scores == None, '', scores)
+
+    trace = dict(COHORT_TRACE, 
+                 x=cohort['dates'], 
+                 y=cohort['students'], 
+                 z=cohort['codes'], 
+                 text=scores.tolist(), 
+                 customdata=labels.tolist())
+    layout = dict(COHORT_LAYOUT, 
+                  height=max(250, 22 * len(cohort['students']) + 80), 
+                  template=layout_template())
+    return {'data': [trace], 'layout': layout}
+
+def deadline_load_dict(student_name):
+    """Fuction to generate a bar chart of the tests and other tasks the student has due each
+    week, with the weeks in an overloaded stretch shaded, as a plain figure dict.
+    
+    Parameter
+    ---------
+    student_name : str
+        User selected student from dropdown to generate the graph for.
+    
+    Returns
+    -------
+    fig : dict 
+        Figure dict of the student's deadline load, ready to return from a callback.
+    """
+    load = student_load(student_name)
+    others = [tasks - tests for tasks, tests in zip(load['tasks'], load['tests'])]
+    traces = [dict(LOAD_TRACE, x=load['weeks'], y=counts, name=name, marker={'color': color})
+              for counts, name, color in zip([load['tests'], others], LOAD_NAMES, LOAD_COLORS)]
+
+    # bars are centred on the Monday, shade the whole week
+    shapes = []
+    for week, overloaded in zip(load['weeks'], load['overloaded']):
+        if overloaded:
+            monday = pd.Timestamp(week)
+            shapes.append(dict(OVERLOAD_SHAPE, x0=str(monday - pd.Timedelta(hours=84)), x1=str(monday + pd.Timedelta(hours=84))))
+    layout = dict(LOAD_LAYOUT, shapes=shapes, template=layout_template())
+    return {'data': traces, 'layout': layout}
 
 def timespent_barchart(selected_student=None):
     """Fuction to generate a bar chart for the selected student's time spent.
@@ -322,37 +699,10 @@ def timespent_barchart(selected_student=None):
     fig : plotly obj 
         Plotly figure of the student's time spent.
     """
-    df = pd.read_csv(ATTEND_DATA)
-    df[df['Course'].str.contains('Support')]
-    df_student = df[df['Student'] == selected_student]
-    subjects = df_student['Work']
-    all_subjects = ["Art", "English", "French", "Math", "Science", "Socials", "Other"]
-    counts = subjects.value_counts()    
-    all_counts = pd.Series(subjects).value_counts().reindex(all_subjects, fill_value=0)
-    subject_proportion = (all_counts/counts.sum())
+    return go.Figure(timespent_barchart_dict(selected_student))
 
-    fig = go.Figure()
-
-    fig.add_trace(go.Bar(
-        x=all_subjects, 
-        y=subject_proportion, 
-        marker_color='rgba(33, 42, 168, 0.8)', 
-        hovertemplate=(
-        "<b>%{x}</b><br>"                 
-        "Count: %{customdata}<br>"     
-        "Percentage: %{y:.0%}<br>"       
-        "<extra></extra>"                
-    ),
-    customdata=all_counts.values
-    ))
-    fig.update_layout(
-        title=None, 
-        xaxis_title='Subject Worked On',
-        template='plotly_white', 
-        margin=dict(l=5, r=5, t=10, b=35), 
-    )
-    fig.update_yaxes(tickformat=".0%", 
-                     title="Percentage of Time Spent",
-                     range=[0,1], 
-                     dtick=0.25) 
-    return fig 
\ No newline at end of file
+# latency metrics, when enabled
+instrument_module(globals(), [
+    'chart_templates', 'student_bundle', 'attendance_barchart', 'workhabit_timeline',
+    'timespent_barchart', 'cohort_heatmap_dict', 'deadline_load_dict'
+])
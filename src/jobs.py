@@ -0,0 +1,77 @@
+import os
+import diskcache
+import psutil
+import multiprocess
+from dash import DiskcacheManager
+from .config import JOBS_CACHE
+
+# BACKGROUND JOBS
+# Background callbacks (e.g. deadline submission) run in processes forked from the web worker,
+# their progress and results kept in a diskcache (SQLite) job store on local disk that every
+# worker polls. Under gunicorn the store is used by the master (preload_app), every worker forked
+# from it and every job a worker forks, so:
+#   - each process opens the store itself, no SQLite connection is used across a fork
+#   - a finished job is killed without holding the store's lock. Dash's manager waits up to a
+#     second for the job to exit inside a transaction, but only the worker that forked a job can
+#     reap it, so polls reaching another worker held the lock for the whole second, and the
+#     polls of every other session queued behind it (for up to SQLite's 60 second timeout).
+
+class ProcessCache:
+    """A diskcache.Cache opened again in each process that uses it.
+
+    Parameters
+    ----------
+    directory: str
+        The directory of the cache, shared by the processes.
+    **settings
+        Settings of the diskcache.Cache.
+    """
+    def __init__(self, directory, **settings):
+        self.directory = directory
+        self.settings = settings
+        self._pid = None
+        self._cache = None
+
+    def cache(self):
+        """The diskcache.Cache of the current process, opened on first use."""
+        # no lock, which a job forked meanwhile could find held: threads opening it at the
+        # same time each get a working cache, and the pid is only set once the cache is
+        if self._pid != os.getpid():
+            self._cache = diskcache.Cache(self.directory, **self.settings)
+            self._pid = os.getpid()
+        return self._cache
+
+    def __getattr__(self, name):
+        return getattr(self.cache(), name)
+
+class JobManager(DiskcacheManager):
+    """Dash background callback manager with a job store on local disk, safe to share between
+    gunicorn workers (see above).
+
+    Parameters
+    ----------
+    directory: str
+        The directory of the job store.
+    **kwargs
+        Settings of the DiskcacheManager (cache_by, expire).
+    """
+    def __init__(self, directory=JOBS_CACHE, **kwargs):
+        super().__init__(diskcache.Cache(directory), **kwargs)
+        self.handle.close()
+        self.handle = ProcessCache(directory)
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        try:
+            process = psutil.Process(int(job))
+            for child in process.children(recursive=True):
+                try:
+                    child.kill()
+                except psutil.NoSuchProcess:
+                    pass
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+        # reap the jobs this process forked that have exited
+        multiprocess.active_children()
@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+import psutil
+import pandas as pd
+from flask import Response
+from .cache import cache_stats, locked_file
+from .config import METRICS_ENABLED, METRICS_DIR
+
+# METRICS
+# Latency histograms for callbacks and the entry points of the data modules, CSV rows and bytes read, and
+# memoization hits, exposed as Prometheus text on /metrics. Each worker process keeps its
+# own counts and saves them to METRICS_DIR/<pid>.json at most once a second. /metrics adds up
+# the files of all workers. The counts of exited workers (gunicorn recycles them every
+# max_requests) are added to one file, exited.json, and their own files deleted, so the
+# directory holds one file per live process. When disabled (the default) nothing is wrapped.
+EXITED = 'exited.json'
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_state = {'pid': None, 'histograms': {}, 'counters': {}, 'flushed': 0.0}
+_state_lock = threading.Lock()
+
+def _process_state():
+    # start from zero in a forked worker, the master's counts are in the master's file
+    if _state['pid'] != os.getpid():
+        _state.update(pid=os.getpid(), histograms={}, counters={}, flushed=0.0)
+    return _state
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+def observe(name, seconds, **labels):
+    """Records a duration in a latency histogram.
+
+    Parameters
+    ----------
+    name: str
+        The metric name.
+    seconds: float
+        The duration.
+    **labels: str
+        The metric labels.
+    """
+    with _state_lock:
+        histograms = _process_state()['histograms']
+        values = histograms.setdefault(_key(name, labels), [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+        values[-2] += seconds
+        values[-1] += 1
+    _maybe_flush()
+
+def increment(name, amount=1, **labels):
+    """Adds to a counter.
+
+    Parameters
+    ----------
+    name: str
+        The metric name.
+    amount: float
+        The amount to add.
+    **labels: str
+        The metric labels.
+    """
+    with _state_lock:
+        counters = _process_state()['counters']
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + amount
+    _maybe_flush()
+
+# INSTRUMENTATION
+def timed(func, metric, **labels):
+    """Wraps a function to record its latency, and errors, under the given metric and labels."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            increment(metric.replace('_seconds', '_errors_total'), **labels)
+            raise
+        finally:
+            observe(metric, time.perf_counter() - start, **labels)
+    return wrapper
+
+def instrument_module(namespace, names):
+    """Wraps the given functions of a module to record their latency. Called at the end of a
+    module with globals() and its entry points (the functions the app, callbacks and other modules
+    call), so calls from other modules and within the module are both recorded. Helpers called
+    many times per request (e.g. data.frame_page, streaks.run_lengths) are left out, the wrapper
+    would cost more than they do. Does nothing when metrics are disabled.
+
+    Parameters
+    ----------
+    namespace: dict
+        The module's globals().
+    names: list
+        The names of the functions to wrap.
+    """
+    if not METRICS_ENABLED:
+        return
+    module = namespace['__name__']
+    for name in names:
+        namespace[name] = timed(namespace[name], 'synced_support_function_seconds', module=module.split('.')[-1], function=name)
+
+def instrument_callbacks(app):
+    """Wraps every registered callback of the app to record its latency. Does nothing when
+    metrics are disabled.
+
+    Parameters
+    ----------
+    app: dash.Dash
+        The app, after its callbacks are registered.
+    """
+    if not METRICS_ENABLED:
+        return
+    for callback in app.callback_map.values():
+        # clientside callbacks have no server function
+        func = callback.get('callback')
+        if func is None:
+            continue
+        callback['callback'] = timed(func, 'synced_support_callback_seconds', callback=func.__name__)
+
+def counted_read_csv(path, *args, **kwargs):
+    """pd.read_csv that records the rows and bytes read from each file."""
+    df = pd.read_csv(path, *args, **kwargs)
+    table = os.path.basename(str(path))
+    increment('synced_support_csv_reads_total', file=table)
+    increment('synced_support_csv_rows_read_total', len(df), file=table)
+    try:
+        increment('synced_support_csv_bytes_read_total', os.path.getsize(path), file=table)
+    except (OSError, TypeError):
+        pass
+    return df
+
+# used by data.py, graphs.py and cube.py for every CSV read
+read_csv = counted_read_csv if METRICS_ENABLED else pd.read_csv
+
+# EXPOSITION
+def _snapshot():
+    state = _process_state()
+    cache = {name: {'hits': counts['hits'], 'misses': counts['misses']} for name, counts in cache_stats().items()}
+    return {'histograms': state['histograms'], 'counters': state['counters'], 'cache': cache}
+
+def _flush(force=False):
+    with _state_lock:
+        state = _process_state()
+        if not force and time.monotonic() - state['flushed'] < 1.0:
+            return
+        state['flushed'] = time.monotonic()
+        snapshot = json.dumps(_snapshot())
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as f:
+        f.write(snapshot)
+    os.replace(path + '.tmp', path)
+
+def _maybe_flush():
+    if time.monotonic() - _state['flushed'] >= 1.0:
+        _flush()
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _add(merged, snapshot):
+    # adds one process's counts to merged
+    for key, values in snapshot['histograms'].items():
+        total = merged['histograms'].setdefault(key, [0] * len(values))
+        merged['histograms'][key] = [a + b for a, b in zip(total, values)]
+    for key, value in snapshot['counters'].items():
+        merged['counters'][key] = merged['counters'].get(key, 0) + value
+    for name, counts in snapshot['cache'].items():
+        total = merged['cache'].setdefault(name, {'hits': 0, 'misses': 0})
+        total['hits'] += counts['hits']
+        total['misses'] += counts['misses']
+    return merged
+
+def retire_workers(pids=None):
+    """Adds the saved counts of exited processes to METRICS_DIR/exited.json and deletes their
+    files. Called by gunicorn when a worker exits, and on every /metrics scrape for processes
+    that exited otherwise.
+
+    Parameters
+    ----------
+    pids: list, optional
+        The processes that exited. Every process with a file that is no longer running if None.
+    """
+    if not os.path.isdir(METRICS_DIR):
+        return
+    with locked_file(os.path.join(METRICS_DIR, 'exited.lock'), 'a'):
+        if pids is None:
+            pids = [int(entry.name[:-5]) for entry in os.scandir(METRICS_DIR)
+                    if entry.name.endswith('.json') and entry.name[:-5].isdigit()]
+            pids = [pid for pid in pids if pid != os.getpid() and not psutil.pid_exists(pid)]
+        paths = [path for path in (os.path.join(METRICS_DIR, f'{pid}.json') for pid in pids) if os.path.exists(path)]
+        if not paths:
+            return
+
+        exited = _read(os.path.join(METRICS_DIR, EXITED)) or {'histograms': {}, 'counters': {}, 'cache': {}}
+        for path in paths:
+            snapshot = _read(path)
+            if snapshot is not None:
+                _add(exited, snapshot)
+        path = os.path.join(METRICS_DIR, EXITED)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(exited, f)
+        os.replace(path + '.tmp', path)
+        for path in paths:
+            os.remove(path)
+
+def _merged():
+    # counts of every worker, those of exited ones from exited.json, so counters never go down
+    retire_workers()
+    merged = {'histograms': {}, 'counters': {}, 'cache': {}}
+    with locked_file(os.path.join(METRICS_DIR, 'exited.lock'), 'a', exclusive=False):
+        for entry in os.scandir(METRICS_DIR):
+            if entry.name.endswith('.json'):
+                snapshot = _read(entry.path)
+                if snapshot is not None:
+                    _add(merged, snapshot)
+    return merged
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in items]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+def prometheus_text():
+    """Formats the metrics of all workers in the Prometheus text exposition format.
+
+    Returns
+    -------
+    str: The metrics.
+    """
+    _flush(force=True)
+    merged = _merged()
+    lines = []
+    typed = set()
+
+    def header(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} {kind}')
+
+    for key in sorted(merged['histograms']):
+        name, labels = json.loads(key)
+        values = merged['histograms'][key]
+        header(name, 'histogram')
+        for bound, count in zip(BUCKETS, values):
+            lines.append(f'{name}_bucket{_labels(labels, le=bound)} {count}')
+        lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {values[-1]}')
+        lines.append(f'{name}_sum{_labels(labels)} {values[-2]}')
+        lines.append(f'{name}_count{_labels(labels)} {values[-1]}')
+
+    for key in sorted(merged['counters']):
+        name, labels = json.loads(key)
+        header(name, 'counter')
+        lines.append(f'{name}{_labels(labels)} {merged["counters"][key]}')
+
+    for name in sorted(merged['cache']):
+        counts = merged['cache'][name]
+        for outcome in ('hits', 'misses'):
+            metric = f'synced_support_cache_{outcome}_total'
+            header(metric, 'counter')
+            lines.append(f'{metric}{_labels([("function", name)])} {counts[outcome]}')
+    return '\n'.join(lines) + '\n'
+
+def register_metrics(server):
+    """Adds the /metrics endpoint to the Flask server, when metrics are enabled.
+
+    Parameters
+    ----------
+    server: flask.Flask
+        The app's server.
+    """
+    if not METRICS_ENABLED:
+        return
+    atexit.register(_flush, force=True)
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(prometheus_text(), mimetype='text/plain; version=0.0.4')
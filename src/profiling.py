@@ -0,0 +1,131 @@
+import io
+import os
+import re
+import html
+import time
+import pstats
+import cProfile
+import functools
+import threading
+from flask import request, abort, Response
+from .config import PROFILE_CALLBACKS, PROFILE_DIR
+
+# PROFILING
+# Runs chosen callbacks under cProfile and saves each profile, with the full call stacks
+# through callbacks.py, data.py and pandas, to PROFILE_DIR. Off unless SYNCED_SUPPORT_PROFILE
+# is set, to a comma separated list of callback names, '*' for every callback, or 'header' to
+# profile only requests sent with an 'X-Profile: <callback name or *>' header.
+PROFILE_HEADER = 'X-Profile'
+SORT_KEYS = ['cumulative', 'tottime', 'ncalls', 'filename']
+
+# one profile at a time per process, other calls run normally
+_profile_lock = threading.Lock()
+
+def _requested(name):
+    if name in PROFILE_CALLBACKS or '*' in PROFILE_CALLBACKS:
+        return True
+    if 'header' in PROFILE_CALLBACKS:
+        wanted = request.headers.get(PROFILE_HEADER, '')
+        return wanted == '*' or name in [item.strip() for item in wanted.split(',')]
+    return False
+
+def profiled(func, name):
+    """Wraps a callback to run it under cProfile when profiling of it is requested, and save the
+    profile to PROFILE_DIR as <time>-<name>.prof."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _requested(name) or not _profile_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            _profile_lock.release()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{os.getpid()}-{name}.prof"
+            profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+    return wrapper
+
+def profile_callbacks(app):
+    """Wraps the registered callbacks of the app that may be profiled. Does nothing unless
+    profiling is enabled.
+
+    Parameters
+    ----------
+    app: dash.Dash
+        The app, after its callbacks are registered.
+    """
+    if not PROFILE_CALLBACKS:
+        return
+    for callback in app.callback_map.values():
+        # clientside callbacks have no server function
+        func = callback.get('callback')
+        if func is None:
+            continue
+        callback['callback'] = profiled(func, func.__name__)
+
+def profile_report(filename, sort='cumulative', limit=60):
+    """Formats a saved profile as text: the slowest functions, and who called them.
+
+    Parameters
+    ----------
+    filename: str
+        The name of a profile in PROFILE_DIR.
+    sort: str
+        The pstats sort key, one of SORT_KEYS.
+    limit: int
+        The number of functions to list.
+
+    Returns
+    -------
+    str: The report.
+    """
+    out = io.StringIO()
+    stats = pstats.Stats(os.path.join(PROFILE_DIR, filename), stream=out)
+    stats.sort_stats(sort).print_stats(limit)
+    stats.print_callers(limit)
+    return out.getvalue()
+
+def _profiles():
+    try:
+        names = [name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof')]
+    except FileNotFoundError:
+        return []
+    return sorted(names, reverse=True)
+
+def register_profiling(server):
+    """Adds the profile viewer to the Flask server, when profiling is enabled:
+    /profiles lists the saved profiles, /profiles/<name> shows one and /profiles/<name>.prof
+    downloads it (for snakeviz and similar tools).
+
+    Parameters
+    ----------
+    server: flask.Flask
+        The app's server.
+    """
+    if not PROFILE_CALLBACKS:
+        return
+
+    @server.route('/profiles')
+    def profiles():
+        rows = ''.join(f'<li><a href="/profiles/{html.escape(name[:-5])}">{html.escape(name)}</a></li>'
+                       for name in _profiles())
+        return f'<h3>Profiles</h3><ul>{rows or "<li>None yet</li>"}</ul>'
+
+    @server.route('/profiles/<name>')
+    def profile(name):
+        # only names listed in the profile directory
+        download = name.endswith('.prof')
+        filename = name if download else f'{name}.prof'
+        if filename not in _profiles() or not re.fullmatch(r'[\w.-]+', filename):
+            abort(404)
+        if download:
+            with open(os.path.join(PROFILE_DIR, filename), 'rb') as f:
+                return Response(f.read(), mimetype='application/octet-stream')
+
+        sort = request.args.get('sort', 'cumulative')
+        sort = sort if sort in SORT_KEYS else 'cumulative'
+        links = ' | '.join(f'<a href="?sort={key}">{key}</a>' for key in SORT_KEYS)
+        report = html.escape(profile_report(filename, sort))
+        return (f'<h3>{html.escape(filename)}</h3><p>Sort by: {links} | <a href="/profiles/{filename}">download</a></p>'
+                f'<pre style="font-size: 0.75rem">{report}</pre>')
@@ -0,0 +1,425 @@
+import os
+import re
+import sys
+import html
+import time
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .config import STUDENT_DATA, ATTEND_DATA, STUDENT_NOTE, REPORTS_DIR
+from .metrics import read_csv, instrument_module
+from .data import student_schedule, workhabit_trend, get_student_note
+from .cube import build_cube
+from .graphs import (attendance_crosstab, attendance_figure, habit_series, workhabit_figure, work_counts,
+                     timespent_figure, ATTENDANCE_STATUS)
+from .streaks import attendance_patterns, student_patterns
+
+# PROGRESS REPORTS
+# Printable report cards, one static HTML file per student with the charts drawn as inline SVG:
+#   python -m src.reports                              (every student, one process per CPU)
+#   python -m src.reports --teacher "Ms. Davis" --workers 4 --output /path/to/reports
+# The data files are read once into a snapshot before the pool starts; forked workers share it,
+# and each report only slices its student's rows. The charts are the figure dicts of graphs.py,
+# drawn by the small SVG writer below (no image export dependency). Each report is timed, the
+# times are written to timings.csv next to the reports.
+
+CHART_WIDTH = 680
+CHART_MARGIN = {'l': 130, 'r': 15, 't': 10, 'b': 45}
+REPORT_STYLE = """
+body { font-family: sans-serif; font-size: 12px; color: #222; margin: 2em auto; max-width: 720px; }
+h1 { font-size: 20px; color: #387c9f; margin-bottom: 0; }
+h2 { font-size: 14px; color: #387c9f; border-bottom: 1px solid #ccc; margin-top: 1.5em; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #ddd; padding: 3px 6px; text-align: left; }
+th { background: #f0f4f7; }
+.muted { color: #777; }
+.note { white-space: pre-line; }
+@page { margin: 1.5cm; }
+@media print { body { margin: 0; } h2 { break-after: avoid; } svg { break-inside: avoid; } }
+"""
+
+# DATA SNAPSHOT
+
+def _by_student(df):
+    # the rows sorted by student, otherwise in file order, and each student's row range
+    df = df.dropna(subset=['Student']).sort_values('Student', kind='stable').reset_index(drop=True)
+    names = df['Student'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]]) if len(names) else np.zeros(0, dtype=int)
+    stops = np.r_[starts[1:], len(names)].astype(int)
+    return df, dict(zip(names[starts], zip(starts, stops)))
+
+def _rows(table, student):
+    # one student's rows of a snapshot table
+    df, ranges = table
+    start, stop = ranges.get(student, (0, 0))
+    return df.iloc[start:stop]
+
+def load_snapshot():
+    """Reads everything the reports show, once for the whole batch.
+
+    Returns
+    -------
+    dict : The student, attendance and note tables sorted by student with each student's row
+           range, the attendance counts and patterns of every student and the time the data was read.
+    """
+    students = read_csv(STUDENT_DATA)
+    attendance = read_csv(ATTEND_DATA)
+    notes = read_csv(STUDENT_NOTE) if os.path.exists(STUDENT_NOTE) else pd.DataFrame(columns=['Student', 'Note'])
+    return {
+        'students': _by_student(students),
+        'attendance': _by_student(attendance),
+        'notes': _by_student(notes),
+        'cube': build_cube(attendance),
+        'patterns': attendance_patterns(attendance),
+        'taken': datetime.now()
+    }
+
+# SVG CHARTS
+
+def _svg(width, height, body):
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="10">{"".join(body)}</svg>')
+
+def _label(x, y, text, anchor='middle', color='#444'):
+    return f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="{anchor}" fill="{color}">{html.escape(str(text))}</text>'
+
+def _line(x0, y0, x1, y1, color='#e5e5e5', width=1):
+    return f'<line x1="{x0:.1f}" y1="{y0:.1f}" x2="{x1:.1f}" y2="{y1:.1f}" stroke="{color}" stroke-width="{width}"/>'
+
+def _ticks(axis, top=1):
+    # tick values and labels of a value axis, from its layout
+    if 'tickvals' in axis:
+        return list(axis['tickvals']), [str(text) for text in axis.get('ticktext', axis['tickvals'])]
+    low, high = axis.get('range', [0, top])
+    values = np.arange(low, high + 1e-9, axis.get('dtick', (high - low) / 4))
+    return list(values), [format(value, axis['tickformat']) if 'tickformat' in axis else f'{value:g}' for value in values]
+
+def _legend(traces, y, left):
+    body, x = [], left
+    for trace in traces:
+        body.append(f'<rect x="{x}" y="{y - 8}" width="10" height="10" fill="{trace["marker"]["color"]}"/>')
+        body.append(_label(x + 14, y, trace['name'], anchor='start'))
+        x += 24 + 6 * len(trace['name'])
+    return body
+
+def _hbar_svg(fig, width):
+    # stacked horizontal bars, one per category, the first category at the bottom as in plotly
+    traces, layout = fig['data'], fig['layout']
+    categories = list(traces[0]['y'])
+    height = max(110, 26 * len(categories) + CHART_MARGIN['t'] + CHART_MARGIN['b'])
+    left, right = CHART_MARGIN['l'], width - CHART_MARGIN['r']
+    top, bottom = CHART_MARGIN['t'], height - CHART_MARGIN['b']
+    values, labels = _ticks(layout['xaxis'], 100)
+    scale = (right - left) / (max(values) or 1)
+    band = (bottom - top) / len(categories)
+    bar = band * (1 - layout.get('bargap', 0.2))
+
+    body = []
+    for value, text in zip(values, labels):
+        body += [_line(left + value * scale, top, left + value * scale, bottom), _label(left + value * scale, bottom + 12, text)]
+    for n, category in enumerate(categories):
+        y, x = bottom - (n + 0.5) * band, 0
+        body.append(_label(left - 6, y + 3, category, anchor='end'))
+        for trace in traces:
+            value = trace['x'][n] or 0
+            body.append(f'<rect x="{left + x * scale:.1f}" y="{y - bar / 2:.1f}" width="{value * scale:.1f}" '
+                        f'height="{bar:.1f}" fill="{trace["marker"]["color"]}"/>')
+            x += value
+    return _svg(width, height, body + _legend(traces, height - 8, left))
+
+def _vbar_svg(fig, width, height=200):
+    # vertical bars of a single trace
+    trace, layout = fig['data'][0], fig['layout']
+    categories = list(trace['x'])
+    left, right = 45, width - CHART_MARGIN['r']
+    top, bottom = CHART_MARGIN['t'], height - 35
+    values, labels = _ticks(layout['yaxis'])
+    low, high = layout['yaxis'].get('range', [min(values), max(values)])
+    scale = (bottom - top) / ((high - low) or 1)
+    band = (right - left) / len(categories)
+
+    body = []
+    for value, text in zip(values, labels):
+        y = bottom - (value - low) * scale
+        body += [_line(left, y, right, y), _label(left - 6, y + 3, text, anchor='end')]
+    for n, category in enumerate(categories):
+        value = trace['y'][n] or 0
+        x = left + n * band
+        body.append(f'<rect x="{x + band * 0.15:.1f}" y="{bottom - (value - low) * scale:.1f}" width="{band * 0.7:.1f}" '
+                    f'height="{(value - low) * scale:.1f}" fill="{trace["marker"]["color"]}"/>')
+        body.append(_label(x + band / 2, bottom + 12, category))
+    title = layout['xaxis'].get('title', {}).get('text')
+    if title:
+        body.append(_label((left + right) / 2, height - 6, title, color='#777'))
+    return _svg(width, height, body)
+
+def _line_svg(fig, width, height=200):
+    # a dated line with markers, and the layout's vertical line shapes (absences)
+    trace, layout = fig['data'][0], fig['layout']
+    left, right = CHART_MARGIN['l'], width - CHART_MARGIN['r']
+    top, bottom = CHART_MARGIN['t'] + 10, height - 30
+    values, labels = _ticks(layout['yaxis'])
+    low, high = layout['yaxis'].get('range', [min(values), max(values)])
+    shapes = [shape['x0'] for shape in layout.get('shapes', [])]
+    dates = pd.to_datetime(list(trace['x']) + shapes)
+    first, last = dates.min(), dates.max()
+    span = max((last - first).days, 1)
+
+    def x_of(date):
+        return left + (pd.Timestamp(date) - first).days / span * (right - left)
+
+    def y_of(value):
+        return bottom - (value - low) / ((high - low) or 1) * (bottom - top)
+
+    body = []
+    for value, text in zip(values, labels):
+        body += [_line(left, y_of(value), right, y_of(value)), _label(left - 6, y_of(value) + 3, text, anchor='end')]
+    for date in pd.date_range(first, last, periods=min(6, span + 1)):
+        body += [_line(x_of(date), top, x_of(date), bottom), _label(x_of(date), bottom + 14, date.strftime('%b-%d'))]
+    color = layout.get('shapes', [{}])[0].get('line', {}).get('color', 'red') if shapes else 'red'
+    for date in shapes:
+        body += [_line(x_of(date), top, x_of(date), bottom, color), _label(x_of(date), top - 3, 'A', color=color)]
+
+    points = [(x_of(date), y_of(value)) for date, value in zip(trace['x'], trace['y'])]
+    stroke = trace['line']['color']
+    if len(points) > 1:
+        body.append(f'<polyline points="{" ".join(f"{x:.1f},{y:.1f}" for x, y in points)}" fill="none" '
+                    f'stroke="{stroke}" stroke-dasharray="2,3" stroke-width="2"/>')
+    body += [f'<circle cx="{x:.1f}" cy="{y:.1f}" r="3" fill="{stroke}"/>' for x, y in points]
+    return _svg(width, height, body)
+
+def chart_svg(fig, width=CHART_WIDTH):
+    """Draws one of the student charts of graphs.py as a static SVG: stacked horizontal bars,
+    vertical bars or a dated line. Hover text, zooming and the plotly template are left out.
+
+    Parameter
+    ---------
+    fig : dict
+        Figure dict from attendance_figure, timespent_figure or workhabit_figure.
+    width : int
+        Width of the image, in pixels. The height follows from the chart.
+
+    Returns
+    -------
+    str : The <svg> element.
+    """
+    trace = fig['data'][0]
+    if trace['type'] == 'bar':
+        return _hbar_svg(fig, width) if trace.get('orientation') == 'h' else _vbar_svg(fig, width)
+    return _line_svg(fig, width)
+
+# REPORTS
+
+def _table(records, columns):
+    head = ''.join(f'<th>{html.escape(col)}</th>' for col in columns)
+    rows = ''.join('<tr>' + ''.join(f'<td>{html.escape(str(row.get(col, "")))}</td>' for col in columns) + '</tr>'
+                   for row in records)
+    return f'<table><tr>{head}</tr>{rows}</table>'
+
+def student_report(student, snapshot):
+    """Renders a student's progress report: schedule, attendance, work habits and their trend,
+    time spent in support class, attendance patterns and the teacher's note.
+
+    Parameters
+    ----------
+    student: str
+        The name of the student.
+    snapshot: dict
+        Output of load_snapshot().
+
+    Returns
+    -------
+    str : The report, as a complete HTML page.
+    """
+    attendance = _rows(snapshot['attendance'], student)
+    schedule = student_schedule(student, _rows(snapshot['students'], student))
+    crosstab = attendance_crosstab(student, cube=snapshot['cube'])
+    habits = habit_series(student, attendance)
+    work = work_counts(student, cube=snapshot['cube'])
+    message, avg, icon = workhabit_trend(student, attendance)
+    note = get_student_note(student, _rows(snapshot['notes'], student))
+    patterns = student_patterns(student, snapshot['patterns'])
+
+    sections = [f'<h1>{html.escape(student)}</h1>',
+                f'<p class="muted">Progress report, data as of {snapshot["taken"]:%Y-%m-%d %H:%M}</p>',
+                '<h2>Schedule</h2>',
+                _table(schedule, ['Block', 'Course', 'Teacher']) if schedule else '<p class="muted">Not enrolled in any classes.</p>',
+                '<h2>Attendance</h2>']
+    if crosstab['courses']:
+        totals = np.sum(crosstab['counts'], axis=0)
+        summary = ', '.join(f'{status} {count}' for status, count in zip(ATTENDANCE_STATUS, totals))
+        sections += [f'<p>{summary} (of {totals.sum()} classes)</p>', chart_svg(attendance_figure(crosstab, overall=False))]
+    else:
+        sections.append('<p class="muted">No attendance recorded.</p>')
+    sections.append('<ul>' + ''.join(f'<li>{html.escape(line)}</li>' for line in patterns) + '</ul>' if patterns
+                    else '<p class="muted">No absence or late patterns.</p>')
+
+    sections.append('<h2>Work Habits</h2>')
+    trend = f'{message} {icon}, recent average {avg}' if message != 'insufficient data' else 'not enough scores for a trend'
+    sections.append(f'<p>Trend over the last 6 support classes: {html.escape(trend)}</p>')
+    sections.append(chart_svg(workhabit_figure(habits)) if habits['dates']
+                    else '<p class="muted">No work habit scores recorded.</p>')
+    sections.append('<h2>Time Spent in Support</h2>')
+    sections.append(chart_svg(timespent_figure(work)) if work['total']
+                    else '<p class="muted">No subjects recorded.</p>')
+
+    sections.append('<h2>Note</h2>')
+    sections.append(f'<p class="note">{html.escape(note)}</p>' if isinstance(note, str) and note
+                    else '<p class="muted">No note.</p>')
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(student)} - Progress Report</title>'
+            f'<style>{REPORT_STYLE}</style></head><body>{"".join(sections)}</body></html>')
+
+def report_file(student):
+    """The file name of a student's report (see report_files for names that clash)."""
+    return re.sub(r'[^\w.-]+', '_', student).strip('_') + '.html'
+
+def report_files(students):
+    """The file name of each student's report. Names that map to the same file (e.g. "O'Neil A"
+    and "O Neil A", or names differing only in case) get a numbered suffix, in student order.
+
+    Parameters
+    ----------
+    students: list
+        The names of the students.
+
+    Returns
+    -------
+    dict: The file name of each student.
+    """
+    files, used = {}, set()
+    for student in dict.fromkeys(students):
+        stem = report_file(student)[:-len('.html')]
+        name, number = stem, 1
+        while name.lower() in used:
+            number += 1
+            name = f'{stem}_{number}'
+        used.add(name.lower())
+        files[student] = name + '.html'
+    return files
+
+# BATCH
+
+# each worker process's snapshot and output directory, set when it starts
+_worker = {}
+
+def _start_worker(snapshot, output_dir):
+    _worker.update(snapshot=snapshot, output_dir=output_dir)
+
+def _write_report(item):
+    # one report, given the student and file name, timed. A failure is returned rather than
+    # raised, so the batch carries on
+    student, file_name = item
+    start = time.perf_counter()
+    try:
+        page = student_report(student, _worker['snapshot'])
+        with open(os.path.join(_worker['output_dir'], file_name), 'w', encoding='utf-8') as f:
+            f.write(page)
+        error = ''
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    return {'Student': student, 'File': file_name, 'Seconds': time.perf_counter() - start,
+            'Worker': os.getpid(), 'Error': error}
+
+def run_reports(students=None, output_dir=REPORTS_DIR, workers=None, snapshot=None, progress=None):
+    """Writes a progress report for each student, in parallel across a pool of processes, then
+    an index page and the time taken by each report.
+
+    Parameters
+    ----------
+    students: list, optional
+        The names of the students. Every student in the snapshot if None.
+    output_dir: str
+        The directory to write to, created if needed.
+    workers: int, optional
+        The number of processes. One per CPU if None, 1 runs in this process.
+    snapshot: dict, optional
+        Output of load_snapshot(), read if None.
+    progress: callable, optional
+        Called with the timing of each report as it completes, in student order.
+
+    Returns
+    -------
+    pd.DataFrame : Student, File, Seconds, Worker (process id) and Error of each report.
+    """
+    snapshot = snapshot if snapshot is not None else load_snapshot()
+    students = list(students) if students is not None else sorted(snapshot['students'][1])
+    items = list(report_files(students).items())
+    workers = max(1, min(workers or os.cpu_count() or 1, len(students) or 1))
+    os.makedirs(output_dir, exist_ok=True)
+
+    timings = []
+    if workers == 1:
+        _start_worker(snapshot, output_dir)
+        results = map(_write_report, items)
+        for result in results:
+            timings.append(result)
+            if progress:
+                progress(result)
+    else:
+        # forked workers share the parent's snapshot, other start methods get a copy each
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_start_worker,
+                                 initargs=(snapshot, output_dir)) as pool:
+            for result in pool.map(_write_report, items, chunksize=max(1, len(items) // (workers * 16))):
+                timings.append(result)
+                if progress:
+                    progress(result)
+
+    timings = pd.DataFrame(timings, columns=['Student', 'File', 'Seconds', 'Worker', 'Error'])
+    timings.to_csv(os.path.join(output_dir, 'timings.csv'), index=False)
+    written = timings[timings['Error'] == '']
+    links = ''.join(f'<li><a href="{html.escape(row.File)}">{html.escape(row.Student)}</a></li>' for row in written.itertuples())
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Progress Reports</title>'
+                f'<style>{REPORT_STYLE}</style></head><body><h1>Progress Reports</h1>'
+                f'<p class="muted">{len(written)} students, data as of {snapshot["taken"]:%Y-%m-%d %H:%M}</p>'
+                f'<ul>{links}</ul></body></html>')
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a printable progress report for every student.')
+    parser.add_argument('--output', default=REPORTS_DIR, help='directory to write the reports to')
+    parser.add_argument('--workers', type=int, default=None, help='processes, one per CPU by default')
+    parser.add_argument('--student', action='append', help='only this student (repeatable)')
+    parser.add_argument('--teacher', help="only the students in this teacher's classes")
+    parser.add_argument('--limit', type=int, help='at most this many students')
+    parser.add_argument('--verbose', action='store_true', help='print the time taken by each report')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshot = load_snapshot()
+    loaded = time.perf_counter() - start
+    students = args.student or sorted(snapshot['students'][1])
+    if args.teacher:
+        df = snapshot['students'][0]
+        taught = set(df.loc[df['Teacher'] == args.teacher, 'Student'])
+        students = [name for name in students if name in taught]
+    students = students[:args.limit] if args.limit else students
+
+    def progress(result):
+        if args.verbose or result['Error']:
+            status = result['Error'] or result['File']
+            print(f"  {result['Student']:<30} {result['Seconds'] * 1000:8.1f} ms  {status}")
+
+    timings = run_reports(students, args.output, args.workers, snapshot, progress)
+    total = time.perf_counter() - start
+    failed = (timings['Error'] != '').sum()
+    seconds = timings['Seconds']
+    print(f'Wrote {len(timings) - failed} reports to {args.output} in {total:.1f} s '
+          f'(data read in {loaded:.1f} s, {timings["Worker"].nunique()} worker(s)).')
+    if len(timings):
+        slowest = timings.loc[seconds.idxmax()]
+        print(f'Per report: median {seconds.median() * 1000:.1f} ms, 95th percentile {seconds.quantile(0.95) * 1000:.1f} ms, '
+              f"slowest {seconds.max() * 1000:.1f} ms ({slowest['Student']}). Times in timings.csv.")
+    if failed:
+        print(f'{failed} report(s) failed.', file=sys.stderr)
+    return 1 if failed else 0
+
+# latency metrics, when enabled
+instrument_module(globals(), ['load_snapshot', 'student_report', 'run_reports'])
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from .config import RISK_WEIGHTS, RISK_LIMITS, RISK_PAGE_SIZE
+from .events import refresh_view, drop_views
+from .metrics import instrument_module
+from .data import WORKHABIT_SCORES, TASK_KEY, frame_page
+from .streaks import group_streaks
+
+# EARLY WARNING
+# Ranks the whole roster by a risk score built from five signals per student:
+#   absence: share of classes missed (A or AE)
+#   streak:  school days in a row, up to the student's latest day, with every class missed
+#   habits:  points below On-task of the average of the 3 latest work habit scores
+#   trend:   drop of that average from the 3 scores before (as in data.workhabit_trend)
+#   overdue: tasks in student_tasks.csv past due, not completed or hidden
+# Each signal counts in full from its RISK_LIMITS value, and the score is their RISK_WEIGHTS
+# weighted average, from 0 to 100. The signals of all students are computed in one pass, and
+# kept as views of the event log (see events.py): brought up to date after a save, recounting
+# only the students in the logged rows, and saved, so a new process catches up from there.
+SIGNALS = ['absence', 'streak', 'habits', 'trend', 'overdue']
+RISK_COLUMNS = ['Student', 'Grade', 'Risk', 'Absence %', 'Streak', 'Habit Avg', 'Habit Change', 'Overdue']
+
+# attendance_habits.csv columns the signals are counted from
+ATTENDANCE_COLUMNS = ['Student', 'Date', 'Course', 'Attendance', 'Habit']
+
+# latest work habit scores kept per student, h0 the most recent
+HABIT_COLUMNS = [f'h{n}' for n in range(6)]
+MAX_HABIT = max(WORKHABIT_SCORES.values())
+
+_state = {'attendance': None, 'tasks': None, 'students': None, 'risk': None}
+_risk_lock = threading.Lock()
+
+def _reset_risk_lock():
+    # a background job forked while another thread was updating the signals would wait forever
+    global _risk_lock
+    _risk_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_risk_lock)
+
+# SIGNALS
+def attendance_signals(attendance):
+    """Counts the attendance and work habit signals of every student in the attendance data.
+
+    Parameters
+    ----------
+    attendance: pd.DataFrame
+        Rows in the format of attendance_habits.csv.
+
+    Returns
+    -------
+    pd.DataFrame: Indexed by Student: classes and classes missed, days recorded, first and last
+                  day, current streak of days missed, the latest work habit scores (HABIT_COLUMNS),
+                  their count and the date of the latest.
+    """
+    # students are numbered once, the counts below group by number
+    codes, names = pd.factorize(attendance['Student'], sort=True)
+    student = pd.Series(codes, index=attendance.index, name='Student')
+    dates = pd.to_datetime(attendance['Date'], format='ISO8601')
+    missed = attendance['Attendance'].isin(['A', 'AE'])
+    present = attendance['Attendance'].isin(['P', 'L'])
+    signals = missed.groupby(student).agg(['size', 'sum']).set_axis(['classes', 'missed'], axis=1)
+
+    # days missed since the last day with a class attended: the current run of missed days, with
+    # the days sorted by student and date (see streaks.run_lengths)
+    days = present.groupby([student, dates]).any().rename('present').reset_index()
+    by_day = days.groupby('Student')['Date']
+    signals['days'] = by_day.size()
+    signals['first_date'] = by_day.min()
+    signals['last_date'] = by_day.max()
+    streak, _ = group_streaks(days['Student'].to_numpy(), ~days['present'].to_numpy())
+    signals['streak'] = pd.Series(streak, index=days['Student'].unique())
+
+    # latest work habit scores in support class, course names are checked once each
+    courses = attendance['Course'].dropna().unique()
+    support = attendance['Course'].isin([course for course in courses if 'Support' in course])
+    habits = pd.DataFrame({'Student': student, 'Date': dates, 'Score': attendance['Habit'].map(WORKHABIT_SCORES)})
+    habits = habits[support].dropna(subset=['Score']).sort_values(by=['Student', 'Date'], kind='stable')
+    habits['rank'] = habits.groupby('Student').cumcount(ascending=False)
+    latest = habits[habits['rank'] < len(HABIT_COLUMNS)].pivot(index='Student', columns='rank', values='Score')
+    latest = latest.reindex(columns=range(len(HABIT_COLUMNS)))
+    signals[HABIT_COLUMNS] = latest.set_axis(HABIT_COLUMNS, axis=1).reindex(signals.index)
+    signals['habit_count'] = habits.groupby('Student').size().reindex(signals.index, fill_value=0)
+    signals['habit_date'] = habits.groupby('Student')['Date'].max().reindex(signals.index)
+    return signals.set_axis(pd.Index(names[signals.index], name='Student'))
+
+def add_attendance(signals, rows):
+    """Adds newly saved attendance rows to the attendance signals, recounting only the students
+    in the rows.
+
+    Parameters
+    ----------
+    signals: pd.DataFrame
+        Output of attendance_signals().
+    rows: pd.DataFrame
+        The rows added to attendance_habits.csv.
+
+    Returns
+    -------
+    pd.DataFrame: The updated signals, or None if some rows are dated before a day already counted
+                  for their student (the streaks would change), count all rows again instead.
+    """
+    if rows.empty:
+        return signals
+    new = attendance_signals(rows)
+    old = signals.reindex(new.index)
+    old_last = old['last_date']
+    if (new['first_date'] < old_last).any():
+        return None
+
+    # the streak goes on if every new day was missed, counting a day that continues the
+    # student's last day once (it is attended if either part was)
+    same_day = new['first_date'] == old_last
+    all_missed = new['streak'] == new['days']
+    streak = np.where(all_missed, old['streak'].fillna(0) + new['days'] - same_day, new['streak'])
+
+    # latest habit scores: the new ones, then the old ones
+    scores = np.concatenate([new[HABIT_COLUMNS].to_numpy(), old[HABIT_COLUMNS].to_numpy()], axis=1)
+    order = np.argsort(np.isnan(scores), axis=1, kind='stable')
+    scores = np.take_along_axis(scores, order, axis=1)[:, :len(HABIT_COLUMNS)]
+
+    merged = pd.DataFrame({
+        'classes': old['classes'].fillna(0) + new['classes'],
+        'missed': old['missed'].fillna(0) + new['missed'],
+        'days': old['days'].fillna(0) + new['days'] - same_day,
+        'first_date': old['first_date'].fillna(new['first_date']),
+        'last_date': new['last_date'],
+        'streak': streak,
+    }, index=new.index)
+    merged[HABIT_COLUMNS] = scores
+    merged['habit_count'] = old['habit_count'].fillna(0) + new['habit_count']
+    merged['habit_date'] = new['habit_date'].fillna(old['habit_date'])
+
+    merged = merged.astype({column: int for column in ['classes', 'missed', 'days', 'streak', 'habit_count']})
+    return pd.concat([signals.drop(index=new.index, errors='ignore'), merged])
+
+def _task_index(tasks):
+    # (Student, Task, Course, Teacher, Block, Due) of each row, the key events.REPLACE updates
+    # rows by, with the due date as 'YYYY-MM-DD'
+    due = tasks['Due'].astype(str).str[:10]
+    return pd.MultiIndex.from_arrays([tasks[column] for column in ['Student'] + TASK_KEY] + [due],
+                                     names=['Student'] + TASK_KEY + ['Due'])
+
+def open_tasks(tasks):
+    """Finds the tasks that are neither completed nor hidden.
+
+    Parameters
+    ----------
+    tasks: pd.DataFrame
+        Rows in the format of student_tasks.csv.
+
+    Returns
+    -------
+    pd.Series: Due dates ('YYYY-MM-DD'), indexed by (Student, Task, Course, Teacher, Block, Due).
+    """
+    tasks = tasks[(tasks['Completed'] != True) & (tasks['Hidden'] != True)]
+    index = _task_index(tasks)
+    return pd.Series(index.get_level_values('Due'), index=index, name='Due')
+
+def update_open_tasks(tasks, rows):
+    """Applies added or changed student_tasks.csv rows to the open tasks.
+
+    Parameters
+    ----------
+    tasks: pd.Series
+        Output of open_tasks().
+    rows: pd.DataFrame
+        The rows added or changed, with their new Completed and Hidden values.
+
+    Returns
+    -------
+    pd.Series: The updated open tasks.
+    """
+    if rows.empty:
+        return tasks
+    # the last change of each row counts, as in events.replay
+    rows = rows[~_task_index(rows).duplicated(keep='last')]
+    return pd.concat([tasks[~tasks.index.isin(_task_index(rows))], open_tasks(rows)])
+
+def overdue_tasks(tasks, today):
+    """Counts each student's open tasks due before today.
+
+    Parameters
+    ----------
+    tasks: pd.Series
+        Output of open_tasks().
+    today: str
+        The current date, 'YYYY-MM-DD'.
+
+    Returns
+    -------
+    pd.Series: The number of overdue tasks, indexed by Student.
+    """
+    return (tasks < today).groupby(level='Student').sum()
+
+def student_roster(students):
+    """Retrieves every student's grade.
+
+    Parameters
+    ----------
+    students: pd.DataFrame
+        Contents of student.csv.
+
+    Returns
+    -------
+    pd.Series: Grades, indexed by Student.
+    """
+    return students.drop_duplicates('Student').set_index('Student')['Grade'].sort_index()
+
+# SCORES
+def risk_values(attendance, overdue, roster):
+    """Collects the raw signal values of every student on the roster.
+
+    Parameters
+    ----------
+    attendance: pd.DataFrame
+        Output of attendance_signals().
+    overdue: pd.Series
+        Output of overdue_tasks().
+    roster: pd.Series
+        Output of student_roster().
+
+    Returns
+    -------
+    pd.DataFrame: Indexed by Student: Grade, absence (share of classes missed), streak (days),
+                  habit_avg (latest 3 scores), habit_change (from the 3 before, once there are 5
+                  scores, as in data.workhabit_trend) and overdue (tasks). Missing values are NaN.
+    """
+    signals = attendance.reindex(roster.index)
+    recent = signals[HABIT_COLUMNS[:3]].mean(axis=1)
+    previous = signals[HABIT_COLUMNS[3:]].mean(axis=1)
+    return pd.DataFrame({
+        'Grade': roster,
+        'absence': signals['missed'] / signals['classes'],
+        'streak': signals['streak'].fillna(0),
+        'habit_avg': recent,
+        'habit_change': (recent - previous).where(signals['habit_count'] >= 5),
+        'overdue': overdue.reindex(roster.index, fill_value=0)
+    })
+
+def risk_scores(values, weights=None, limits=None):
+    """Combines the signal values into risk scores.
+
+    Parameters
+    ----------
+    values: pd.DataFrame
+        Output of risk_values().
+    weights: dict, optional
+        The weight of each of SIGNALS. Defaults to config.RISK_WEIGHTS.
+    limits: dict, optional
+        The value at which each of SIGNALS counts in full. Defaults to config.RISK_LIMITS.
+
+    Returns
+    -------
+    pd.Series: Scores from 0 (no signal) to 100 (every signal in full), indexed by Student.
+    """
+    weights = RISK_WEIGHTS if weights is None else weights
+    limits = RISK_LIMITS if limits is None else limits
+    raw = {
+        'absence': values['absence'],
+        'streak': values['streak'],
+        'habits': MAX_HABIT - values['habit_avg'],
+        'trend': -values['habit_change'],
+        'overdue': values['overdue']
+    }
+    total = sum(weights.get(name, 0) for name in SIGNALS) or 1
+    score = sum(weights.get(name, 0) * (raw[name] / limits[name]).clip(0, 1).fillna(0) for name in SIGNALS)
+    return 100 * score / total
+
+def risk_table(values, weights=None, limits=None):
+    """Formats the signal values and scores for the risk view, highest risk first."""
+    table = pd.DataFrame({
+        'Student': values.index,
+        'Grade': values['Grade'],
+        'Risk': risk_scores(values, weights, limits).round(1),
+        'Absence %': (values['absence'] * 100).round(1),
+        'Streak': values['streak'].astype(int),
+        'Habit Avg': values['habit_avg'].round(1),
+        'Habit Change': values['habit_change'].round(1),
+        'Overdue': values['overdue'].astype(int)
+    }).reset_index(drop=True)
+    return table.sort_values(by=['Risk', 'Student'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+# CACHED SIGNALS
+def _load(table, build, apply=None, columns=None):
+    # the table's signals, brought up to date from the event log
+    _state[table] = refresh_view(f'risk-{table}', table, _state[table], build, apply, columns)
+    return _state[table]['data']
+
+def reset_risk(saved=True):
+    """Drops the signals kept in memory.
+
+    Parameters
+    ----------
+    saved: bool
+        Also delete the saved signals, so they are counted again from the CSV files on next use.
+        If False, they are loaded and caught up from the log, as in a process just started.
+    """
+    with _risk_lock:
+        _state.update(attendance=None, tasks=None, students=None, risk=None)
+    if saved:
+        drop_views('risk-attendance', 'risk-tasks', 'risk-students')
+
+def roster_risk(weights=None, limits=None):
+    """Scores every student on the roster, updating the signals kept in memory with any rows
+    written since the last call (see risk_scores for the arguments).
+
+    Returns
+    -------
+    pd.DataFrame: One row per student with RISK_COLUMNS, highest risk first. Do not modify.
+    """
+    today = datetime.today().strftime('%Y-%m-%d')
+    with _risk_lock:
+        attendance = _load('attendance', attendance_signals, add_attendance, ATTENDANCE_COLUMNS)
+        tasks = _load('tasks', open_tasks, update_open_tasks)
+        roster = _load('students', student_roster, columns=['Student', 'Grade'])
+
+        key = (tuple((_state[table]['position'], _state[table]['signature']) for table in ('attendance', 'tasks', 'students')), today,
+               tuple(sorted((weights or {}).items())), tuple(sorted((limits or {}).items())))
+        if _state['risk'] is None or _state['risk']['key'] != key:
+            values = risk_values(attendance, overdue_tasks(tasks, today), roster)
+            _state['risk'] = {'key': key, 'data': risk_table(values, weights, limits)}
+        return _state['risk']['data']
+
+def risk_page(page_current=0, page_size=RISK_PAGE_SIZE, sort_by=(), filter_query=''):
+    """Retrieves one page of the risk view, after filtering and sorting, for a DataTable with
+    custom paging, sorting and filtering.
+
+    Parameters
+    ----------
+    page_current: int
+        The page to retrieve, starting from 0.
+    page_size: int
+        The number of rows per page.
+    sort_by: list
+        A list of (column, direction) pairs, direction being 'asc' or 'desc'. Highest risk
+        first if empty.
+    filter_query: str
+        The filter_query of the table (see data.parse_filter_query).
+
+    Returns
+    -------
+    rows, page_count, matched: The students on the page, as in data.frame_page.
+    """
+    return frame_page(roster_risk(), page_current, page_size, sort_by, filter_query)
+
+# latency metrics, when enabled
+instrument_module(globals(), ['roster_risk', 'risk_page'])
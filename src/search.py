@@ -0,0 +1,190 @@
+import re
+import numpy as np
+import pandas as pd
+from flask import jsonify, request
+from .config import STUDENT_DATA, SEARCH_LIMIT
+from .cache import memoize
+from .metrics import read_csv, instrument_module
+
+# STUDENT SEARCH
+# The student dropdowns start without options and are searched on the server as the user types,
+# so the page never carries the whole roster. Names are indexed once per version of student.csv,
+# sorted in lowercase, with every word of every name in a second sorted array, so prefixes are
+# found by binary search. Matches rank as:
+#   0: the name starts with the query ('ali' -> Alice Hill)
+#   1: every word of the query starts a word of the name ('hill a' -> Alice Hill)
+#   2: the name contains the query ('ice h' -> Alice Hill)
+#   3: the letters of the query appear in the name in order ('alc hl' -> Alice Hill)
+# Each rank is only looked for while there are fewer than SEARCH_LIMIT matches.
+
+@memoize('students')
+def student_search_index():
+    """Builds the search index of student names, with the students of each teacher and course.
+
+    Returns
+    -------
+    dict : names (sorted by lowercase), lower (the lowercase names, as one numpy string array),
+           text (the lowercase names, one per line), starts (the offset of each line in text),
+           words and owners (every word of every name, sorted, and the name it belongs to),
+           teachers and courses (the sorted name positions of each teacher's and course's students).
+    """
+    df = read_csv(STUDENT_DATA, usecols=['Student', 'Course', 'Teacher']).dropna(subset=['Student'])
+    names = np.array(sorted(df['Student'].unique(), key=lambda name: (' '.join(name.lower().split()), name)), dtype=object)
+    lower = [' '.join(name.lower().split()) for name in names]
+    position = pd.Index(names).get_indexer(df['Student'])
+
+    split = [name.split(' ') for name in lower]
+    words = np.array([word for name in split for word in name] or [''])
+    owners = np.repeat(np.arange(len(names)), [len(name) for name in split]) if len(names) else np.zeros(1, dtype=int)
+    order = np.argsort(words, kind='stable')
+
+    students = pd.Series(position, index=df.index)
+    return {
+        'names': names,
+        'lower': np.array(lower or ['']),
+        'text': '\n'.join(lower),
+        'starts': np.cumsum([0] + [len(name) + 1 for name in lower[:-1]]),
+        'words': words[order],
+        'owners': owners[order],
+        'teachers': {teacher: np.unique(ids) for teacher, ids in students.groupby(df['Teacher'])},
+        'courses': {course: np.unique(ids) for course, ids in students.groupby(df['Course'])}
+    }
+
+def _prefix_range(values, prefix):
+    # the slice of a sorted string array starting with prefix
+    return np.searchsorted(values, prefix, 'left'), np.searchsorted(values, prefix + '\U0010ffff', 'left')
+
+def _lines(index, offsets):
+    # positions of the names (lines of the index text) containing the given offsets
+    return np.unique(np.searchsorted(index['starts'], offsets, 'right') - 1).astype(int)
+
+def search_students(query='', teacher=None, course=None, limit=SEARCH_LIMIT):
+    """Finds the students whose names best match a typed query, in the order of the ranks
+    above, then by name.
+
+    Parameters
+    ----------
+    query: str
+        The text typed in the dropdown. All students (of the teacher and course) if blank.
+    teacher: str, optional
+        Only students in one of this teacher's classes.
+    course: str, optional
+        Only students in this course.
+    limit: int
+        The number of students to return.
+
+    Returns
+    -------
+    list : A list of dictionaries containing labels and values of the matching students,
+           to be used as the dropdown options.
+    """
+    index = student_search_index()
+    names = index['names']
+    allowed = np.ones(len(names), dtype=bool)
+    for filters, key in [(index['teachers'], teacher), (index['courses'], course)]:
+        if key:
+            members = np.zeros(len(names), dtype=bool)
+            members[filters.get(key, [])] = True
+            allowed &= members
+
+    query = ' '.join((query or '').lower().split())
+    if not query:
+        return [{'label': name, 'value': name} for name in names[np.flatnonzero(allowed)[:limit]]]
+
+    def name_starts():
+        start, stop = _prefix_range(index['lower'], query)
+        return np.arange(start, stop)
+
+    def word_starts():
+        found = None
+        for word in query.split(' '):
+            start, stop = _prefix_range(index['words'], word)
+            owners = np.unique(index['owners'][start:stop])
+            found = owners if found is None else np.intersect1d(found, owners, assume_unique=True)
+        return found
+
+    # with a teacher or course, scanning only their students is quicker than the whole text
+    members = np.flatnonzero(allowed) if teacher or course else None
+
+    def contains():
+        if members is not None:
+            return members[np.char.find(index['lower'][members], query) >= 0]
+        text, offsets = index['text'], []
+        start = text.find(query)
+        while start >= 0:
+            offsets.append(start)
+            start = text.find(query, start + 1)
+        return _lines(index, offsets)
+
+    def letters_in_order():
+        # each letter is matched at its first occurrence after the previous one, so the
+        # pattern never backtracks more than one line
+        letters = query.replace(' ', '')
+        if len(letters) < 2:
+            return np.zeros(0, dtype=int)
+        pattern = re.compile('^' + ''.join(f'[^\\n{re.escape(c)}]*{re.escape(c)}' for c in letters), re.MULTILINE)
+        if members is not None:
+            return members[[pattern.match(name) is not None for name in index['lower'][members]]]
+        return _lines(index, [match.start() for match in pattern.finditer(index['text'])])
+
+    matches, seen = [], np.zeros(len(names), dtype=bool)
+    for rank in [name_starts, word_starts, contains, letters_in_order]:
+        found = rank()
+        found = found[allowed[found] & ~seen[found]]
+        seen[found] = True
+        matches.extend(np.sort(found)[:limit - len(matches)])
+        if len(matches) >= limit:
+            break
+    return [{'label': name, 'value': name} for name in names[matches]]
+
+def match_student(text):
+    """Matches a typed student name to a student on the roster, ignoring case and spacing.
+
+    Parameters
+    ----------
+    text: str
+        The typed name.
+
+    Returns
+    -------
+    str : The student's name, or None if no student, or more than one, has that name.
+    """
+    query = ' '.join((text or '').lower().split())
+    if not query:
+        return None
+    index = student_search_index()
+    start, stop = np.searchsorted(index['lower'], query, 'left'), np.searchsorted(index['lower'], query, 'right')
+    return index['names'][start] if stop - start == 1 and start < len(index['names']) else None
+
+def filter_options():
+    """The teachers and courses the student search can be narrowed to, support classes
+    included, as dropdown options.
+
+    Returns
+    -------
+    teachers, courses : list
+        Dropdown options, sorted by name.
+    """
+    index = student_search_index()
+    return ([{'label': name, 'value': name} for name in sorted(index['teachers'])],
+            [{'label': name, 'value': name} for name in sorted(index['courses'])])
+
+def register_search(server):
+    """Adds the /students/search endpoint to the Flask server, for the student cell editor of
+    the work habit table (assets/dashAgGridComponentFunctions.js).
+
+    GET /students/search?q=<typed text> returns the dropdown options of search_students.
+
+    Parameters
+    ----------
+    server: flask.Flask
+        The app's server.
+    """
+    @server.route('/students/search')
+    def student_search():
+        return jsonify(search_students(request.args.get('q', '')))
+
+# latency metrics, when enabled
+instrument_module(globals(), [
+    'student_search_index', 'search_students', 'match_student', 'filter_options'
+])
@@ -0,0 +1,289 @@
+import numpy as np
+import pandas as pd
+from .config import ATTEND_DATA, STREAK_MIN, PATTERN_MIN, PATTERN_SHARE, PATTERN_RATIO
+from .cache import memoize
+from .metrics import read_csv, instrument_module
+from .data import frame_page
+
+# ATTENDANCE PATTERNS
+# Streaks of absences (A or AE) and lates (L) for every student at once:
+#   per student, by school day: absent when no class was attended (P or L), late when late to any
+#   per course, by class: the attendance code of each class
+# The rows are sorted by student (or student and course) and date once, and the length of the
+# run ending at each row is found with a cumulative maximum, so the whole roster takes one pass.
+# A weekday pattern is a weekday with at least PATTERN_MIN absences (or lates), on at least
+# PATTERN_SHARE of those weekdays and at PATTERN_RATIO times the student's rate on other days.
+PATTERN_COLUMNS = ['Student', 'Course', 'Absent Now', 'Longest Absence', 'Late Now', 'Longest Late', 'Absent On', 'Late On']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+ALL_CLASSES = 'All classes'
+
+# attendance_habits.csv columns the patterns are found from
+ATTENDANCE_COLUMNS = ['Student', 'Date', 'Course', 'Attendance']
+
+def run_lengths(groups, flags):
+    """Length of the run of flagged rows ending at each row, within its group.
+
+    Parameters
+    ----------
+    groups: np.ndarray
+        The group of each row, as integers, sorted so each group's rows are together and in order.
+    flags: np.ndarray
+        Booleans, whether each row is flagged (e.g. absent).
+
+    Returns
+    -------
+    np.ndarray: The number of flagged rows in a row up to and including each row, 0 if not flagged.
+    """
+    position = np.arange(len(flags))
+    first = np.ones(len(flags), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    # the last unflagged row at or before each row; each group starts as if after one
+    last_unflagged = np.where(flags, -1, position)
+    last_unflagged = np.where(first & flags, position - 1, last_unflagged)
+    return position - np.maximum.accumulate(last_unflagged)
+
+def group_streaks(groups, flags):
+    """Current and longest run of flagged rows in each group.
+
+    Parameters
+    ----------
+    groups: np.ndarray
+        The group of each row, numbered 0 to n - 1, sorted as in run_lengths.
+    flags: np.ndarray
+        Booleans, whether each row is flagged.
+
+    Returns
+    -------
+    current, longest : np.ndarray
+        The run ending at each group's last row, and the longest run, for groups 0 to n - 1.
+    """
+    if not len(groups):
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    lengths = run_lengths(groups, flags)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], len(groups)] - 1
+    return lengths[ends], np.maximum.reduceat(lengths, starts)
+
+def weekday_patterns(groups, weekdays, flags, n_groups):
+    """The weekday each group is flagged on most often, when it is a pattern: at least PATTERN_MIN
+    flagged rows, at least PATTERN_SHARE of the rows on that weekday, and at PATTERN_RATIO times
+    the group's rate on other weekdays.
+
+    Parameters
+    ----------
+    groups: np.ndarray
+        The group of each row, numbered 0 to n_groups - 1, in any order.
+    weekdays: np.ndarray
+        The weekday of each row, 0 for Monday.
+    flags: np.ndarray
+        Booleans, whether each row is flagged.
+    n_groups: int
+        The number of groups.
+
+    Returns
+    -------
+    weekday, count, total : np.ndarray
+        For each group, the weekday of its pattern (-1 if none), the flagged rows on that weekday
+        and all rows on that weekday.
+    """
+    slots = groups * 7 + weekdays
+    flagged = np.bincount(slots, weights=flags, minlength=n_groups * 7).reshape(n_groups, 7)
+    total = np.bincount(slots, minlength=n_groups * 7).reshape(n_groups, 7)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = flagged / total
+        other_rate = (flagged.sum(axis=1, keepdims=True) - flagged) / (total.sum(axis=1, keepdims=True) - total)
+        # comparisons with nan (no other weekdays to compare with) are False
+        pattern = (flagged >= PATTERN_MIN) & (rate >= PATTERN_SHARE) & (rate >= PATTERN_RATIO * other_rate)
+
+    weekday = np.where(pattern, rate, -1).argmax(axis=1)
+    rows = np.arange(n_groups)
+    return np.where(pattern.any(axis=1), weekday, -1), flagged[rows, weekday].astype(int), total[rows, weekday]
+
+def pattern_frame(groups, weekdays, absent, late, n_groups):
+    """Absence and late streaks and weekday patterns of each group.
+
+    Parameters
+    ----------
+    groups, weekdays, absent, late: np.ndarray
+        The group (0 to n_groups - 1), weekday and flags of each row, sorted as in run_lengths.
+    n_groups: int
+        The number of groups.
+
+    Returns
+    -------
+    pd.DataFrame: One row per group with absent_now, absent_longest, late_now, late_longest,
+    and absent_day, absent_count, absent_total (and late_...) as in weekday_patterns.
+    """
+    columns = {}
+    for name, flags in [('absent', absent), ('late', late)]:
+        columns[f'{name}_now'], columns[f'{name}_longest'] = group_streaks(groups, flags)
+        day, count, total = weekday_patterns(groups, weekdays, flags, n_groups)
+        columns.update({f'{name}_day': day, f'{name}_count': count, f'{name}_total': total})
+    return pd.DataFrame(columns)
+
+def _codes(column):
+    # integer codes (-1 if missing) and sorted unique values, cheap for a column read as a category
+    column = column.astype('category')
+    if not column.cat.categories.is_monotonic_increasing:
+        column = column.cat.reorder_categories(column.cat.categories.sort_values())
+    return column.cat.codes.to_numpy(), column.cat.categories
+
+@memoize('attendance')
+def attendance_patterns(attendance=None):
+    """Finds the absence and late streaks and weekday patterns of every student, over school
+    days and in each course.
+
+    Parameters
+    ----------
+    attendance: pd.DataFrame, optional
+        The attendance data. Read from attendance_habits.csv if None.
+
+    Returns
+    -------
+    students : pd.DataFrame
+        Indexed by Student, the columns of pattern_frame counted by school day.
+    courses : pd.DataFrame
+        Indexed by Student and Course, the columns of pattern_frame counted by class.
+    """
+    df = attendance if attendance is not None else read_csv(ATTEND_DATA, usecols=ATTENDANCE_COLUMNS, dtype='category')
+    student, students = _codes(df['Student'])
+    course, courses = _codes(df['Course'])
+    date, dates = _codes(df['Date'])
+    code, codes = _codes(df['Attendance'])
+    # day numbers, 1970-01-01 (a Thursday) being 0; flags of each code, the extra False for missing values
+    day_numbers = pd.to_datetime(dates, format='ISO8601').to_numpy().astype('datetime64[D]').astype(np.int64)
+    day = day_numbers[date] - (day_numbers.min() if len(day_numbers) else 0)
+    weekdays = (day_numbers[date] + 3) % 7
+    absent = np.append(np.isin(codes, ['A', 'AE']), False)[code]
+    late = np.append(codes == 'L', False)[code]
+    attended = np.append(np.isin(codes, ['P', 'L']), False)[code]
+    span = int(day.max()) + 1 if len(day) else 1
+
+    # school days: rows by student and date, one run per student. The file is mostly in this
+    # order already, which a stable sort takes advantage of
+    key = student.astype(np.int64) * span + day
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.zeros(0, dtype=int)
+    days = pattern_frame(student[order][starts], weekdays[order][starts],
+                         ~np.logical_or.reduceat(attended[order], starts) if len(starts) else absent,
+                         np.logical_or.reduceat(late[order], starts) if len(starts) else late,
+                         len(students))
+    days.index = pd.Index(students, name='Student')
+
+    # classes: rows by student, course and date, one run per student and course
+    pair = student.astype(np.int64) * len(courses) + course
+    order = np.argsort(pair * span + day, kind='stable')
+    pair = pair[order]
+    first = np.r_[True, pair[1:] != pair[:-1]] if len(pair) else np.zeros(0, dtype=bool)
+    classes = pattern_frame(np.cumsum(first) - 1, weekdays[order], absent[order], late[order], int(first.sum()))
+    pairs = pair[first]
+    classes.index = pd.MultiIndex.from_arrays([students[pairs // len(courses)], courses[pairs % len(courses)]],
+                                              names=['Student', 'Course'])
+    return days, classes
+
+def _weekday_text(day, count, total):
+    # e.g. 'Mon (4 of 6)', blank when there is no pattern
+    text = pd.Series(np.array([name[:3] for name in WEEKDAYS], dtype=object)[np.maximum(day, 0)], index=day.index)
+    text = text + ' (' + count.astype(str) + ' of ' + total.astype(str) + ')'
+    return text.where(day >= 0, '')
+
+@memoize('attendance')
+def pattern_report():
+    """The roster-level attendance pattern report: one row per student (Course 'All classes',
+    counted by school day) and per student and course, with a streak of at least STREAK_MIN or
+    a weekday pattern.
+
+    Returns
+    -------
+    pd.DataFrame: The PATTERN_COLUMNS of each row, current absences first.
+    """
+    days, classes = attendance_patterns()
+    days = days.reset_index().assign(Course=ALL_CLASSES)
+    df = pd.concat([days, classes.reset_index()], ignore_index=True)
+    streaks = df[['absent_now', 'absent_longest', 'late_now', 'late_longest']]
+    df = df[(streaks >= STREAK_MIN).any(axis=1) | (df['absent_day'] >= 0) | (df['late_day'] >= 0)]
+
+    report = pd.DataFrame({
+        'Student': df['Student'],
+        'Course': df['Course'],
+        'Absent Now': df['absent_now'],
+        'Longest Absence': df['absent_longest'],
+        'Late Now': df['late_now'],
+        'Longest Late': df['late_longest'],
+        'Absent On': _weekday_text(df['absent_day'], df['absent_count'], df['absent_total']),
+        'Late On': _weekday_text(df['late_day'], df['late_count'], df['late_total'])
+    })
+    report = report.sort_values(by=['Absent Now', 'Late Now', 'Longest Absence', 'Student', 'Course'],
+                                ascending=[False, False, False, True, True], kind='stable')
+    return report.reset_index(drop=True)
+
+def pattern_page(page_current=0, page_size=10, sort_by=(), filter_query=''):
+    """Retrieves one page of the attendance pattern report, after filtering and sorting, for a
+    DataTable with custom paging, sorting and filtering.
+
+    Parameters
+    ----------
+    page_current: int
+        The page to retrieve, starting from 0.
+    page_size: int
+        The number of rows per page.
+    sort_by: list
+        A list of (column, direction) pairs, direction being 'asc' or 'desc'. Current absences
+        first if empty.
+    filter_query: str
+        The filter_query of the table (see data.parse_filter_query).
+
+    Returns
+    -------
+    rows, page_count, matched: The rows on the page, as in data.frame_page.
+    """
+    return frame_page(pattern_report(), page_current, page_size, sort_by, filter_query)
+
+def student_patterns(student_name, patterns=None):
+    """Describes the student's current and longest absence and late streaks and weekday
+    patterns, overall and in each course, for the student card.
+
+    Parameter
+    ---------
+    student_name : str
+        The name of the student.
+    patterns : tuple, optional
+        Output of attendance_patterns(), if already computed.
+
+    Returns
+    -------
+    list: Short sentences, most important first. Empty if there is nothing to report.
+    """
+    days, classes = patterns if patterns is not None else attendance_patterns()
+    if student_name not in days.index:
+        return []
+
+    lines = []
+    day = days.loc[student_name]
+    if day['absent_now'] > 1:
+        lines.append(f"Absent the last {day['absent_now']} school days")
+    elif day['absent_now']:
+        lines.append("Absent the latest school day")
+    if day['late_now'] > 1:
+        lines.append(f"Late on the last {day['late_now']} school days")
+    if day['absent_longest'] >= STREAK_MIN:
+        lines.append(f"Longest absence: {day['absent_longest']} school days in a row")
+    for name, text in [('absent', 'Absent'), ('late', 'Late')]:
+        if day[f'{name}_day'] >= 0:
+            lines.append(f"{text} on {day[f'{name}_count']} of {day[f'{name}_total']} {WEEKDAYS[day[f'{name}_day']]}s")
+
+    for course, row in classes.loc[student_name].iterrows():
+        if row['absent_now'] >= STREAK_MIN:
+            lines.append(f"Missed the last {row['absent_now']} {course} classes")
+        if row['late_now'] >= STREAK_MIN:
+            lines.append(f"Late to the last {row['late_now']} {course} classes")
+        for name, text in [('absent', 'Absent from'), ('late', 'Late to')]:
+            if row[f'{name}_day'] >= 0:
+                lines.append(f"{text} {course} on {row[f'{name}_count']} of {row[f'{name}_total']} {WEEKDAYS[row[f'{name}_day']]}s")
+    return lines
+
+# latency metrics, when enabled
+instrument_module(globals(), [
+    'attendance_patterns', 'pattern_report', 'pattern_page', 'student_patterns'
+])
@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+from .config import STUDENT_TASKS, LOAD_WINDOW, LOAD_TASKS, LOAD_TESTS, TEST_PATTERN
+from .cache import memoize
+from .metrics import read_csv, instrument_module
+from .data import frame_page
+
+# DEADLINE LOAD
+# Week-by-week task load of every student, from the visible (not hidden) rows of student_tasks.csv.
+# The tasks are indexed once per version of the file, sorted by student and due date, so the tasks
+# a student has due in any window are a contiguous run of rows, found by binary search. A student
+# is overloaded when LOAD_TASKS tasks, or LOAD_TESTS tests, are due within LOAD_WINDOW days: the
+# window starting at each task is measured for the whole roster at once, and a student's
+# overlapping overloaded windows are merged into one stretch.
+CRUNCH_COLUMNS = ['Week', 'Overloaded', 'Students', 'Tasks', 'Tests', 'Courses']
+
+# student_tasks.csv columns the load is counted from
+LOAD_COLUMNS = ['Student', 'Task', 'Course', 'Due', 'Completed', 'Hidden']
+
+@memoize('tasks')
+def deadline_index():
+    """Indexes the visible tasks of every student by due date.
+
+    Returns
+    -------
+    dict : tasks (Student, Due, Task, Course, Completed and Test of each task, sorted by student
+           and due date), students (the sorted student names), student and day (each task's
+           position in students and due date as a day number, 1970-01-01 being 0) and starts
+           (the first row of each student, then the number of rows).
+    """
+    df = read_csv(STUDENT_TASKS, usecols=LOAD_COLUMNS)
+    df = df[(df['Hidden'] != True) & df['Student'].notna() & df['Due'].notna()]
+    student, students = pd.factorize(df['Student'], sort=True)
+    date, dates = pd.factorize(df['Due'])
+    day = pd.to_datetime(dates, format='ISO8601').to_numpy().astype('datetime64[D]').astype(np.int64)[date]
+    task, names = pd.factorize(df['Task'].fillna(''))
+    test = np.asarray(names.str.contains(TEST_PATTERN, case=False, regex=True), dtype=bool)[task]
+
+    order = np.lexsort((day, student))
+    student, day = student[order], day[order]
+    tasks = pd.DataFrame({
+        'Student': df['Student'].to_numpy()[order],
+        'Due': day.astype('datetime64[D]'),
+        'Task': df['Task'].to_numpy()[order],
+        'Course': df['Course'].to_numpy()[order],
+        'Completed': (df['Completed'] == True).to_numpy()[order],
+        'Test': test[order]
+    })
+    return {'tasks': tasks, 'students': pd.Index(students), 'student': student, 'day': day,
+            'starts': np.searchsorted(student, np.arange(len(students) + 1))}
+
+def overloaded_windows(student, day, test, window=LOAD_WINDOW, tasks=LOAD_TASKS, tests=LOAD_TESTS):
+    """Finds the stretches in which students have too many tasks due, for every student in one pass.
+
+    Parameters
+    ----------
+    student: np.ndarray
+        The student number of each task.
+    day: np.ndarray
+        The due date of each task, as a day number. The tasks are sorted by student and day.
+    test: np.ndarray
+        Whether each task is a test.
+    window: int
+        The length of a window, in days.
+    tasks, tests: int
+        The tasks, or tests, due within a window that overload the student.
+
+    Returns
+    -------
+    first, last : np.ndarray
+        The first and last task of each stretch of overlapping overloaded windows, in order.
+    peak : np.ndarray
+        The most tasks due within one window of each stretch.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if not len(day):
+        return empty, empty, empty
+
+    # one key for student and day, with a gap between students wider than a window: the window
+    # starting at each task ends before the first later task due too late, by binary search
+    span = int(day.max() - day.min()) + window + 1
+    key = student.astype(np.int64) * span + (day - day.min())
+    rows = np.arange(len(key))
+    ends = np.searchsorted(key, key + window, 'left')
+    count = ends - rows
+    test_count = np.r_[0, np.cumsum(test)]
+    flagged = np.flatnonzero((count >= tasks) | (test_count[ends] - test_count[rows] >= tests))
+    if not len(flagged):
+        return empty, empty, empty
+
+    # a window starting before the previous ones end continues their stretch
+    reach = np.maximum.accumulate(ends[flagged])
+    new = np.r_[True, flagged[1:] >= reach[:-1]]
+    starts = np.flatnonzero(new)
+    last = reach[np.r_[starts[1:] - 1, len(flagged) - 1]] - 1
+    return flagged[new], last, np.maximum.reduceat(count[flagged], starts)
+
+@memoize('tasks')
+def deadline_load():
+    """Counts the tasks every student has due each week and finds their overloaded stretches.
+
+    Returns
+    -------
+    weeks : pd.DataFrame
+        Indexed by Student and Week (the Monday, 'YYYY-MM-DD'), the Tasks, Tests and Open (not
+        completed) tasks due that week, and whether any of them is in an overloaded stretch.
+    windows : pd.DataFrame
+        One row per overloaded stretch, by student and date: Student, From and To (the due
+        dates of its first and last task), Tasks, Tests, Peak (the most tasks due within
+        LOAD_WINDOW days) and Courses.
+    stretch : np.ndarray
+        The stretch (row of windows) each task of deadline_index() is in, -1 if none.
+    """
+    index = deadline_index()
+    tasks, student, day = index['tasks'], index['student'], index['day']
+    test = tasks['Test'].to_numpy()
+    first, last, peak = overloaded_windows(student, day, test)
+
+    # stretches do not overlap: number the rows from each first to its last task
+    inside = np.zeros(len(day) + 1, dtype=np.int64)
+    np.add.at(inside, first, 1)
+    np.add.at(inside, last + 1, -1)
+    starts = np.zeros(len(day), dtype=np.int64)
+    starts[first] = 1
+    stretch = np.where(np.cumsum(inside)[:-1] > 0, np.cumsum(starts) - 1, -1)
+
+    # weeks start on Monday, 1970-01-01 being a Thursday
+    week = day - (day + 3) % 7
+    rows = pd.DataFrame({'Tasks': 1, 'Tests': test.astype(int), 'Open': (~tasks['Completed']).astype(int),
+                         'Overloaded': stretch >= 0})
+    weeks = rows.groupby([student, week], sort=True).agg({'Tasks': 'sum', 'Tests': 'sum', 'Open': 'sum', 'Overloaded': 'any'})
+    weeks.index = pd.MultiIndex.from_arrays(
+        [index['students'][weeks.index.get_level_values(0)],
+         pd.to_datetime(weeks.index.get_level_values(1), unit='D').strftime('%Y-%m-%d')], names=['Student', 'Week'])
+
+    # the courses of each stretch, joined by concatenating the sorted names of each stretch at once
+    inside = np.flatnonzero(stretch >= 0)
+    courses = pd.DataFrame({'stretch': stretch[inside], 'Course': tasks['Course'].to_numpy()[inside]})
+    courses = courses.dropna().drop_duplicates().sort_values(['stretch', 'Course'])
+    numbers, names = courses['stretch'].to_numpy(), courses['Course'].to_numpy(dtype=object)
+    groups = np.flatnonzero(np.r_[True, numbers[1:] != numbers[:-1]]) if len(numbers) else np.zeros(0, dtype=int)
+    separators = np.full(len(names), ', ', dtype=object)
+    separators[groups] = ''
+    courses = pd.Series(np.add.reduceat(separators + names, groups) if len(groups) else [], index=numbers[groups], dtype=object)
+    test_count = np.r_[0, np.cumsum(test)]
+    windows = pd.DataFrame({
+        'Student': tasks['Student'].to_numpy()[first],
+        'From': tasks['Due'].to_numpy()[first],
+        'To': tasks['Due'].to_numpy()[last],
+        'Tasks': last - first + 1,
+        'Tests': test_count[last + 1] - test_count[first],
+        'Peak': peak,
+        'Courses': courses.reindex(np.arange(len(first)), fill_value='').to_numpy()
+    })
+    return weeks, windows, stretch
+
+@memoize('tasks')
+def crunch_report():
+    """The roster's crunch weeks: for each week with tasks due, the students with an overloaded
+    stretch in it, the students with tasks, the tasks and tests due, and the courses with the
+    most tasks due that week in overloaded stretches.
+
+    Returns
+    -------
+    pd.DataFrame: The CRUNCH_COLUMNS of each week, most overloaded students first.
+    """
+    index = deadline_index()
+    weeks, windows, stretch = deadline_load()
+    by_week = weeks.groupby(level='Week').agg(Overloaded=('Overloaded', 'sum'), Students=('Tasks', 'size'),
+                                              Tasks=('Tasks', 'sum'), Tests=('Tests', 'sum'))
+
+    inside = np.flatnonzero(stretch >= 0)
+    day = index['day'][inside]
+    busy = pd.DataFrame({'Week': pd.to_datetime(day - (day + 3) % 7, unit='D').strftime('%Y-%m-%d'),
+                         'Course': index['tasks']['Course'].to_numpy()[inside]})
+    busy = busy.groupby(['Week', 'Course']).size().rename('count').reset_index()
+    busy = busy.sort_values(['Week', 'count', 'Course'], ascending=[True, False, True]).groupby('Week').head(3)
+    busy = (busy['Course'] + ' (' + busy['count'].astype(str) + ')').groupby(busy['Week']).agg(', '.join)
+
+    report = by_week.reset_index().assign(Courses=lambda df: df['Week'].map(busy).fillna(''))
+    report['Overloaded'] = report['Overloaded'].astype(int)
+    report = report.sort_values(by=['Overloaded', 'Week'], ascending=[False, True], kind='stable')
+    return report[CRUNCH_COLUMNS].reset_index(drop=True)
+
+def crunch_page(page_current=0, page_size=10, sort_by=(), filter_query=''):
+    """Retrieves one page of the crunch week report, after filtering and sorting, for a
+    DataTable with custom paging, sorting and filtering.
+
+    Parameters
+    ----------
+    page_current: int
+        The page to retrieve, starting from 0.
+    page_size: int
+        The number of rows per page.
+    sort_by: list
+        A list of (column, direction) pairs, direction being 'asc' or 'desc'. Most overloaded
+        students first if empty.
+    filter_query: str
+        The filter_query of the table (see data.parse_filter_query).
+
+    Returns
+    -------
+    rows, page_count, matched: The rows on the page, as in data.frame_page.
+    """
+    return frame_page(crunch_report(), page_current, page_size, sort_by, filter_query)
+
+def _dates(start, end):
+    # e.g. 'Feb 10' or 'Feb 10 - Feb 14'
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    return f"{start:%b %d}" if start == end else f"{start:%b %d} - {end:%b %d}"
+
+def student_load(student_name):
+    """The tasks the student has due each week, from the first to the last week with tasks due,
+    and their overloaded stretches, for the student task view.
+
+    Parameter
+    ---------
+    student_name : str
+        The name of the student.
+
+    Returns
+    -------
+    dict : weeks (the Mondays, 'YYYY-MM-DD'), tasks, tests and overloaded (one item per week,
+           weeks without tasks included), and windows (a sentence for each overloaded stretch).
+    """
+    weeks, windows, _ = deadline_load()
+    start, stop = weeks.index.slice_locs(student_name, student_name) if student_name else (0, 0)
+    if start == stop:
+        return {'weeks': [], 'tasks': [], 'tests': [], 'overloaded': [], 'windows': []}
+
+    student = weeks.iloc[start:stop].droplevel('Student')
+    calendar = pd.date_range(student.index[0], student.index[-1], freq='7D').strftime('%Y-%m-%d')
+    student = student.reindex(calendar, fill_value=0)
+
+    lines = []
+    names = windows['Student']
+    for row in windows.iloc[names.searchsorted(student_name, 'left'):names.searchsorted(student_name, 'right')].itertuples():
+        tests = f", {row.Tests} of them tests" if row.Tests else ''
+        lines.append(f"{row.Tasks} tasks due {_dates(row.From, row.To)}{tests} ({row.Courses})")
+    return {
+        'weeks': list(calendar),
+        'tasks': student['Tasks'].astype(int).tolist(),
+        'tests': student['Tests'].astype(int).tolist(),
+        'overloaded': student['Overloaded'].astype(bool).tolist(),
+        'windows': lines
+    }
+
+# latency metrics, when enabled
+instrument_module(globals(), [
+    'deadline_index', 'deadline_load', 'crunch_report', 'crunch_page', 'student_load'
+])
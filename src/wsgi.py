@@ -0,0 +1,44 @@
+import gc
+from .app import app, server
+from .cube import attendance_cube
+from .graphs import layout_template, chart_templates
+from .data import student_list, teacher_list, course_list, student_task_index
+from .search import student_search_index
+from .workload import deadline_load
+
+# Production entry point, served by gunicorn (see gunicorn.conf.py):
+#   gunicorn --config gunicorn.conf.py
+# With preload_app the master process imports this module once, warms the caches below and
+# then forks the workers, which share the warmed data copy-on-write.
+
+def warm_caches():
+    """Loads the data every page needs into the in-process caches: dropdown lists, the student
+    search index, the student task index, the deadline load, the attendance cube and the chart
+    templates. Each of these reads the tables once. Per student and per teacher results (schedules,
+    rosters) each read whole tables, so they are left to be cached on first use.
+
+    Returns
+    -------
+    dict: The number of students and teachers listed.
+    """
+    students = [option['value'] for option in student_list()]
+    teachers = [option['value'] for option in teacher_list()]
+    course_list()
+    student_search_index()
+    student_task_index()
+    deadline_load()
+    attendance_cube()
+    layout_template()
+    chart_templates()
+    return {'students': len(students), 'teachers': len(teachers)}
+
+# no debug tooling in production: dev tools UI, hot reload, callback graph and props checks
+app.enable_dev_tools(debug=False, dev_tools_ui=False, dev_tools_hot_reload=False, dev_tools_props_check=False,
+                     dev_tools_serve_dev_bundles=False, dev_tools_prune_errors=True)
+warm_caches()
+
+# the warmed objects are never freed, keep them out of garbage collection so the collector
+# does not touch (and copy) their memory pages in every worker
+gc.freeze()
+
+application = server
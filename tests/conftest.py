@@ -0,0 +1,71 @@
+import os
+import json
+import shutil
+import tempfile
+import pytest
+
+# The app reads its data and cache directories from the environment when src.config is
+# imported, so the tests point them at a scratch copy of data/ before anything imports src.
+REPO_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+SCRATCH = tempfile.mkdtemp(prefix='synced-support-tests-')
+os.environ['SYNCED_SUPPORT_DATA_DIR'] = os.path.join(SCRATCH, 'data')
+os.environ['SYNCED_SUPPORT_CACHE_DIR'] = os.path.join(SCRATCH, 'cache')
+os.environ['SYNCED_SUPPORT_REPORTS_DIR'] = os.path.join(SCRATCH, 'reports')
+os.environ['SYNCED_SUPPORT_CACHE'] = 'memory'
+os.environ.pop('SYNCED_SUPPORT_EVENTS_DIR', None)
+os.environ.pop('SYNCED_SUPPORT_RISK_WEIGHTS', None)
+
+def _copy_sample_data():
+    data_dir = os.environ['SYNCED_SUPPORT_DATA_DIR']
+    shutil.rmtree(data_dir, ignore_errors=True)
+    shutil.rmtree(os.environ['SYNCED_SUPPORT_CACHE_DIR'], ignore_errors=True)
+    shutil.copytree(REPO_DATA, data_dir, ignore=shutil.ignore_patterns('events'))
+    return data_dir
+
+# src reads some of the data when it is imported
+_copy_sample_data()
+
+@pytest.fixture(autouse=True)
+def sample_data():
+    """Every test starts from the sample data, with no event log, saved views or cached results."""
+    from src import cache, cube, risk
+
+    data_dir = _copy_sample_data()
+    if cache.default_cache is not None:
+        cache.default_cache.clear()
+    cube.reset_cube()
+    risk.reset_risk()
+    yield data_dir
+
+def _prop_id(id, prop):
+    return f"{json.dumps(id, separators=(',', ':'), sort_keys=True)}.{prop}"
+
+@pytest.fixture
+def run_callback():
+    """Calls a callback of the app as the browser would: run_callback(outputs, inputs, state,
+    changed) with outputs and changed as (id, property) pairs and inputs and state as (id,
+    property, value), returns the new values by (id, or the index of a pattern id, property)."""
+    from src.app import app
+
+    def run(outputs, inputs, state, changed):
+        # callback_map keys of outputs that allow duplicates end in '@<hash>'
+        names = [_prop_id(id, prop) for id, prop in outputs]
+        wanted = '..' + '...'.join(names) + '..' if len(names) > 1 else names[0]
+        key = next(name for name in app.callback_map
+                   if '...'.join(part.split('@')[0] for part in name.split('...')) == wanted)
+        body = {
+            'output': key,
+            'outputs': [{'id': id, 'property': prop} for id, prop in outputs] if len(outputs) > 1
+                       else {'id': outputs[0][0], 'property': outputs[0][1]},
+            'inputs': [{'id': id, 'property': prop, 'value': value} for id, prop, value in inputs],
+            'state': [{'id': id, 'property': prop, 'value': value} for id, prop, value in state],
+            'changedPropIds': [_prop_id(id, prop) for id, prop in changed]
+        }
+        response = app.server.test_client().post('/_dash-update-component', json=body)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return {(json.loads(id)['index'] if id.startswith('{') else id, prop): value
+                for id, props in response.get_json()['response'].items() for prop, value in props.items()}
+    return run
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
@@ -0,0 +1,72 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+def test_memoized_results_follow_writes():
+    from src.data import student_list, student_deadlines, student_task_page, save_task_changes
+    student = student_list()[0]['value']
+    rows, _ = student_deadlines(student)
+    student_task_page(student, page_size=100)
+    save_task_changes(student, hidden=rows[:1])
+    assert student_deadlines(student)[0] == rows[1:]
+    assert len(student_task_page(student, page_size=100)[0]) == len(rows) - 1
+
+def test_memoized_results_are_copies():
+    from src.cache import memoize, LRUCache
+    calls = []
+
+    @memoize('notes', cache=LRUCache())
+    def build():
+        calls.append(1)
+        return {'frame': pd.DataFrame({'a': [1, 2]}), 'rows': [{'a': 1}], 'array': np.arange(3)}
+
+    first = build()
+    first['frame'].loc[0, 'a'] = 10
+    first['frame']['b'] = 0
+    first['rows'][0]['a'] = 10
+    first['rows'].append({'a': 2})
+    with pytest.raises(ValueError):
+        first['array'][0] = 10
+
+    second = build()
+    assert len(calls) == 1
+    assert second['frame'].to_dict('list') == {'a': [1, 2]}
+    assert second['rows'] == [{'a': 1}]
+    assert second['array'].tolist() == [0, 1, 2]
+
+def test_frames_are_copied_deeply_without_copy_on_write(monkeypatch):
+    from src import cache
+    frame = pd.DataFrame({'a': [1, 2]})
+    assert np.shares_memory(cache._copy(frame)['a'].to_numpy(), frame['a'].to_numpy()) == cache.COPY_ON_WRITE
+    # as on pandas 2 with the option off, where a shallow copy shares its data
+    monkeypatch.setattr(cache, 'COPY_ON_WRITE', False)
+    assert not np.shares_memory(cache._copy(frame)['a'].to_numpy(), frame['a'].to_numpy())
+
+def test_file_cache_prunes_every_few_writes(tmp_path):
+    from src.cache import FileCache
+    cache = FileCache(str(tmp_path), maxsize=4, prune_every=3)
+    for key in range(5):
+        cache.set(key, key)
+    # pruned after the third write only
+    assert len(os.listdir(tmp_path)) == 5
+    cache.set(5, 5)
+    assert len(os.listdir(tmp_path)) == 4
+    assert cache.get(5) == (True, 5)
+
+def test_file_cache_keeps_recent_entries_in_memory(tmp_path):
+    from src.cache import FileCache
+    cache = FileCache(str(tmp_path), memory=1)
+    cache.set('a', 1)
+    for entry in os.scandir(tmp_path):
+        os.remove(entry.path)
+    assert cache.get('a') == (True, 1)
+
+    # other processes read the file, and keep what they read
+    cache.set('b', 2)
+    other = FileCache(str(tmp_path), memory=1)
+    assert other.get('b') == (True, 2)
+    for entry in os.scandir(tmp_path):
+        os.remove(entry.path)
+    assert other.get('b') == (True, 2)
+    assert cache.get('a') == (False, None)
@@ -0,0 +1,21 @@
+import pytest
+from src.config import parse_weights
+
+DEFAULTS = {'absence': 3, 'overdue': 2}
+
+def test_parse_weights_over_defaults(monkeypatch):
+    monkeypatch.setenv('WEIGHTS', ' absence = 2, ,overdue=0.5')
+    assert parse_weights('WEIGHTS', DEFAULTS) == {'absence': 2.0, 'overdue': 0.5}
+    monkeypatch.delenv('WEIGHTS')
+    assert parse_weights('WEIGHTS', DEFAULTS) == DEFAULTS
+
+@pytest.mark.parametrize('text, message', [
+    ('absense=2', "WEIGHTS: unknown name 'absense' in 'absense=2', expected one of absence, overdue"),
+    ('absence=high', "WEIGHTS: 'absence=high' is not name=number"),
+    ('absence', "WEIGHTS: 'absence' is not name=number"),
+])
+def test_parse_weights_rejects_bad_items(monkeypatch, text, message):
+    monkeypatch.setenv('WEIGHTS', text)
+    with pytest.raises(ValueError) as error:
+        parse_weights('WEIGHTS', DEFAULTS)
+    assert str(error.value) == message
@@ -0,0 +1,52 @@
+import pandas as pd
+
+def _attendance():
+    from src.config import ATTEND_DATA
+    return pd.read_csv(ATTEND_DATA)
+
+def _assert_cubes_equal(cube, expected):
+    for key in ['attendance', 'work']:
+        pd.testing.assert_series_equal(cube[key], expected[key], check_dtype=False, check_names=False)
+
+def test_cube_slices_nothing_for_no_student():
+    from src.cube import attendance_cube, cube_work, cube_attendance
+    cube = attendance_cube()
+    assert cube_work(cube, [None]).empty
+    assert cube_attendance(cube, [None]).empty
+
+def test_adding_rows_equals_building_from_all():
+    from src.cube import build_cube, add_to_cube
+    df = _attendance()
+    # a new student, course, attendance code and work subject, and more of existing ones
+    new = pd.DataFrame([
+        {'Student': 'Zoe', 'Course': 'Support 9', 'Attendance': 'P', 'Work': 'Math'},
+        {'Student': 'Alice', 'Course': 'Support 9', 'Attendance': 'X', 'Work': 'Latin'},
+        {'Student': 'Alice', 'Course': 'Drama 9', 'Attendance': 'A', 'Work': None},
+    ])
+    full = pd.concat([df, new], ignore_index=True)
+
+    half = len(df) // 2
+    cube = add_to_cube(build_cube(full.iloc[:half]), full.iloc[half:])
+    _assert_cubes_equal(cube, build_cube(full))
+    assert add_to_cube(cube, full.iloc[:0]) is cube
+
+def test_attendance_cube_after_saves_equals_building_from_the_file(monkeypatch):
+    from src import cube as cube_module
+    from src.data import save_workhabits_data
+    applied = []
+    add_to_cube = cube_module.add_to_cube
+    monkeypatch.setattr(cube_module, 'add_to_cube', lambda cube, rows: applied.append(len(rows)) or add_to_cube(cube, rows))
+
+    cube_module.attendance_cube()
+    save_workhabits_data([{'Student': 'Alice', 'Workhabit Score': '0', 'Focus': 'Latin', 'Support Attendance': 'A'},
+                          {'Student': 'Bob', 'Workhabit Score': '4', 'Focus': 'Math', 'Support Attendance': 'P'}], '2099-01-01')
+    cube = cube_module.attendance_cube()
+    assert applied == [2]
+    _assert_cubes_equal(cube, cube_module.build_cube(_attendance()))
+
+    # a new process catches up from the saved counts the same way, replaying every row since
+    # they were saved
+    save_workhabits_data([{'Student': 'Alice', 'Workhabit Score': '3', 'Focus': 'Math', 'Support Attendance': 'L'}], '2099-01-02')
+    cube_module.reset_cube(saved=False)
+    _assert_cubes_equal(cube_module.attendance_cube(), cube_module.build_cube(_attendance()))
+    assert applied == [2, 3]
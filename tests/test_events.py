@@ -0,0 +1,90 @@
+import time
+import pandas as pd
+from datetime import datetime
+
+def _notes():
+    from src.config import STUDENT_NOTE
+    return pd.read_csv(STUDENT_NOTE)
+
+def test_logged_write_keeps_the_table_before_and_the_event():
+    from src import events
+    from src.data import save_student_note
+    before = _notes()
+    save_student_note('Eva', 'Math test moved to Friday')
+
+    pd.testing.assert_frame_equal(pd.read_csv(events._base_path('notes')), before)
+    logged, end = events.read_events(0, 'notes')
+    assert end == events.log_position()
+    assert [(event['kind'], event['rows']) for event in logged] == \
+           [('note', [{'Student': 'Eva', 'Note': 'Math test moved to Friday'}])]
+
+def test_table_at_replays_the_log_up_to_a_time():
+    from src.events import table_at
+    from src.data import save_student_note
+    before = _notes()
+    save_student_note('Eva', 'First note')
+    time.sleep(0.01)
+    between = datetime.now()
+    time.sleep(0.01)
+    save_student_note('Zoe', 'Second note')
+
+    pd.testing.assert_frame_equal(table_at('notes'), _notes())
+    at = table_at('notes', between)
+    assert at.set_index('Student').loc['Eva', 'Note'] == 'First note'
+    assert 'Zoe' not in at['Student'].values
+    assert len(at) == len(before)
+
+def test_refresh_view_replays_writes_and_rebuilds_after_other_edits():
+    from src.config import STUDENT_NOTE
+    from src.events import refresh_view
+    from src.data import save_student_note
+    built, applied = [], []
+
+    def build(df):
+        built.append(len(df))
+        return dict(zip(df['Student'], df['Note']))
+
+    def apply(data, rows):
+        applied.append(len(rows))
+        return dict(data, **dict(zip(rows['Student'], rows['Note'])))
+
+    def refresh(view):
+        return refresh_view('test-notes', 'notes', view, build, apply)
+
+    view = refresh(None)
+    assert built == [len(_notes())] and refresh(view) is view
+
+    # a write through the app is applied from the log, and saved views catch up the same way
+    save_student_note('Eva', 'Caught up')
+    view = refresh(view)
+    assert (built, applied) == ([len(_notes())], [1])
+    assert view['data']['Eva'] == 'Caught up'
+    assert refresh(None)['data']['Eva'] == 'Caught up'
+    assert len(built) == 1
+
+    # the file edited outside the app, the view is built again
+    _notes().assign(Note='Edited by hand').to_csv(STUDENT_NOTE, index=False)
+    view = refresh(view)
+    assert len(built) == 2
+    assert set(view['data'].values()) == {'Edited by hand'}
+
+def test_new_deadlines_and_notes_reach_the_log_and_the_feed():
+    from src.config import STUDENT_TASKS
+    from src.events import table_at
+    from src.feed import changes_since, feed_versions
+    from src.data import save_deadlines_data, save_student_note
+    before, versions = pd.read_csv(STUDENT_TASKS), feed_versions()
+    save_deadlines_data([{'Task': 'Lab 9', 'Course': 'Science 8', 'Block': '1-4', 'Teacher': 'Ms. Johnson', 'Due': '2024-12-20'}])
+    save_student_note('Eva', 'Lab moved')
+
+    # the new tasks are added to the end of the table, and replay to the same table
+    after = pd.read_csv(STUDENT_TASKS)
+    added = after.iloc[len(before):]
+    pd.testing.assert_frame_equal(after.iloc[:len(before)], before)
+    assert len(added) and (added['Task'] == 'Lab 9').all()
+    pd.testing.assert_frame_equal(table_at('tasks'), after, check_dtype=False)
+
+    (tasks,), _ = changes_since('tasks', versions['tasks'], feed_versions()['tasks'])
+    assert [row['Student'] for row in tasks['rows']] == added['Student'].tolist()
+    (notes,), _ = changes_since('notes', versions['notes'], feed_versions()['notes'])
+    assert notes['rows'] == [{'Student': 'Eva', 'Note': 'Lab moved'}]
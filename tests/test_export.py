@@ -0,0 +1,56 @@
+import io
+import pandas as pd
+import pytest
+
+TEACHER = 'Ms. Johnson'
+
+def _client():
+    from src.app import app
+    return app.server.test_client()
+
+def _add_student(name):
+    # a student whose name needs escaping in XML, in one of the teacher's classes
+    from src.config import STUDENT_DATA
+    df = pd.read_csv(STUDENT_DATA)
+    row = df[df['Teacher'] == TEACHER].iloc[[0]].assign(Student=name)
+    pd.concat([df, row], ignore_index=True).to_csv(STUDENT_DATA, index=False)
+
+def test_xlsx_export_matches_the_source_rows():
+    from src.config import STUDENT_DATA
+    from src.export import PARTS, part_rows
+    _add_student('Zoe & <Co>')
+    response = _client().get('/export', query_string={'teacher': TEACHER, 'start': '2024-01-01', 'end': '2025-12-31'})
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="Ms._Johnson-')
+    sheets = pd.read_excel(io.BytesIO(response.data), sheet_name=None)
+    assert list(sheets) == ['Roster', 'Tasks', 'Attendance']
+
+    # the roster, straight from student.csv
+    students = pd.read_csv(STUDENT_DATA)
+    roster = students[students['Teacher'] == TEACHER].sort_values(by=['Course', 'Block', 'Student'], kind='stable')
+    pd.testing.assert_frame_equal(sheets['Roster'], roster[PARTS['roster']].reset_index(drop=True))
+    assert 'Zoe & <Co>' in sheets['Roster']['Student'].values
+
+    for part, sheet in zip(PARTS, sheets.values()):
+        expected = pd.concat(part_rows(part, TEACHER, '2024-01-01', '2025-12-31'), ignore_index=True)
+        assert len(sheet) == len(expected) > 0
+        pd.testing.assert_frame_equal(sheet, expected, check_dtype=False)
+
+def test_csv_export_matches_the_source_rows():
+    from src.export import part_rows
+    response = _client().get('/export', query_string={'teacher': TEACHER, 'format': 'csv', 'part': 'tasks', 'end': '2024-12-31'})
+    assert response.status_code == 200
+    df = pd.read_csv(io.StringIO(response.get_data(as_text=True)))
+    expected = pd.concat(part_rows('tasks', TEACHER, None, '2024-12-31'), ignore_index=True)
+    pd.testing.assert_frame_equal(df, expected)
+    assert (df['Due'] <= '2024-12-31').all()
+
+@pytest.mark.parametrize('query', [
+    {'start': '2024-1-1'},
+    {'end': 'tomorrow'},
+    {'format': 'pdf'},
+    {'format': 'csv', 'part': 'grades'},
+])
+def test_bad_export_parameters(query):
+    response = _client().get('/export', query_string=dict(query, teacher=TEACHER))
+    assert response.status_code == 400
@@ -0,0 +1,42 @@
+import os
+
+def test_changes_since_returns_newer_entries():
+    from src.feed import publish, changes_since
+    first = publish('tasks', [{'Student': 'Alice', 'Task': 'Essay'}])
+    second = publish('tasks', [{'Student': 'Bob', 'Task': 'Quiz'}])
+    third = publish('tasks', [{'Student': 'Cara', 'Task': 'Lab'}])
+
+    entries, complete = changes_since('tasks', first, third)
+    assert complete
+    assert [entry['version'] for entry in entries] == [second, third]
+    assert entries[0]['rows'] == [{'Student': 'Bob', 'Task': 'Quiz'}]
+    # entries newer than latest are left for the next poll
+    assert [entry['version'] for entry in changes_since('tasks', first, second)[0]] == [second]
+    assert changes_since('tasks', third, third) == ([], True)
+
+def test_feed_starts_again_with_the_last_entries(monkeypatch):
+    from src import feed
+    monkeypatch.setattr(feed, 'FEED_SIZE', 3)
+    versions = [feed.publish('deadlines', [{'Task': str(i)}]) for i in range(7)]
+
+    # the sixth publish dropped the oldest three entries
+    assert os.path.getsize(feed._index_path('deadlines')) == 4 * feed.INDEX_RECORD.size
+    entries, complete = feed.changes_since('deadlines', versions[2], versions[-1])
+    assert complete
+    assert [entry['rows'][0]['Task'] for entry in entries] == ['3', '4', '5', '6']
+    assert feed.changes_since('deadlines', versions[0], versions[-1])[1] is False
+
+def test_busy_worker_answers_polls_straight_away(monkeypatch):
+    from src import feed
+    from src.app import app
+    versions = feed.feed_versions()
+    client = app.server.test_client()
+
+    monkeypatch.setattr(feed, '_long_polls', feed.FEED_LONG_POLLS)
+    result = client.get('/changes', query_string=versions).get_json()
+    assert result == {'versions': versions, 'changes': {}, 'reset': [], 'retry': feed.FEED_RETRY}
+
+    monkeypatch.setattr(feed, '_long_polls', 0)
+    result = client.get('/changes', query_string=dict(versions, timeout=0)).get_json()
+    assert 'retry' not in result
+    assert feed._long_polls == 0
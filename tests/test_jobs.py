@@ -0,0 +1,24 @@
+import os
+import subprocess
+import multiprocess
+
+def _write(store, key):
+    store.set(key, os.getpid())
+
+def test_process_cache_opens_the_store_in_each_process(tmp_path):
+    from src.jobs import ProcessCache
+    store = ProcessCache(str(tmp_path))
+    parent_cache = store.cache()
+    process = multiprocess.Process(target=_write, args=(store, 'job'))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert store.get('job') == process.pid
+    assert store.cache() is parent_cache
+
+def test_terminate_job_kills_the_job(tmp_path):
+    from src.jobs import JobManager
+    manager = JobManager(str(tmp_path))
+    job = subprocess.Popen(['sleep', '30'])
+    manager.terminate_job(job.pid)
+    assert job.wait(5) == -9
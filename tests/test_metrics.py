@@ -0,0 +1,65 @@
+import os
+import json
+import subprocess
+import sys
+
+def _snapshot(calls, hits):
+    key = json.dumps(['synced_support_csv_reads_total', [['file', 'student.csv']]])
+    return {'histograms': {}, 'counters': {key: calls}, 'cache': {'student_list': {'hits': hits, 'misses': 1}}}
+
+def _write(directory, name, snapshot):
+    with open(os.path.join(directory, name), 'w') as f:
+        json.dump(snapshot, f)
+
+def _exited_pid():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+def test_exited_workers_are_folded_into_one_file(tmp_path, monkeypatch):
+    from src import metrics
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_snapshot', lambda: _snapshot(1, 1))
+    first, second = _exited_pid(), _exited_pid()
+    _write(tmp_path, f'{first}.json', _snapshot(2, 3))
+    _write(tmp_path, f'{second}.json', _snapshot(4, 5))
+    metrics._flush(force=True)
+
+    merged = metrics._merged()
+    assert list(merged['counters'].values()) == [7]
+    assert merged['cache'] == {'student_list': {'hits': 9, 'misses': 3}}
+    assert sorted(os.listdir(tmp_path)) == sorted([f'{os.getpid()}.json', metrics.EXITED, 'exited.lock'])
+
+    # counted once, however often it is scraped
+    assert metrics._merged() == merged
+
+def test_retire_workers_folds_the_given_workers(tmp_path, monkeypatch):
+    from src import metrics
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    _write(tmp_path, '123.json', _snapshot(2, 0))
+    _write(tmp_path, '456.json', _snapshot(3, 0))
+    metrics.retire_workers([123])
+    assert not (tmp_path / '123.json').exists()
+    assert list(json.loads((tmp_path / metrics.EXITED).read_text())['counters'].values()) == [2]
+    metrics.retire_workers([123, 456])
+    assert list(json.loads((tmp_path / metrics.EXITED).read_text())['counters'].values()) == [5]
+
+def test_only_entry_points_are_timed(tmp_path):
+    # metrics are switched on when src is imported, so in a new process
+    script = '''
+from src import data, graphs, risk, streaks, workload, search, events, reports
+timed = lambda func: func.__code__.co_qualname == 'timed.<locals>.wrapper'
+assert timed(data.student_task_page) and timed(streaks.pattern_page) and timed(risk.roster_risk)
+assert not any(timed(func) for func in [data.frame_page, data.parse_filter_query, data.write_csv, streaks.run_lengths,
+                                        streaks.group_streaks, workload.overloaded_windows, events.logged_write])
+from src import metrics
+metrics._process_state()['histograms'].clear()
+data.student_list()
+data.frame_page(data.pd.DataFrame({'a': [1]}), 0, 10)
+names = [key for key in metrics._process_state()['histograms'] if 'synced_support_function_seconds' in key]
+assert len(names) == 1 and 'student_list' in names[0], names
+'''
+    env = dict(os.environ, SYNCED_SUPPORT_METRICS='1', SYNCED_SUPPORT_CACHE_DIR=str(tmp_path))
+    result = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
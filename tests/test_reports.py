@@ -0,0 +1,21 @@
+import os
+import pandas as pd
+
+def test_report_files_tell_clashing_names_apart():
+    from src.reports import report_files
+    files = report_files(["O'Neil A", 'O Neil A', 'o neil a', 'O_Neil_A_2', 'Bob'])
+    assert files == {"O'Neil A": 'O_Neil_A.html', 'O Neil A': 'O_Neil_A_2.html', 'o neil a': 'o_neil_a_3.html',
+                     'O_Neil_A_2': 'O_Neil_A_2_2.html', 'Bob': 'Bob.html'}
+
+def test_run_reports_writes_one_file_per_student(tmp_path):
+    from src.reports import run_reports
+    from src.data import student_list
+    students = [option['value'] for option in student_list()][:3]
+    timings = run_reports(students, str(tmp_path), workers=1)
+    assert list(timings['Student']) == students
+    assert (timings['Error'] == '').all()
+    for name in timings['File']:
+        with open(tmp_path / name, encoding='utf-8') as f:
+            assert '<svg' in f.read()
+    assert os.path.exists(tmp_path / 'index.html')
+    assert len(pd.read_csv(tmp_path / 'timings.csv')) == 3
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+def _attendance(rows):
+    return pd.DataFrame(rows, columns=['Student', 'Date', 'Course', 'Attendance', 'Habit'])
+
+def _tasks(rows):
+    return pd.DataFrame(rows, columns=['Student', 'Task', 'Course', 'Teacher', 'Block', 'Due', 'Completed', 'Hidden'])
+
+ATTENDANCE = _attendance([
+    # Ann attends on the 1st, misses both classes on the 2nd and the 3rd
+    ('Ann', '2025-01-01', 'Math 9', 'P', None),
+    ('Ann', '2025-01-01', 'Support 9', 'P', 'On-task'),
+    ('Ann', '2025-01-02', 'Math 9', 'A', None),
+    ('Ann', '2025-01-02', 'Support 9', 'AE', None),
+    ('Ann', '2025-01-03', 'Math 9', 'A', None),
+    # Ben is late on the 2nd, which counts as attended
+    ('Ben', '2025-01-01', 'Support 9', 'A', 'Off-task'),
+    ('Ben', '2025-01-02', 'Support 9', 'L', 'Mostly On-task'),
+])
+
+def test_attendance_signals_by_hand():
+    from src.risk import attendance_signals
+    signals = attendance_signals(ATTENDANCE)
+    assert signals.loc['Ann', ['classes', 'missed', 'days', 'streak', 'habit_count']].tolist() == [5, 3, 3, 2, 1]
+    assert signals.loc['Ben', ['classes', 'missed', 'days', 'streak', 'habit_count']].tolist() == [2, 1, 2, 0, 2]
+    # the latest score first
+    assert signals.loc['Ben', ['h0', 'h1']].tolist() == [3, 0]
+    assert signals.loc['Ann', 'last_date'] == pd.Timestamp('2025-01-03')
+
+def test_add_attendance_equals_counting_all_rows():
+    from src.risk import attendance_signals, add_attendance
+    new = _attendance([('Ann', '2025-01-03', 'Support 9', 'A', None),
+                       ('Ann', '2025-01-06', 'Support 9', 'A', 'Off-task'),
+                       ('Ben', '2025-01-06', 'Support 9', 'P', 'On-task'),
+                       ('Cal', '2025-01-06', 'Support 9', 'A', None)])
+    added = add_attendance(attendance_signals(ATTENDANCE), new)
+    rebuilt = attendance_signals(pd.concat([ATTENDANCE, new], ignore_index=True))
+    pd.testing.assert_frame_equal(added.sort_index(), rebuilt, check_dtype=False)
+    assert added.loc['Ann', 'streak'] == 3
+
+    # rows before a day already counted change the streaks, all rows are counted again
+    assert add_attendance(attendance_signals(ATTENDANCE), ATTENDANCE.iloc[:1]) is None
+
+def test_open_tasks_keep_tasks_that_differ_only_by_due_date():
+    from src.risk import open_tasks, update_open_tasks
+    tasks = _tasks([('Ann', 'Quiz', 'Math 9', 'Mr. A', '1-1', '2025-01-10', False, False),
+                    ('Ann', 'Quiz', 'Math 9', 'Mr. A', '1-1', '2025-02-10', False, False),
+                    ('Ben', 'Quiz', 'Math 9', 'Mr. A', '1-1', '2025-01-10', True, False)])
+    index = open_tasks(tasks)
+    assert len(index) == 2
+
+    # the first quiz is completed, the second stays open; the logged rows have ISO timestamps
+    changed = tasks.iloc[[0, 2]].assign(Completed=[True, False], Due=['2025-01-10T00:00:00', '2025-01-10T00:00:00'])
+    updated = update_open_tasks(index, changed)
+    full = tasks.assign(Completed=[True, False, False])
+    pd.testing.assert_series_equal(updated.sort_index(), open_tasks(full).sort_index())
+
+def test_risk_scores_by_hand():
+    from src.risk import risk_scores, SIGNALS
+    values = pd.DataFrame({'absence': [0.1, 0.5], 'streak': [0, 10], 'habit_avg': [4, 1],
+                           'habit_change': [1, -1], 'overdue': [0, 2]}, index=['Ann', 'Ben'])
+    limits = {'absence': 0.2, 'streak': 5, 'habits': 3, 'trend': 2, 'overdue': 4}
+    weights = dict.fromkeys(SIGNALS, 1)
+    scores = risk_scores(values, weights, limits)
+    # Ann: absence 0.5, Ben: absence 1, streak 1, habits 1, trend 0.5, overdue 0.5
+    assert scores.tolist() == pytest.approx([10, 80])
+
+def test_roster_risk_on_sample_data():
+    from src.config import STUDENT_DATA
+    from src.risk import roster_risk, RISK_COLUMNS
+    table = roster_risk()
+    assert list(table.columns) == RISK_COLUMNS
+    assert sorted(table['Student']) == sorted(pd.read_csv(STUDENT_DATA)['Student'].unique())
+    assert table['Risk'].between(0, 100).all()
+    assert table['Risk'].is_monotonic_decreasing
+
+def test_roster_risk_after_saves_equals_rebuilt():
+    from src.config import STUDENT_TASKS
+    from src.risk import roster_risk, reset_risk
+    from src.data import save_workhabits_data, save_task_changes
+
+    # a task given twice with different due dates, both overdue
+    df = pd.read_csv(STUDENT_TASKS)
+    row = df[(df['Student'] == 'Alice') & (df['Completed'] != True) & (df['Hidden'] != True)].iloc[0]
+    twice = pd.DataFrame([row.to_dict() | {'Due': '2000-01-01'}, row.to_dict() | {'Due': '2000-02-01'}])
+    pd.concat([df, twice], ignore_index=True).to_csv(STUDENT_TASKS, index=False)
+    before = roster_risk()
+
+    save_workhabits_data([{'Student': 'Alice', 'Workhabit Score': '0', 'Focus': 'Math', 'Support Attendance': 'A'}], '2099-01-01')
+    save_task_changes('Alice', completed=[{**row[['Task', 'Course', 'Teacher', 'Block']].to_dict(), 'Completed': True}])
+    updated = roster_risk().copy()
+    assert not updated.equals(before)
+
+    reset_risk()
+    pd.testing.assert_frame_equal(updated, roster_risk())
@@ -0,0 +1,39 @@
+import pandas as pd
+
+def test_match_student_takes_exact_names_only():
+    from src.search import match_student
+    assert match_student('Alice') == 'Alice'
+    assert match_student('  aLICE ') == 'Alice'
+    # a prefix or the letters of one name is no match
+    assert match_student('Alic') is None
+    assert match_student('Alce') is None
+    assert match_student('') is None
+
+def test_match_student_rejects_names_differing_in_case():
+    from src.config import STUDENT_DATA
+    from src.search import match_student
+    df = pd.read_csv(STUDENT_DATA)
+    pd.concat([df, df[df['Student'] == 'Alice'].assign(Student='ALICE')]).to_csv(STUDENT_DATA, index=False)
+    assert match_student('alice') is None
+    assert match_student('ALICE') is None
+
+def test_search_endpoint_returns_options():
+    from src.app import app
+    response = app.server.test_client().get('/students/search?q=ali')
+    assert response.get_json()[0] == {'label': 'Alice', 'value': 'Alice'}
+
+def test_unknown_names_are_not_saved(run_callback):
+    from src.config import ATTEND_DATA
+    before = pd.read_csv(ATTEND_DATA)
+    rows = [{'Student': 'alice', 'Workhabit Score': '3', 'Focus': 'Math', 'Support Attendance': 'P'},
+            {'Student': 'Alce', 'Workhabit Score': '2', 'Focus': 'Art', 'Support Attendance': 'P'}]
+    response = run_callback(
+        [({'type': 'user-input', 'index': 'workhabit-table'}, 'rowData'), ({'type': 'dynamic-output', 'index': 'output-msg'}, 'children')],
+        [({'type': 'dynamic-input', 'index': 'add-row-btn'}, 'n_clicks', 0),
+         ({'type': 'dynamic-input', 'index': 'submit-btn'}, 'n_clicks', 1),
+         ({'type': 'dynamic-input', 'index': 'date-picker'}, 'date', '2099-01-01'),
+         ({'type': 'user-input', 'index': 'workhabit-table'}, 'cellValueChanged', None)],
+        [({'type': 'user-input', 'index': 'workhabit-table'}, 'rowData', rows)],
+        [({'type': 'dynamic-input', 'index': 'submit-btn'}, 'n_clicks')])
+    assert response['output-msg', 'children'] == 'Unknown student: Alce (did you mean Alice?).'
+    assert len(pd.read_csv(ATTEND_DATA)) == len(before)
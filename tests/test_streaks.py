@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+def test_run_lengths_by_hand():
+    from src.streaks import run_lengths
+    groups = np.array([0, 0, 0, 0, 1, 1, 1, 2, 2])
+    flags = np.array([1, 1, 0, 1, 1, 1, 1, 0, 1], dtype=bool)
+    # runs restart at each group, group 1 does not go on from group 0's last row
+    assert run_lengths(groups, flags).tolist() == [1, 2, 0, 1, 1, 2, 3, 0, 1]
+    assert run_lengths(np.zeros(0, dtype=int), np.zeros(0, dtype=bool)).tolist() == []
+
+def test_group_streaks_by_hand():
+    from src.streaks import group_streaks
+    groups = np.array([0, 0, 0, 0, 0, 1, 1, 2])
+    flags = np.array([1, 1, 1, 0, 1, 0, 0, 1], dtype=bool)
+    current, longest = group_streaks(groups, flags)
+    assert current.tolist() == [1, 0, 1]
+    assert longest.tolist() == [3, 0, 1]
+
+def test_weekday_patterns_by_hand(monkeypatch):
+    from src import streaks
+    monkeypatch.setattr(streaks, 'PATTERN_MIN', 3)
+    monkeypatch.setattr(streaks, 'PATTERN_SHARE', 0.5)
+    monkeypatch.setattr(streaks, 'PATTERN_RATIO', 2)
+    # group 0: absent 3 of 4 Mondays, 1 of 4 Tuesdays; group 1: absent 2 of 2 Fridays (too few)
+    groups = np.array([0] * 8 + [1] * 2)
+    weekdays = np.array([0] * 4 + [1] * 4 + [4] * 2)
+    flags = np.array([1, 1, 1, 0, 1, 0, 0, 0, 1, 1], dtype=bool)
+    day, count, total = streaks.weekday_patterns(groups, weekdays, flags, 2)
+    assert day.tolist() == [0, -1]
+    assert count[0] == 3 and total[0] == 4
+
+    # 3 of 4 Mondays against 3 of 4 Tuesdays is no pattern
+    flags = np.array([1, 1, 1, 0, 1, 1, 1, 0, 0, 0], dtype=bool)
+    assert streaks.weekday_patterns(groups, weekdays, flags, 2)[0].tolist() == [-1, -1]
+
+def test_attendance_patterns_by_hand():
+    from src.streaks import attendance_patterns
+    # Mon 6th to Fri 10th January 2025: Ann misses every class from Wednesday, and is late to
+    # Math on Monday and Tuesday
+    rows = [('Ann', f'2025-01-{day:02d}', course, code) for day, codes in
+            [(6, 'LP'), (7, 'LP'), (8, 'AA'), (9, 'AA'), (10, 'AP')] for course, code in zip(['Math 9', 'Art 9'], codes)]
+    attendance = pd.DataFrame(rows, columns=['Student', 'Date', 'Course', 'Attendance'])
+    days, classes = attendance_patterns(attendance)
+    assert days.loc['Ann', ['absent_now', 'absent_longest', 'late_now', 'late_longest']].tolist() == [0, 2, 0, 2]
+    assert classes.loc[('Ann', 'Math 9'), ['absent_now', 'absent_longest', 'late_longest']].tolist() == [3, 3, 2]
+    assert classes.loc[('Ann', 'Art 9'), ['absent_now', 'absent_longest']].tolist() == [0, 2]
@@ -0,0 +1,89 @@
+import json
+import pandas as pd
+
+def _id(index, kind='dynamic-output'):
+    return {'type': kind, 'index': index}
+
+def _task_page(student):
+    from src.data import student_task_page
+    rows, completed, _ = student_task_page(student, page_size=100)
+    keys = [json.dumps([row[col] for col in ['Task', 'Course', 'Teacher', 'Block']]) for row in rows]
+    return rows, completed, keys
+
+def _track(run_callback, rows, selected_rows, loaded, edits):
+    response = run_callback(
+        [(_id('student-task-edits'), 'data')],
+        [(_id('student-task-table', 'dynamic-input'), 'data', rows),
+         (_id('student-task-table', 'dynamic-input'), 'selected_rows', selected_rows)],
+        [(_id('student-task-keys'), 'data', loaded), (_id('student-task-edits'), 'data', edits)],
+        [(_id('student-task-table', 'dynamic-input'), 'selected_rows')])
+    return response['student-task-edits', 'data']
+
+def _save(run_callback, edits, student):
+    outputs = [(_id('output-student-task'), 'children'), (_id('student-task-edits'), 'data'), (_id('student-task-saved'), 'data')]
+    response = run_callback(
+        outputs,
+        [(_id('save-student-tasks', 'dynamic-input'), 'n_clicks', 1)],
+        [(_id('student-task-edits'), 'data', edits), (_id('student-task-saved'), 'data', 0),
+         (_id('select-item', 'dynamic-input'), 'value', student)],
+        [(_id('save-student-tasks', 'dynamic-input'), 'n_clicks')])
+    return response['output-student-task', 'children']
+
+def _completed(student):
+    from src.config import STUDENT_TASKS
+    df = pd.read_csv(STUDENT_TASKS)
+    df = df[(df['Student'] == student) & (df['Hidden'] != True)]
+    return dict(zip(df['Task'] + '|' + df['Course'], df['Completed'] == True))
+
+def _student():
+    from src.data import student_list
+    return next(option['value'] for option in student_list() if len(_task_page(option['value'])[0]) >= 3)
+
+def test_only_rows_changed_since_loading_are_edits(run_callback):
+    student = _student()
+    rows, completed, keys = _task_page(student)
+    loaded = dict(zip(keys, completed))
+    selected = [i for i, done in enumerate(completed) if done]
+
+    # viewing the page, or checking a row and unchecking it again, is no edit
+    edits = _track(run_callback, rows, selected, loaded, {'hidden': [], 'completed': {}})
+    assert edits == {'hidden': [], 'completed': {}}
+
+    toggled = sorted(set(selected) ^ {0})
+    edits = _track(run_callback, rows, toggled, loaded, edits)
+    assert edits == {'hidden': [], 'completed': {keys[0]: not completed[0]}}
+    assert _track(run_callback, rows, selected, loaded, edits) == {'hidden': [], 'completed': {}}
+
+    # a deleted row is hidden, not completed
+    edits = _track(run_callback, rows[1:], [i - 1 for i in toggled if i], loaded, edits)
+    assert edits == {'hidden': [keys[0]], 'completed': {}}
+
+def test_saving_keeps_other_sessions_changes(run_callback):
+    student = _student()
+    rows, completed, keys = _task_page(student)
+    loaded = dict(zip(keys, completed))
+    selected = [i for i, done in enumerate(completed) if done]
+    before = _completed(student)
+
+    # this session checks the first task, while another one toggles the second and saves first
+    edits = _track(run_callback, rows, sorted(set(selected) ^ {0}), loaded, {'hidden': [], 'completed': {}})
+    from src.data import save_task_changes
+    other = dict(rows[1], Completed=not completed[1])
+    save_task_changes(student, completed=[other])
+
+    assert 'Changes saved successfully' in _save(run_callback, edits, student)
+    after = _completed(student)
+    first, second = (f"{row['Task']}|{row['Course']}" for row in rows[:2])
+    assert after[first] == (not before[first])
+    assert after[second] == (not before[second])
+    assert {key: value for key, value in after.items() if key not in (first, second)} == \
+           {key: value for key, value in before.items() if key not in (first, second)}
+
+def test_save_task_changes_hides_only_the_given_rows():
+    from src.data import save_task_changes
+    student = _student()
+    rows, _, _ = _task_page(student)
+    diff = save_task_changes(student, hidden=[rows[0]])
+    assert diff['hidden'] == [{col: rows[0][col] for col in ['Task', 'Course', 'Teacher', 'Block']}]
+    assert len(_task_page(student)[0]) == len(rows) - 1
+    assert save_task_changes(student, hidden=[rows[0]]) == {'hidden': [], 'completed': [], 'uncompleted': []}
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+
+def _write_classes(deadlines):
+    from src.config import STUDENT_DATA, DEADLINES_DATA
+    # Mr. Test teaches Math 9 (A) to Ann and Science 9 (B) to Ann and Ben, and has no students in Art 9 (C)
+    pd.DataFrame([
+        {'Student': 'Ann', 'Grade': 9, 'Course': 'Math 9', 'Teacher': 'Mr. Test', 'Block': 'A'},
+        {'Student': 'Ann', 'Grade': 9, 'Course': 'Science 9', 'Teacher': 'Mr. Test', 'Block': 'B'},
+        {'Student': 'Ben', 'Grade': 9, 'Course': 'Science 9', 'Teacher': 'Mr. Test', 'Block': 'B'},
+        {'Student': 'Ann', 'Grade': 9, 'Course': 'Support 9', 'Teacher': 'Ms. Lane', 'Block': 'S'},
+        {'Student': 'Ben', 'Grade': 9, 'Course': 'Support 9', 'Teacher': 'Ms. Lane', 'Block': 'S'},
+        {'Student': 'Cal', 'Grade': 9, 'Course': 'Math 9', 'Teacher': 'Ms. Lane', 'Block': 'D'},
+    ]).to_csv(STUDENT_DATA, index=False)
+    pd.DataFrame(deadlines, columns=['Task', 'Course', 'Block', 'Teacher', 'Due']).to_csv(DEADLINES_DATA, index=False)
+
+def test_teacher_tasks_window_boundaries():
+    from src.data import teacher_tasks, teacher_task_index
+    _write_classes([
+        ('Before', 'Math 9', 'A', 'Mr. Test', '2025-01-09'),
+        ('Quiz 2', 'Math 9', 'A', 'Mr. Test', '2025-01-15'),
+        ('Quiz 1', 'Math 9', 'A', 'Mr. Test', '2025-01-10'),
+        ('Lab', 'Science 9', 'B', 'Mr. Test', '2025-01-20'),
+        ('Lab', 'Science 9', 'B', 'Mr. Test', '2025-01-20'),
+        ('After', 'Science 9', 'B', 'Mr. Test', '2025-01-21'),
+        ('No students', 'Art 9', 'C', 'Mr. Test', '2025-01-15'),
+        ('Other teacher', 'Math 9', 'D', 'Ms. Lane', '2025-01-15'),
+        ('No date', 'Math 9', 'A', 'Mr. Test', 'soon'),
+    ])
+
+    # sorted by due date, duplicates, unparseable dates and classes without students dropped
+    index = teacher_task_index('Mr. Test')
+    assert list(index['task_due']) == ['Before - Jan 09', 'Quiz 1 - Jan 10', 'Quiz 2 - Jan 15', 'Lab - Jan 20', 'After - Jan 21']
+    assert (np.diff(index['due']) >= np.timedelta64(0)).all()
+
+    # both ends of the range are included, a datetime counts as its date
+    expected = {'Math 9 (A)': ['Quiz 1 - Jan 10', 'Quiz 2 - Jan 15'], 'Science 9 (B)': ['Lab - Jan 20']}
+    assert teacher_tasks('Mr. Test', '2025-01-10', '2025-01-20') == expected
+    assert teacher_tasks('Mr. Test', '2025-01-10T00:00:00', '2025-01-20T23:59:59') == expected
+    assert teacher_tasks('Mr. Test', '2025-01-21', '2025-01-21') == {'Science 9 (B)': ['After - Jan 21']}
+    assert teacher_tasks('Mr. Test', '2025-01-16', '2025-01-19') == {}
+    assert teacher_tasks('Mr. Test', '2025-02-01', '2025-03-01') == {}
+    assert teacher_tasks('Nobody', '2025-01-01', '2025-12-31') == {}
+
+def test_teacher_tasks_due_today_to_the_end_of_the_window():
+    from src.data import teacher_tasks
+    today = date.today()
+    end = today + timedelta(weeks=3)
+    due = lambda days: (today + timedelta(days=days)).isoformat()
+    label = lambda days: (today + timedelta(days=days)).strftime('%b %d')
+    _write_classes([
+        ('Yesterday', 'Math 9', 'A', 'Mr. Test', due(-1)),
+        ('Today', 'Math 9', 'A', 'Mr. Test', due(0)),
+        ('Last day', 'Science 9', 'B', 'Mr. Test', due(21)),
+        ('Too late', 'Science 9', 'B', 'Mr. Test', due(22)),
+    ])
+    assert teacher_tasks('Mr. Test', today.isoformat(), end.isoformat()) == \
+           {'Math 9 (A)': [f'Today - {label(0)}'], 'Science 9 (B)': [f'Last day - {label(21)}']}
+
+def test_teacher_tasks_match_a_scan_of_the_sample_data():
+    from src.config import STUDENT_DATA, DEADLINES_DATA
+    from src.data import teacher_tasks
+    deadlines = pd.read_csv(DEADLINES_DATA)
+    classes = pd.read_csv(STUDENT_DATA)[['Course', 'Teacher', 'Block']].drop_duplicates()
+    df = deadlines.merge(classes, on=['Course', 'Teacher', 'Block']).drop_duplicates()
+    df['Due'] = pd.to_datetime(df['Due'])
+
+    for teacher in df['Teacher'].unique():
+        for start, end in [('2024-01-01', '2026-01-01'), ('2024-12-04', '2024-12-20'), ('2025-02-09', '2025-02-09')]:
+            rows = df[(df['Teacher'] == teacher) & df['Due'].between(start, end)].sort_values('Due', kind='stable')
+            expected = {}
+            for _, row in rows.iterrows():
+                expected.setdefault(f"{row['Course']} ({row['Block']})", []).append(f"{row['Task']} - {row['Due']:%b %d}")
+            assert teacher_tasks(teacher, start, end) == expected
+
+def test_cohort_attendance_by_hand():
+    from src.config import ATTEND_DATA
+    from src.data import cohort_attendance
+    _write_classes([
+        ('Quiz', 'Math 9', 'A', 'Mr. Test', '2025-01-10'),
+        ('Lab', 'Science 9', 'B', 'Mr. Test', '2025-01-20'),
+    ])
+    row = lambda student, day, course, block, code, teacher, habit=None, work=None: \
+        {'Student': student, 'Date': day, 'Course': course, 'Block': block, 'Attendance': code,
+         'Teacher': teacher, 'Habit': habit, 'Work': work}
+    pd.DataFrame([
+        # Ann has two of Mr. Test's classes on the 6th, the worst code is kept
+        row('Ann', '2025-01-06', 'Math 9', 'A', 'P', 'Mr. Test'),
+        row('Ann', '2025-01-06', 'Science 9', 'B', 'L', 'Mr. Test'),
+        row('Ann', '2025-01-06', 'Support 9', 'S', 'A', 'Ms. Lane', 'Mostly On-task', 'Math'),
+        # Ben is in support class only on the 7th, and absent from Mr. Test's class on the 8th
+        row('Ben', '2025-01-07', 'Support 9', 'S', 'P', 'Ms. Lane', 'Off-task', 'Science'),
+        row('Ben', '2025-01-08', 'Science 9', 'B', 'A', 'Mr. Test'),
+        # Cal is not in Mr. Test's classes
+        row('Cal', '2025-01-09', 'Math 9', 'D', 'AE', 'Ms. Lane'),
+    ]).to_csv(ATTEND_DATA, index=False)
+
+    # codes index ATTENDANCE_CODES (P, L, AE, A), scores are 0-4
+    assert cohort_attendance('Mr. Test') == {
+        'students': ['Ann', 'Ben'],
+        'dates': ['2025-01-06', '2025-01-07', '2025-01-08'],
+        'codes': [[1, None, None], [None, None, 3]],
+        'scores': [[3, None, None], [None, 0, None]],
+    }
+    assert cohort_attendance('Mr. Test', pd.read_csv(ATTEND_DATA)) == cohort_attendance('Mr. Test')
+
+def test_cohort_attendance_matches_a_scan_of_the_sample_data():
+    from src.config import ATTEND_DATA
+    from src.data import cohort_attendance, teacher_roster, ATTENDANCE_CODES, WORKHABIT_SCORES
+    attendance = pd.read_csv(ATTEND_DATA)
+    teacher = 'Ms. Johnson'
+    cohort = cohort_attendance(teacher)
+    assert cohort['students'] == sorted(set().union(*teacher_roster(teacher).values()))
+
+    for i, student in enumerate(cohort['students']):
+        for j, day in enumerate(cohort['dates']):
+            rows = attendance[(attendance['Student'] == student) & (attendance['Date'] == day)]
+            codes = [ATTENDANCE_CODES.index(code) for code in rows.loc[rows['Teacher'] == teacher, 'Attendance']]
+            scores = [WORKHABIT_SCORES[habit] for habit in rows['Habit'].dropna()]
+            assert cohort['codes'][i][j] == (max(codes) if codes else None)
+            assert cohort['scores'][i][j] == (max(scores) if scores else None)
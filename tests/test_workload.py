@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+def _windows(days, is_test=None, students=None, **limits):
+    from src.workload import overloaded_windows
+    day = np.array(days)
+    student = np.zeros(len(day), dtype=int) if students is None else np.array(students)
+    test = np.zeros(len(day), dtype=bool) if is_test is None else np.array(is_test, dtype=bool)
+    return [array.tolist() for array in overloaded_windows(student, day, test, **limits)]
+
+def test_overloaded_windows_by_hand():
+    # 5 tasks from day 0 to day 6 are within a 7 day window, day 7 is not
+    assert _windows([0, 1, 2, 3, 6], window=7, tasks=5, tests=3) == [[0], [4], [5]]
+    assert _windows([0, 1, 2, 3, 7], window=7, tasks=5, tests=3) == [[], [], []]
+    # overlapping windows merge into one stretch, from the first task of the first window to the
+    # last task of the last one
+    assert _windows([0, 1, 2, 3, 6, 7, 20], window=7, tasks=5, tests=3) == [[0], [5], [5]]
+    # 3 tests overload on their own
+    assert _windows([0, 3, 6, 9], is_test=[1, 1, 1, 0], window=7, tasks=5, tests=3) == [[0], [2], [3]]
+    # windows do not run on into the next student
+    assert _windows([0, 1, 2, 3, 4, 5], students=[0, 0, 0, 1, 1, 1], window=7, tasks=4, tests=3) == [[], [], []]
+
+TASKS = [
+    # Ann: 5 tasks due Monday 6th to Sunday 12th January, and one more on Monday 13th
+    ('Ann', 'Essay', 'English', '2025-01-06'), ('Ann', 'Quiz 1', 'Math', '2025-01-07'),
+    ('Ann', 'Lab', 'Science', '2025-01-08'), ('Ann', 'Project', 'Art', '2025-01-09'),
+    ('Ann', 'Test 2', 'Math', '2025-01-12'), ('Ann', 'Reading', 'English', '2025-01-13'),
+    # Ben: 4 tasks in a week, the 5th a week after the first
+    ('Ben', 'Essay', 'English', '2025-01-06'), ('Ben', 'Lab', 'Science', '2025-01-07'),
+    ('Ben', 'Project', 'Art', '2025-01-08'), ('Ben', 'Reading', 'English', '2025-01-09'),
+    ('Ben', 'Poster', 'Art', '2025-01-13'),
+    # Cal: the 3rd test a week after the first; Dan: 3 tests in a week
+    ('Cal', 'Quiz A', 'Math', '2025-01-20'), ('Cal', 'Unit Test', 'Science', '2025-01-21'),
+    ('Cal', 'Final Exam', 'Math', '2025-01-27'),
+    ('Dan', 'Quiz A', 'Math', '2025-01-20'), ('Dan', 'Unit Test', 'Science', '2025-01-21'),
+    ('Dan', 'Final Exam', 'Math', '2025-01-26'),
+]
+
+def _write_tasks():
+    from src.config import STUDENT_TASKS
+    df = pd.DataFrame(TASKS, columns=['Student', 'Task', 'Course', 'Due'])
+    df = df.assign(Block='1-1', Teacher='Mr. A', Grade=9, Completed=False, Hidden=False)
+    # a hidden task does not count
+    hidden = df.iloc[[6]].assign(Task='Hidden', Due='2025-01-10', Hidden=True)
+    pd.concat([df, hidden]).to_csv(STUDENT_TASKS, index=False)
+
+def test_deadline_load_by_hand():
+    from src.workload import deadline_index, deadline_load
+    _write_tasks()
+    index = deadline_index()
+    assert list(index['students']) == ['Ann', 'Ben', 'Cal', 'Dan']
+    assert index['starts'].tolist() == [0, 6, 11, 14, 17]
+
+    weeks, windows, stretch = deadline_load()
+    assert windows.assign(From=windows['From'].astype(str), To=windows['To'].astype(str)).to_dict('records') == [
+        {'Student': 'Ann', 'From': '2025-01-06', 'To': '2025-01-13', 'Tasks': 6, 'Tests': 2, 'Peak': 5,
+         'Courses': 'Art, English, Math, Science'},
+        {'Student': 'Dan', 'From': '2025-01-20', 'To': '2025-01-26', 'Tasks': 3, 'Tests': 3, 'Peak': 3,
+         'Courses': 'Math, Science'}]
+    assert stretch.tolist() == [0] * 6 + [-1] * 8 + [1] * 3
+    assert weeks.loc[('Ann', '2025-01-06')].tolist() == [5, 2, 5, True]
+    assert weeks.loc[('Ann', '2025-01-13')].tolist() == [1, 0, 1, True]
+    assert weeks.loc[('Ben', '2025-01-06')].tolist() == [4, 0, 4, False]
+
+def test_crunch_report_by_hand():
+    from src.workload import crunch_report, crunch_page
+    _write_tasks()
+    report = crunch_report()
+    assert report.to_dict('records') == [
+        {'Week': '2025-01-06', 'Overloaded': 1, 'Students': 2, 'Tasks': 9, 'Tests': 2, 'Courses': 'Math (2), Art (1), English (1)'},
+        {'Week': '2025-01-13', 'Overloaded': 1, 'Students': 2, 'Tasks': 2, 'Tests': 0, 'Courses': 'English (1)'},
+        {'Week': '2025-01-20', 'Overloaded': 1, 'Students': 2, 'Tasks': 5, 'Tests': 5, 'Courses': 'Math (2), Science (1)'},
+        {'Week': '2025-01-27', 'Overloaded': 0, 'Students': 1, 'Tasks': 1, 'Tests': 1, 'Courses': ''}]
+    rows, page_count, matched = crunch_page(0, 2, [('Tasks', 'desc')], '{Overloaded} = 1')
+    assert [row['Week'] for row in rows] == ['2025-01-06', '2025-01-20']
+    assert (page_count, matched) == (2, 3)